@@ -2,10 +2,15 @@
 Handler registration
 """
 from aiogram import Dispatcher
-from bot.handlers import commands, messages, callbacks
+from bot.handlers import admin, batch, charts, commands, inline, messages, callbacks, tables
 
 def register_handlers(dp: Dispatcher):
     """Register all handlers"""
     dp.include_router(commands.router)
+    dp.include_router(admin.router)
+    dp.include_router(batch.router)
+    dp.include_router(tables.router)
+    dp.include_router(charts.router)
     dp.include_router(messages.router)
     dp.include_router(callbacks.router)
+    dp.include_router(inline.router)
@@ -0,0 +1,46 @@
+"""
+Admin handlers
+"""
+from datetime import datetime, timezone
+
+from aiogram import Router
+from aiogram.filters import Command, CommandObject
+from aiogram.types import BufferedInputFile, Message
+
+from bot.filters.custom import IsAdminFilter
+from core.config import config
+from services.outbox import outbox
+from services.profiler import ProfilerBusy, profiler
+
+router = Router()
+
+DEFAULT_PROFILE_SECONDS = 10
+
+
+@router.message(Command("profile"), IsAdminFilter())
+async def cmd_profile(message: Message, command: CommandObject) -> None:
+    argument = (command.args or "").strip()
+    if argument and not argument.isdigit():
+        outbox.send(message.answer("Использование: /profile [секунды]"))
+        return
+    
+    seconds = min(int(argument or DEFAULT_PROFILE_SECONDS), config.profile_max_seconds)
+    if seconds <= 0:
+        outbox.send(message.answer("Использование: /profile [секунды]"))
+        return
+    
+    outbox.send(message.answer(f"Профилирование {seconds} с..."))
+    try:
+        report = await profiler.run(seconds)
+    except ProfilerBusy as e:
+        outbox.send(message.answer(f"Error: {e}"))
+        return
+    
+    stamp = f"{datetime.now(timezone.utc):%Y%m%d_%H%M%S}"
+    outbox.send(message.answer_document(
+        BufferedInputFile(report.text.encode(), filename=f"profile_{stamp}.txt"),
+        caption=f"Профиль за {seconds} с",
+    ))
+    outbox.send(message.answer_document(
+        BufferedInputFile(report.pstats, filename=f"profile_{stamp}.pstats"),
+    ))
@@ -0,0 +1,46 @@
+"""
+Batch question handlers
+"""
+from aiogram import Router, F
+from aiogram.filters import Command, CommandObject
+from aiogram.types import Message
+
+from core.config import config
+from services.analytics_service import analytics_service
+from services.outbox import outbox
+from utils.helpers import format_results_table, split_questions
+
+router = Router()
+
+MAX_FILE_SIZE = 64 * 1024
+
+
+@router.message(Command("batch"), flags={"cancellable": True})
+async def cmd_batch(message: Message, command: CommandObject) -> None:
+    await answer_batch(message, command.args or "")
+
+
+@router.message(F.document.file_name.endswith(".txt"), flags={"cancellable": True})
+async def handle_batch_file(message: Message) -> None:
+    if message.document.file_size and message.document.file_size > MAX_FILE_SIZE:
+        outbox.send(message.answer("Error: файл слишком большой"))
+        return
+    
+    file = await message.bot.download(message.document)
+    await answer_batch(message, file.read().decode("utf-8", errors="replace"))
+
+
+async def answer_batch(message: Message, text: str) -> None:
+    questions = split_questions(text, config.batch_max_questions)
+    
+    if not questions:
+        outbox.send(message.answer(
+            "Отправьте вопросы после /batch, по одному на строку, "
+            "или .txt файл с вопросами"
+        ))
+        return
+    
+    results = await analytics_service.process_batch(questions)
+    
+    for block in format_results_table(questions, results):
+        outbox.send(message.answer(block, parse_mode="HTML"))
@@ -0,0 +1,44 @@
+"""
+Chart handlers
+"""
+from aiogram import Router
+from aiogram.filters import Command, CommandObject
+from aiogram.types import BufferedInputFile, Message
+
+from services.analytics_service import analytics_service
+from services.chart_service import chart_service
+from services.outbox import outbox
+
+router = Router()
+
+
+@router.message(Command("chart"), flags={"cancellable": True})
+async def cmd_chart(message: Message, command: CommandObject) -> None:
+    question = (command.args or "").strip()
+    
+    if not question:
+        outbox.send(message.answer(
+            "Использование: /chart <вопрос>\n"
+            "Например: /chart как росли просмотры креатора abc123 в ноябре 2025"
+        ))
+        return
+    
+    image, error = await analytics_service.process_chart(question)
+    
+    if error:
+        outbox.send(message.answer(f"Error: {error}"))
+        return
+    
+    caption = question[:1024]
+    
+    if image.file_id:
+        outbox.send(message.answer_photo(image.file_id, caption=caption))
+        return
+    
+    def remember(sent):
+        if sent.result() is not None:
+            chart_service.remember_file_id(image.key, sent.result().photo[-1].file_id)
+    
+    outbox.send(
+        message.answer_photo(BufferedInputFile(image.png, filename="chart.png"), caption=caption)
+    ).add_done_callback(remember)
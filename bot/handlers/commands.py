@@ -2,23 +2,29 @@ from aiogram import Router
 from aiogram.filters import CommandStart, Command
 from aiogram.types import Message
 
+from services.outbox import outbox
+
 router = Router()
 
 
 @router.message(CommandStart())
 async def cmd_start(message: Message) -> None:
     #used translator for this btw :)
-    await message.answer(
+    outbox.send(message.answer(
         "Привет! Я бот для аналитики видео.\n\n"
         "Задайте вопрос на русском языке, например:\n"
         "• Сколько всего видео в системе?\n"
         "• Сколько видео набрало больше 100000 просмотров?\n"
         "• На сколько просмотров выросли видео 28 ноября 2025?"
-    )
+    ))
 @router.message(Command("help"))
 async def cmd_help(message: Message):
-    await message.answer(
+    outbox.send(message.answer(
         "Available commands:\n"
         "/start - Start the bot\n"
-        "/help - Show this help message"
-    )
+        "/help - Show this help message\n"
+        "/batch - Ask many questions at once (one per line, or send a .txt file)\n"
+        "/table, /xlsx - Answer as a table, large results are sent as a file\n"
+        "/chart - Answer a time-series question with a chart\n\n"
+        "Inline mode: type @<bot username> <question> in any chat"
+    ))
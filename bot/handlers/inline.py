@@ -0,0 +1,66 @@
+"""
+Inline mode: @bot <question> in any chat
+"""
+import asyncio
+import hashlib
+
+from aiogram import Router
+from aiogram.types import InlineQuery, InlineQueryResultArticle, InlineQueryResultsButton, InputTextMessageContent
+
+from core.config import config
+from services.analytics_service import analytics_service
+from services.answer_cache import Stale
+from services.inflight import SupersededError, inline_registry
+from utils.helpers import format_value
+
+router = Router()
+
+MIN_QUESTION_LENGTH = 8
+BUTTON_TEXT_LIMIT = 64
+
+
+@router.inline_query()
+async def handle_inline(inline_query: InlineQuery) -> None:
+    question = inline_query.query.strip()
+    
+    if len(question) < MIN_QUESTION_LENGTH:
+        await inline_query.answer([], cache_time=0)
+        return
+    
+    # Every keystroke is a new query: a newer one from the same user cancels this one
+    try:
+        result, error = await inline_registry.run(
+            inline_query.from_user.id,
+            analytics_service.process_inline(question, config.inline_debounce),
+            config.handler_timeout,
+        )
+    except SupersededError:
+        return
+    except asyncio.TimeoutError:
+        result, error = None, "превышено время ожидания ответа"
+    
+    # Answered directly, not through the outbox: inline answers are not chat messages
+    # and must arrive within seconds
+    if error or result is None:
+        text = f"Error: {error}" if error else "Допишите вопрос и поставьте «?»"
+        await inline_query.answer(
+            [],
+            cache_time=0,
+            button=InlineQueryResultsButton(text=text[:BUTTON_TEXT_LIMIT], start_parameter="inline"),
+        )
+        return
+    
+    answer = format_value(result)
+    await inline_query.answer(
+        [
+            InlineQueryResultArticle(
+                id=hashlib.md5(f"{question}\n{answer}".encode()).hexdigest(),
+                title=answer,
+                description=question,
+                input_message_content=InputTextMessageContent(message_text=f"{question}\n{answer}"),
+            )
+        ],
+        # A stale fallback is served only while a breaker is open
+        cache_time=0 if isinstance(result, Stale) else config.inline_cache_time,
+        is_personal=False,
+    )
@@ -2,11 +2,13 @@ from aiogram import Router, F
 from aiogram.types import Message
 
 from services.analytics_service import analytics_service
+from services.outbox import outbox
+from utils.helpers import format_value
 
 router = Router()
 
 
-@router.message(F.text)
+@router.message(F.text, flags={"cancellable": True})
 async def handle_question(message: Message) -> None:
     question = message.text.strip()
     
@@ -16,7 +18,7 @@ async def handle_question(message: Message) -> None:
     result, error = await analytics_service.process_question(question)
     
     if error:
-        await message.answer(f"Error: {error}")
+        outbox.send(message.answer(f"Error: {error}"))
         return
     
-    await message.answer(str(result))
\ No newline at end of file
+    outbox.send(message.answer(format_value(result)))
\ No newline at end of file
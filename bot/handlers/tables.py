@@ -0,0 +1,50 @@
+"""
+Tabular result handlers
+"""
+import os
+
+from aiogram import Router
+from aiogram.filters import Command, CommandObject
+from aiogram.types import FSInputFile, Message
+
+from services.analytics_service import analytics_service
+from services.outbox import outbox
+from utils.helpers import format_table
+
+router = Router()
+
+
+@router.message(Command("table", "xlsx"), flags={"cancellable": True})
+async def cmd_table(message: Message, command: CommandObject) -> None:
+    question = (command.args or "").strip()
+    
+    if not question:
+        outbox.send(message.answer(
+            "Использование: /table <вопрос> (CSV) или /xlsx <вопрос> (Excel)\n"
+            "Например: /table топ 10 креаторов по просмотрам за последнюю неделю"
+        ))
+        return
+    
+    file_format = "xlsx" if command.command == "xlsx" else "csv"
+    result, error = await analytics_service.process_table(question, file_format)
+    
+    if error:
+        outbox.send(message.answer(f"Error: {error}"))
+        return
+    
+    if result.path is None:
+        if not result.rows:
+            outbox.send(message.answer("Нет данных"))
+            return
+        outbox.send(message.answer(format_table(result.columns, result.rows), parse_mode="HTML"))
+        return
+    
+    caption = f"Строк: {result.row_count}"
+    if result.truncated:
+        caption += " (результат обрезан)"
+    
+    path = result.path
+    outbox.send(message.answer_document(
+        FSInputFile(path, filename=f"result.{file_format}"),
+        caption=caption,
+    )).add_done_callback(lambda _: os.remove(path))
@@ -1,4 +1,6 @@
 from bot.middlewares.auth import AuthMiddleware
+from bot.middlewares.inflight import InFlightMiddleware
+from bot.middlewares.request_context import RequestContextMiddleware
 from bot.middlewares.throttling import ThrottlingMiddleware
 
-__all__ = ["AuthMiddleware", "ThrottlingMiddleware"]
\ No newline at end of file
+__all__ = ["AuthMiddleware", "InFlightMiddleware", "RequestContextMiddleware", "ThrottlingMiddleware"]
\ No newline at end of file
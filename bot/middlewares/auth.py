@@ -4,6 +4,7 @@ from aiogram.types import Message, TelegramObject
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from core.logging import span
 from database.models import User
 from database.session import async_session_maker
 
@@ -25,7 +26,8 @@ class AuthMiddleware(BaseMiddleware):
         user_id = event.from_user.id
         
         async with async_session_maker() as session:
-            user = await self._get_or_create_user(session, event)
+            with span("auth"):
+                user = await self._get_or_create_user(session, event)
             data["user"] = user
             data["session"] = session
         
@@ -0,0 +1,35 @@
+import asyncio
+from typing import Callable, Dict, Any, Awaitable
+from aiogram import BaseMiddleware
+from aiogram.dispatcher.flags import get_flag
+from aiogram.types import Message, TelegramObject
+
+from core.config import config
+from services.inflight import SupersededError, inflight_registry
+from services.outbox import outbox
+
+
+class InFlightMiddleware(BaseMiddleware):
+    """Runs handlers flagged `cancellable` under the per-user in-flight registry"""
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        if not isinstance(event, Message) or not event.from_user:
+            return await handler(event, data)
+
+        if not get_flag(data, "cancellable"):
+            return await handler(event, data)
+
+        try:
+            return await inflight_registry.run(
+                event.from_user.id, handler(event, data), config.handler_timeout
+            )
+        except SupersededError:
+            return None
+        except asyncio.TimeoutError:
+            outbox.send(event.answer("Error: превышено время ожидания ответа, попробуйте ещё раз"))
+            return None
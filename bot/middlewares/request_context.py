@@ -0,0 +1,28 @@
+import logging
+from typing import Callable, Dict, Any, Awaitable
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, Update
+
+from core.logging import request_context, span
+
+
+logger = logging.getLogger(__name__)
+
+
+class RequestContextMiddleware(BaseMiddleware):
+    
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        update_id = event.update_id if isinstance(event, Update) else None
+        
+        with request_context() as request_id:
+            data["request_id"] = request_id
+            try:
+                with span("total"):
+                    return await handler(event, data)
+            finally:
+                logger.info("Update %s handled", update_id)
@@ -25,11 +25,105 @@ class Config:
     # Gemini LLM
     gemini_api_key: str
     gemini_model: str
+    gemini_base_url: str
+    gemini_stream: bool
+    
+    # LLM providers
+    llm_provider: str
+    llm_secondary_provider: str
+    llm_hedge_delay: float
+    query_ir: bool
+    openai_base_url: str
+    openai_api_key: str
+    openai_model: str
+    openai_stream: bool
     
     # Pool settings
     db_pool_min_size: int
     db_pool_max_size: int
     
+    # Read replicas
+    db_replica_urls: list[str]
+    db_replica_max_lag: float
+    db_replica_check_interval: float
+    
+    # Sharding: videos/video_snapshots split across these databases by creator_id
+    db_shard_urls: list[str]
+    
+    # Handler deadline (seconds) for questions, tables, charts and batches
+    handler_timeout: float
+    
+    # Outbound Telegram sends (per second; Bot API allows ~30 overall, ~1 per chat, 20/min per group)
+    outbox_rate: float
+    outbox_chat_rate: float
+    outbox_group_rate: float
+    outbox_chat_burst: int
+    outbox_max_in_flight: int
+    
+    # Circuit breakers: open when this share of the last `window` calls failed or was slow
+    breaker_window: int
+    breaker_failure_rate: float
+    breaker_min_calls: int
+    breaker_open_seconds: float
+    llm_slow_call_seconds: float
+    db_slow_call_seconds: float
+    answer_cache_size: int
+    
+    # Inline mode: quiet time before a query is answered, Telegram-side result cache (seconds)
+    inline_debounce: float
+    inline_cache_time: int
+    
+    # /profile admin command
+    profile_max_seconds: int
+    profile_slow_callback: float
+    
+    # Batch questions
+    batch_max_questions: int
+    batch_concurrency: int
+    
+    # Tabular results
+    table_inline_rows: int
+    table_chunk_rows: int
+    table_max_rows: int
+    
+    # Charts
+    chart_workers: int
+    chart_cache_size: int
+    chart_max_points: int
+    
+    # In-process column stores
+    columnar_engine: bool
+    snapshot_columns_dir: str
+    
+    # HyperLogLog sketches for COUNT(DISTINCT video_id) over date ranges
+    distinct_estimates: bool
+    hll_precision: int
+    
+    # Snapshot ingestion
+    ingest_host: str
+    ingest_port: int
+    ingest_token: str
+    ingest_spool_dir: str
+    ingest_batch_rows: int
+    ingest_flush_interval: float
+    ingest_max_pending_rows: int
+    ingest_version_interval: float
+    
+    # Snapshot retention: hourly rows older than this are rolled into daily rows
+    snapshot_hourly_days: int
+    
+    # Query log
+    query_log_enabled: bool
+    query_log_buffer: int
+    query_log_batch_rows: int
+    query_log_flush_interval: float
+    query_log_retention_days: int
+    
+    # Logging
+    log_level: str
+    log_json: bool
+    log_sample_rates: dict[str, float]
+    
     @classmethod
     def from_env(cls):
         """Load configuration from environment variables"""
@@ -42,7 +136,8 @@ class Config:
         
         return cls(
             bot_token=os.getenv("BOT_TOKEN", ""),
-            database_url=os.getenv("DATABASE_URL", "sqlite+aiosqlite:///./bot_database.db"),
+            database_url=os.getenv("DATABASE_URL")
+            or f"postgresql+asyncpg://{db_user}:{db_password}@{db_host}:{db_port}/{db_name}",
             admin_ids=[int(id) for id in os.getenv("ADMIN_IDS", "").split(",") if id],
             
             # Database
@@ -54,13 +149,116 @@ class Config:
             
             # Gemini
             gemini_api_key=os.getenv("GEMINI_API_KEY", ""),
-            gemini_model=os.getenv("GEMINI_MODEL", "gemini-1.5-flash"),
+            gemini_model=os.getenv("GEMINI_MODEL", "gemini-2.5-flash"),
+            gemini_base_url=os.getenv("GEMINI_BASE_URL", "https://generativelanguage.googleapis.com/v1beta/models"),
+            gemini_stream=os.getenv("GEMINI_STREAM", "true").lower() in ("1", "true", "yes"),
+            
+            # LLM providers
+            llm_provider=os.getenv("LLM_PROVIDER", "gemini"),
+            llm_secondary_provider=os.getenv("LLM_SECONDARY_PROVIDER", ""),
+            llm_hedge_delay=float(os.getenv("LLM_HEDGE_DELAY", "1.0")),
+            query_ir=os.getenv("QUERY_IR", "false").lower() in ("1", "true", "yes"),
+            openai_base_url=os.getenv("OPENAI_BASE_URL", "https://api.groq.com/openai/v1"),
+            openai_api_key=os.getenv("OPENAI_API_KEY", ""),
+            openai_model=os.getenv("OPENAI_MODEL", "llama-3.1-8b-instant"),
+            openai_stream=os.getenv("OPENAI_STREAM", "true").lower() in ("1", "true", "yes"),
             
             # Pool
             db_pool_min_size=int(os.getenv("DB_POOL_MIN_SIZE", "5")),
             db_pool_max_size=int(os.getenv("DB_POOL_MAX_SIZE", "20")),
+            
+            # Read replicas
+            db_replica_urls=[url.strip() for url in os.getenv("DB_REPLICA_URLS", "").split(",") if url.strip()],
+            db_replica_max_lag=float(os.getenv("DB_REPLICA_MAX_LAG", "10")),
+            db_replica_check_interval=float(os.getenv("DB_REPLICA_CHECK_INTERVAL", "5")),
+            
+            # Sharding
+            db_shard_urls=[url.strip() for url in os.getenv("DB_SHARD_URLS", "").split(",") if url.strip()],
+            
+            handler_timeout=float(os.getenv("HANDLER_TIMEOUT", "60")),
+            
+            # Outbound sends
+            outbox_rate=float(os.getenv("OUTBOX_RATE", "30")),
+            outbox_chat_rate=float(os.getenv("OUTBOX_CHAT_RATE", "1")),
+            outbox_group_rate=float(os.getenv("OUTBOX_GROUP_RATE", "0.33")),
+            outbox_chat_burst=int(os.getenv("OUTBOX_CHAT_BURST", "3")),
+            outbox_max_in_flight=int(os.getenv("OUTBOX_MAX_IN_FLIGHT", "8")),
+            
+            # Circuit breakers
+            breaker_window=int(os.getenv("BREAKER_WINDOW", "20")),
+            breaker_failure_rate=float(os.getenv("BREAKER_FAILURE_RATE", "0.5")),
+            breaker_min_calls=int(os.getenv("BREAKER_MIN_CALLS", "5")),
+            breaker_open_seconds=float(os.getenv("BREAKER_OPEN_SECONDS", "30")),
+            llm_slow_call_seconds=float(os.getenv("LLM_SLOW_CALL_SECONDS", "15")),
+            db_slow_call_seconds=float(os.getenv("DB_SLOW_CALL_SECONDS", "5")),
+            answer_cache_size=int(os.getenv("ANSWER_CACHE_SIZE", "10000")),
+            
+            # Inline mode
+            inline_debounce=float(os.getenv("INLINE_DEBOUNCE", "0.6")),
+            inline_cache_time=int(os.getenv("INLINE_CACHE_TIME", "60")),
+            
+            # Profiler
+            profile_max_seconds=int(os.getenv("PROFILE_MAX_SECONDS", "120")),
+            profile_slow_callback=float(os.getenv("PROFILE_SLOW_CALLBACK", "0.1")),
+            
+            # Batch questions
+            batch_max_questions=int(os.getenv("BATCH_MAX_QUESTIONS", "50")),
+            batch_concurrency=int(os.getenv("BATCH_CONCURRENCY", "5")),
+            
+            # Tabular results
+            table_inline_rows=int(os.getenv("TABLE_INLINE_ROWS", "20")),
+            table_chunk_rows=int(os.getenv("TABLE_CHUNK_ROWS", "5000")),
+            table_max_rows=int(os.getenv("TABLE_MAX_ROWS", "1000000")),
+            
+            # Charts
+            chart_workers=int(os.getenv("CHART_WORKERS", "2")),
+            chart_cache_size=int(os.getenv("CHART_CACHE_SIZE", "128")),
+            chart_max_points=int(os.getenv("CHART_MAX_POINTS", "1000")),
+            
+            # Column store
+            columnar_engine=os.getenv("COLUMNAR_ENGINE", "true").lower() in ("1", "true", "yes"),
+            snapshot_columns_dir=os.getenv("SNAPSHOT_COLUMNS_DIR", ""),
+            
+            # Distinct-count sketches
+            distinct_estimates=os.getenv("DISTINCT_ESTIMATES", "false").lower() in ("1", "true", "yes"),
+            hll_precision=int(os.getenv("HLL_PRECISION", "14")),
+            
+            # Snapshot ingestion
+            ingest_host=os.getenv("INGEST_HOST", "127.0.0.1"),
+            ingest_port=int(os.getenv("INGEST_PORT", "8081")),
+            ingest_token=os.getenv("INGEST_TOKEN", ""),
+            ingest_spool_dir=os.getenv("INGEST_SPOOL_DIR", ""),
+            ingest_batch_rows=int(os.getenv("INGEST_BATCH_ROWS", "20000")),
+            ingest_flush_interval=float(os.getenv("INGEST_FLUSH_INTERVAL", "0.5")),
+            ingest_max_pending_rows=int(os.getenv("INGEST_MAX_PENDING_ROWS", "200000")),
+            ingest_version_interval=float(os.getenv("INGEST_VERSION_INTERVAL", "30")),
+            
+            # Snapshot retention
+            snapshot_hourly_days=int(os.getenv("SNAPSHOT_HOURLY_DAYS", "21")),
+            
+            # Query log
+            query_log_enabled=os.getenv("QUERY_LOG", "true").lower() in ("1", "true", "yes"),
+            query_log_buffer=int(os.getenv("QUERY_LOG_BUFFER", "10000")),
+            query_log_batch_rows=int(os.getenv("QUERY_LOG_BATCH_ROWS", "500")),
+            query_log_flush_interval=float(os.getenv("QUERY_LOG_FLUSH_INTERVAL", "5")),
+            query_log_retention_days=int(os.getenv("QUERY_LOG_RETENTION_DAYS", "30")),
+            
+            # Logging
+            log_level=os.getenv("LOG_LEVEL", "INFO").upper(),
+            log_json=os.getenv("LOG_JSON", "true").lower() in ("1", "true", "yes"),
+            log_sample_rates=cls._parse_sample_rates(os.getenv("LOG_SAMPLE_RATES", "")),
         )
     
+    @staticmethod
+    def _parse_sample_rates(raw: str) -> dict[str, float]:
+        """Parse 'logger=rate,logger=rate' into a mapping"""
+        rates = {}
+        for item in raw.split(","):
+            name, _, rate = item.partition("=")
+            if name.strip() and rate.strip():
+                rates[name.strip()] = float(rate)
+        return rates
+    
     @property
     def async_database_url(self) -> str:
         """Async database URL for SQLAlchemy"""
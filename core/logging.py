@@ -1,24 +1,153 @@
 """
 Logging configuration
 """
+import atexit
 import logging
-from logging.handlers import RotatingFileHandler
 import os
+import queue
+import random
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Iterator, Optional
+
+from pythonjsonlogger.json import JsonFormatter
+
+from core.config import config
+
+
+LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+JSON_FIELDS = "%(asctime)s %(name)s %(levelname)s %(message)s %(request_id)s %(spans)s"
+
+request_id_var: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+spans_var: ContextVar[Optional[dict[str, float]]] = ContextVar("spans", default=None)
+
+_listener: Optional[QueueListener] = None
+
+
+class RequestContextFilter(logging.Filter):
+    """Attach the current request id and span timings to every record"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get()
+        spans = spans_var.get()
+        record.spans = dict(spans) if spans else None
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Keep only a fraction of sub-WARNING records from noisy loggers"""
+
+    def __init__(self, rates: dict[str, float]):
+        super().__init__()
+        self.rates = rates
+        self._resolved: dict[str, float] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+
+        rate = self._rate_for(record.name)
+        return rate >= 1.0 or random.random() < rate
+
+    def _rate_for(self, name: str) -> float:
+        rate = self._resolved.get(name)
+        if rate is None:
+            rate = 1.0
+            prefix = name
+            while prefix:
+                if prefix in self.rates:
+                    rate = self.rates[prefix]
+                    break
+                prefix = prefix.rpartition(".")[0]
+            self._resolved[name] = rate
+        return rate
+
+
+class TextFormatter(logging.Formatter):
+    """Plain text formatter that appends request context when present"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        request_id = getattr(record, "request_id", None)
+        if request_id:
+            line = f"{line} [request_id={request_id}"
+            spans = getattr(record, "spans", None)
+            if spans:
+                line += " " + " ".join(f"{k}={v}ms" for k, v in spans.items())
+            line += "]"
+        return line
+
+
+def setup_logging() -> QueueListener:
+    """Configure logging for the application
+
+    Records are handed to a background thread through a queue so file
+    writes and rotation never run on the event loop.
+    """
+    global _listener
+
+    if _listener is not None:
+        return _listener
 
-def setup_logging():
-    """Configure logging for the application"""
     log_dir = "logs"
     os.makedirs(log_dir, exist_ok=True)
-    
-    logging.basicConfig(
-        level=logging.INFO,
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        handlers=[
-            RotatingFileHandler(
-                f"{log_dir}/bot.log",
-                maxBytes=10485760,  # 10MB
-                backupCount=5
-            ),
-            logging.StreamHandler()
-        ]
+
+    if config.log_json:
+        formatter = JsonFormatter(JSON_FIELDS)
+    else:
+        formatter = TextFormatter(LOG_FORMAT)
+
+    file_handler = RotatingFileHandler(
+        f"{log_dir}/bot.log",
+        maxBytes=10485760,  # 10MB
+        backupCount=5
     )
+    stream_handler = logging.StreamHandler()
+    for handler in (file_handler, stream_handler):
+        handler.setFormatter(formatter)
+
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    queue_handler = QueueHandler(log_queue)
+    queue_handler.addFilter(RequestContextFilter())
+    if config.log_sample_rates:
+        queue_handler.addFilter(SamplingFilter(config.log_sample_rates))
+
+    root = logging.getLogger()
+    root.setLevel(config.log_level)
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+
+    _listener = QueueListener(log_queue, file_handler, stream_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+    return _listener
+
+
+@contextmanager
+def request_context(request_id: Optional[str] = None) -> Iterator[str]:
+    """Bind a request id and a fresh span table to the current context"""
+    request_id = request_id or uuid.uuid4().hex[:12]
+    id_token = request_id_var.set(request_id)
+    spans_token = spans_var.set({})
+    try:
+        yield request_id
+    finally:
+        spans_var.reset(spans_token)
+        request_id_var.reset(id_token)
+
+
+@contextmanager
+def span(name: str) -> Iterator[None]:
+    """Record how long the block took (ms) under the current request"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        spans = spans_var.get()
+        if spans is not None:
+            spans[name] = round((time.perf_counter() - started) * 1000, 2)
@@ -0,0 +1,184 @@
+"""
+Compact storage for videos and video_snapshots
+
+Text keys are stored as native uuid with integer surrogate keys for joins:
+
+- creators: dictionary of creator ids (32-char hex stored as uuid)
+- video_rows: one row per video, `idx` is the integer key snapshots point at
+- snapshot_rows: snapshots referencing `video_rows.idx` instead of the 36-char id
+- daily_snapshot_rows: old snapshots downsampled to one row per video per day
+
+`videos` and `video_snapshots` become views with the original column names
+and text formats, so generated SQL keeps working. The views use LEFT JOINs
+on unique keys so Postgres removes the join when a query does not select
+the decoded id.
+"""
+
+STORAGE_SQL = [
+    """
+    CREATE TABLE creators (
+        id SERIAL PRIMARY KEY,
+        key UUID NOT NULL UNIQUE
+    )
+    """,
+    """
+    CREATE TABLE video_rows (
+        idx SERIAL PRIMARY KEY,
+        id UUID NOT NULL UNIQUE,
+        video_created_at TIMESTAMPTZ NOT NULL,
+        created_at TIMESTAMPTZ DEFAULT NOW(),
+        updated_at TIMESTAMPTZ DEFAULT NOW(),
+        creator_idx INTEGER NOT NULL REFERENCES creators(id),
+        views_count INTEGER DEFAULT 0,
+        likes_count INTEGER DEFAULT 0,
+        comments_count INTEGER DEFAULT 0,
+        reports_count INTEGER DEFAULT 0
+    )
+    """,
+    """
+    CREATE TABLE snapshot_rows (
+        id UUID PRIMARY KEY,
+        created_at TIMESTAMPTZ DEFAULT NOW(),
+        updated_at TIMESTAMPTZ DEFAULT NOW(),
+        video_idx INTEGER NOT NULL REFERENCES video_rows(idx) ON DELETE CASCADE,
+        views_count INTEGER DEFAULT 0,
+        likes_count INTEGER DEFAULT 0,
+        comments_count INTEGER DEFAULT 0,
+        reports_count INTEGER DEFAULT 0,
+        delta_views_count INTEGER DEFAULT 0,
+        delta_likes_count INTEGER DEFAULT 0,
+        delta_comments_count INTEGER DEFAULT 0,
+        delta_reports_count INTEGER DEFAULT 0
+    )
+    """,
+]
+
+# Expression indexes let `creator_id = '...'` / `video_id = '...'` through the views use an index
+INDEX_SQL = [
+    "CREATE INDEX idx_creators_key_text ON creators ((replace(key::text, '-', '')))",
+    "CREATE INDEX idx_video_rows_id_text ON video_rows ((id::text))",
+    "CREATE INDEX idx_video_rows_creator_date ON video_rows (creator_idx, video_created_at)",
+    "CREATE INDEX idx_video_rows_video_created_at ON video_rows (video_created_at)",
+    "CREATE INDEX idx_video_rows_views_count ON video_rows (views_count)",
+    "CREATE INDEX idx_snapshot_rows_video_created ON snapshot_rows (video_idx, created_at)",
+    "CREATE INDEX idx_snapshot_rows_created_at ON snapshot_rows (created_at)",
+    "CREATE INDEX idx_snapshot_rows_delta_views_positive ON snapshot_rows (delta_views_count) WHERE delta_views_count > 0",
+]
+
+VIEWS_SQL = [
+    """
+    CREATE VIEW videos AS
+    SELECT v.id::text AS id,
+           replace(c.key::text, '-', '') AS creator_id,
+           v.video_created_at,
+           v.views_count,
+           v.likes_count,
+           v.comments_count,
+           v.reports_count,
+           v.created_at,
+           v.updated_at
+    FROM video_rows v
+    LEFT JOIN creators c ON c.id = v.creator_idx
+    """,
+    """
+    CREATE VIEW video_snapshots AS
+    SELECT replace(s.id::text, '-', '') AS id,
+           v.id::text AS video_id,
+           s.views_count,
+           s.likes_count,
+           s.comments_count,
+           s.reports_count,
+           s.delta_views_count,
+           s.delta_likes_count,
+           s.delta_comments_count,
+           s.delta_reports_count,
+           s.created_at,
+           s.updated_at
+    FROM snapshot_rows s
+    LEFT JOIN video_rows v ON v.idx = s.video_idx
+    """,
+]
+
+# Daily tier: hourly snapshot_rows older than the retention age are rolled
+# into one row per video per UTC day (end-of-day totals, summed deltas) and
+# video_snapshots becomes the union of both tiers. `id` and `created_at` are
+# those of the last hourly snapshot of the day.
+DAILY_STORAGE_SQL = [
+    """
+    CREATE TABLE daily_snapshot_rows (
+        video_idx INTEGER NOT NULL REFERENCES video_rows(idx) ON DELETE CASCADE,
+        day DATE NOT NULL,
+        id UUID NOT NULL,
+        created_at TIMESTAMPTZ NOT NULL,
+        updated_at TIMESTAMPTZ,
+        views_count INTEGER DEFAULT 0,
+        likes_count INTEGER DEFAULT 0,
+        comments_count INTEGER DEFAULT 0,
+        reports_count INTEGER DEFAULT 0,
+        delta_views_count INTEGER DEFAULT 0,
+        delta_likes_count INTEGER DEFAULT 0,
+        delta_comments_count INTEGER DEFAULT 0,
+        delta_reports_count INTEGER DEFAULT 0,
+        hourly_rows INTEGER NOT NULL DEFAULT 1,
+        PRIMARY KEY (video_idx, day)
+    )
+    """,
+]
+
+DAILY_INDEX_SQL = [
+    "CREATE INDEX idx_daily_snapshot_rows_created_at ON daily_snapshot_rows (created_at)",
+]
+
+_SNAPSHOT_COLUMNS = """
+           s.views_count,
+           s.likes_count,
+           s.comments_count,
+           s.reports_count,
+           s.delta_views_count,
+           s.delta_likes_count,
+           s.delta_comments_count,
+           s.delta_reports_count,
+           s.created_at,
+           s.updated_at"""
+
+TIERED_VIEWS_SQL = [
+    f"""
+    CREATE OR REPLACE VIEW video_snapshots AS
+    SELECT replace(s.id::text, '-', '') AS id,
+           v.id::text AS video_id,{_SNAPSHOT_COLUMNS}
+    FROM snapshot_rows s
+    LEFT JOIN video_rows v ON v.idx = s.video_idx
+    UNION ALL
+    SELECT replace(s.id::text, '-', '') AS id,
+           v.id::text AS video_id,{_SNAPSHOT_COLUMNS}
+    FROM daily_snapshot_rows s
+    LEFT JOIN video_rows v ON v.idx = s.video_idx
+    """,
+]
+
+# Copies the text-keyed tables into compact storage, snapshots in created_at order
+MIGRATE_SQL = [
+    "INSERT INTO creators (key) SELECT DISTINCT creator_id::uuid FROM videos ORDER BY 1",
+    """
+    INSERT INTO video_rows (id, video_created_at, created_at, updated_at, creator_idx,
+                            views_count, likes_count, comments_count, reports_count)
+    SELECT v.id::uuid, v.video_created_at, v.created_at, v.updated_at, c.id,
+           v.views_count, v.likes_count, v.comments_count, v.reports_count
+    FROM videos v
+    JOIN creators c ON c.key = v.creator_id::uuid
+    ORDER BY v.video_created_at
+    """,
+    """
+    INSERT INTO snapshot_rows (id, created_at, updated_at, video_idx,
+                               views_count, likes_count, comments_count, reports_count,
+                               delta_views_count, delta_likes_count, delta_comments_count, delta_reports_count)
+    SELECT s.id::uuid, s.created_at, s.updated_at, v.idx,
+           s.views_count, s.likes_count, s.comments_count, s.reports_count,
+           s.delta_views_count, s.delta_likes_count, s.delta_comments_count, s.delta_reports_count
+    FROM video_snapshots s
+    JOIN video_rows v ON v.id = s.video_id::uuid
+    ORDER BY s.created_at
+    """,
+]
+
+COMPACT_TABLES = ("creators", "video_rows", "snapshot_rows", "daily_snapshot_rows")
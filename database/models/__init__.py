@@ -5,5 +5,8 @@ from database.models.base import Base
 from database.models.video import Video
 from database.models.video_snapshot import VideoSnapshot
 from database.models.user import User
+from database.models.data_version import DataVersion
+from database.models.query_log import QueryLog
+from database.models.snapshot_sketch import SnapshotSketch
 
-__all__ = ["Base", "Video", "VideoSnapshot", "User"]
\ No newline at end of file
+__all__ = ["Base", "Video", "VideoSnapshot", "User", "DataVersion", "QueryLog", "SnapshotSketch"]
\ No newline at end of file
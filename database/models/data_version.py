@@ -0,0 +1,15 @@
+from sqlalchemy import Column, Integer, BigInteger, DateTime
+from datetime import datetime
+from database.models.base import Base
+
+
+class DataVersion(Base):
+    """Single-row counter bumped whenever analytics data changes"""
+    __tablename__ = "data_version"
+
+    id = Column(Integer, primary_key=True, default=1)
+    version = Column(BigInteger, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<DataVersion(version={self.version})>"
@@ -0,0 +1,28 @@
+from sqlalchemy import Column, BigInteger, String, Text, Float, DateTime, Index
+from datetime import datetime
+from database.models.base import Base
+
+
+class QueryLog(Base):
+    """One answered (or failed) question, written in batches by services.query_log"""
+    __tablename__ = "query_log"
+
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    created_at = Column(DateTime(timezone=True), nullable=False, default=datetime.utcnow)
+    request_id = Column(String(32), nullable=True)
+    kind = Column(String(16), nullable=False)
+    question = Column(Text, nullable=False)
+    sql = Column(Text, nullable=True)
+    shape = Column(Text, nullable=True)
+    result = Column(BigInteger, nullable=True)
+    error = Column(Text, nullable=True)
+    llm_ms = Column(Float, nullable=True)
+    db_ms = Column(Float, nullable=True)
+    total_ms = Column(Float, nullable=True)
+
+    __table_args__ = (
+        Index('idx_query_log_created_at', 'created_at'),
+    )
+
+    def __repr__(self):
+        return f"<QueryLog(id={self.id}, kind={self.kind})>"
@@ -0,0 +1,17 @@
+from sqlalchemy import Column, Date, String, SmallInteger, LargeBinary, DateTime
+from datetime import datetime
+from database.models.base import Base
+
+
+class SnapshotSketch(Base):
+    """HyperLogLog registers of videos per UTC day and metric; NULL registers mark a day to rebuild"""
+    __tablename__ = "snapshot_sketches"
+
+    day = Column(Date, primary_key=True)
+    metric = Column(String(32), primary_key=True)
+    precision = Column(SmallInteger, nullable=False)
+    registers = Column(LargeBinary, nullable=True)
+    updated_at = Column(DateTime(timezone=True), default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<SnapshotSketch(day={self.day}, metric={self.metric})>"
@@ -17,8 +17,8 @@ class Video(Base):
     created_at = Column(DateTime(timezone=True), default=datetime.utcnow)
     updated_at = Column(DateTime(timezone=True), default=datetime.utcnow, onupdate=datetime.utcnow)
 
-    # Relationship to snapshots
-    snapshots = relationship("VideoSnapshot", back_populates="video", lazy="selectin")
+    # Hundreds of hourly rows per video: load them through database.repositories, never implicitly
+    snapshots = relationship("VideoSnapshot", back_populates="video", lazy="raise")
 
     # Indexes for fast queries
     __table_args__ = (
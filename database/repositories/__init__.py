@@ -0,0 +1,6 @@
+"""
+database.repositories
+"""
+from database.repositories.video import SnapshotPage, VideoRepository
+
+__all__ = ["SnapshotPage", "VideoRepository"]
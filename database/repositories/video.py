@@ -0,0 +1,104 @@
+"""
+Video and snapshot access with explicit loading
+
+`Video.snapshots` is lazy="raise": a video never drags its hourly
+snapshots along. Ask for them explicitly, as one page at a time
+(`snapshot_page`), a stream (`stream_snapshots`) or eagerly for a few
+videos (`get(..., with_snapshots=True)`). Bulk reads are async iterators
+over a server-side cursor fetching `batch_size` rows at a time.
+"""
+from dataclasses import dataclass
+from datetime import datetime
+from typing import AsyncIterator, List, Optional, Sequence
+
+from sqlalchemy import Select, func, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+
+from database.models import Video, VideoSnapshot
+
+
+@dataclass
+class SnapshotPage:
+    snapshots: List[VideoSnapshot]
+    next_cursor: Optional[tuple]  # (created_at, id) of the last row, None on the last page
+
+
+class VideoRepository:
+
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def get(self, video_id: str, with_snapshots: bool = False) -> Optional[Video]:
+        statement = select(Video).where(Video.id == video_id)
+        if with_snapshots:
+            statement = statement.options(selectinload(Video.snapshots))
+        return (await self.session.execute(statement)).scalar_one_or_none()
+
+    async def get_many(self, video_ids: Sequence[str]) -> List[Video]:
+        result = await self.session.execute(select(Video).where(Video.id.in_(video_ids)))
+        return list(result.scalars())
+
+    async def by_creator(self, creator_id: str, limit: int = 100, offset: int = 0) -> List[Video]:
+        result = await self.session.execute(
+            select(Video)
+            .where(Video.creator_id == creator_id)
+            .order_by(Video.video_created_at, Video.id)
+            .limit(limit)
+            .offset(offset)
+        )
+        return list(result.scalars())
+
+    async def count_snapshots(self, video_id: str) -> int:
+        return await self.session.scalar(
+            select(func.count()).select_from(VideoSnapshot).where(VideoSnapshot.video_id == video_id)
+        )
+
+    async def snapshot_page(self, video_id: str, limit: int = 100, cursor: Optional[tuple] = None) -> SnapshotPage:
+        """Keyset page in (created_at, id) order; pass the previous page's `next_cursor`"""
+        statement = (
+            select(VideoSnapshot)
+            .where(VideoSnapshot.video_id == video_id)
+            .order_by(VideoSnapshot.created_at, VideoSnapshot.id)
+            .limit(limit + 1)
+        )
+        if cursor is not None:
+            statement = statement.where(tuple_(VideoSnapshot.created_at, VideoSnapshot.id) > tuple(cursor))
+
+        snapshots = list((await self.session.execute(statement)).scalars())
+        if len(snapshots) <= limit:
+            return SnapshotPage(snapshots, None)
+        snapshots = snapshots[:limit]
+        return SnapshotPage(snapshots, (snapshots[-1].created_at, snapshots[-1].id))
+
+    def stream_snapshots(self, video_id: str, batch_size: int = 500) -> AsyncIterator[VideoSnapshot]:
+        return self._stream(
+            select(VideoSnapshot)
+            .where(VideoSnapshot.video_id == video_id)
+            .order_by(VideoSnapshot.created_at, VideoSnapshot.id),
+            batch_size,
+        )
+
+    def iter_videos(self, creator_id: Optional[str] = None, batch_size: int = 1000) -> AsyncIterator[Video]:
+        statement = select(Video).order_by(Video.id)
+        if creator_id is not None:
+            statement = statement.where(Video.creator_id == creator_id)
+        return self._stream(statement, batch_size)
+
+    def iter_snapshots(self, since: Optional[datetime] = None, until: Optional[datetime] = None,
+                       batch_size: int = 5000) -> AsyncIterator[VideoSnapshot]:
+        """Snapshots with since <= created_at < until"""
+        statement = select(VideoSnapshot)
+        if since is not None:
+            statement = statement.where(VideoSnapshot.created_at >= since)
+        if until is not None:
+            statement = statement.where(VideoSnapshot.created_at < until)
+        return self._stream(statement, batch_size)
+
+    async def _stream(self, statement: Select, batch_size: int) -> AsyncIterator:
+        result = await self.session.stream(statement.execution_options(yield_per=batch_size))
+        try:
+            async for row in result.scalars():
+                yield row
+        finally:
+            await result.close()
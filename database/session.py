@@ -1,52 +1,237 @@
+import asyncio
+import logging
+import random
+from dataclasses import dataclass
+from pathlib import Path
+
 import asyncpg
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine, async_sessionmaker
 from contextlib import asynccontextmanager
-from typing import AsyncGenerator, Optional
+from typing import AsyncGenerator, AsyncIterator, List, Optional
 
 from core.config import config
 
 
-engine = create_async_engine(
-    config.async_database_url,
-    echo=False,
-    pool_size=config.db_pool_min_size,
-    max_overflow=config.db_pool_max_size - config.db_pool_min_size,
-    pool_pre_ping=True,
-)
+logger = logging.getLogger(__name__)
+
+ALEMBIC_INI = Path(__file__).resolve().parent.parent / "alembic.ini"
+
+_engine: Optional[AsyncEngine] = None
+_replicas: Optional[List["Replica"]] = None
+_shards: Optional[List[AsyncEngine]] = None
+_health_task: Optional[asyncio.Task] = None
 
+# Bound to the engine on first use, so importing this module never connects
 async_session_maker = async_sessionmaker(
-    engine,
     class_=AsyncSession,
     expire_on_commit=False,
     autocommit=False,
     autoflush=False,
 )
 
+LAG_SQL = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+"""
+
+
+def _create_engine(url: str) -> AsyncEngine:
+    return create_async_engine(
+        url,
+        echo=False,
+        pool_size=config.db_pool_min_size,
+        max_overflow=config.db_pool_max_size - config.db_pool_min_size,
+        pool_pre_ping=True,
+    )
+
+
+def get_engine() -> AsyncEngine:
+    """Return the process-wide primary engine, creating it on first call"""
+    global _engine
+
+    if _engine is None:
+        _engine = _create_engine(config.database_url)
+        async_session_maker.configure(bind=_engine)
+    return _engine
+
+
+@dataclass
+class Replica:
+    url: str
+    engine: AsyncEngine
+    outstanding: int = 0
+    healthy: bool = True
+    lag: float = 0.0
+
+    @property
+    def name(self) -> str:
+        return self.engine.url.render_as_string(hide_password=True)
+
+
+def get_replicas() -> List[Replica]:
+    global _replicas
+
+    if _replicas is None:
+        _replicas = [Replica(url, _create_engine(url)) for url in config.db_replica_urls]
+    return _replicas
+
+
+def get_shards() -> List[AsyncEngine]:
+    """Engines for DB_SHARD_URLS, in shard number order"""
+    global _shards
+
+    if _shards is None:
+        _shards = [_create_engine(url) for url in config.db_shard_urls]
+    return _shards
+
 
 class DatabasePool:
-    
-    _pool: Optional[asyncpg.Pool] = None
-    
+    """Raw asyncpg access backed by the same pools as the ORM engine
+
+    Writes and the ORM always use the primary. `acquire(readonly=True)` sends
+    analytics reads to the healthy replica with the fewest queries in
+    flight, and to the primary when no replica is usable. In sharded mode
+    analytics data is read through `acquire_shard` instead.
+    """
+
     @classmethod
-    async def get_pool(cls) -> asyncpg.Pool:
-        if cls._pool is None:
-            cls._pool = await asyncpg.create_pool(
-                dsn=config.asyncpg_dsn,
-                min_size=config.db_pool_min_size,
-                max_size=config.db_pool_max_size,
-                command_timeout=60,
-            )
-        return cls._pool
-    
+    @asynccontextmanager
+    async def acquire(cls, readonly: bool = False) -> AsyncIterator[asyncpg.Connection]:
+        replica = cls._pick_replica() if readonly else None
+        if replica is None:
+            async with get_engine().connect() as conn:
+                raw = await conn.get_raw_connection()
+                yield raw.driver_connection
+            return
+
+        replica.outstanding += 1
+        try:
+            conn = None
+            try:
+                conn = await replica.engine.connect()
+            except (OSError, asyncpg.PostgresError, SQLAlchemyError):
+                logger.exception("Replica %s unavailable, ejecting", replica.name)
+                replica.healthy = False
+
+            if conn is None:
+                async with cls.acquire() as primary:
+                    yield primary
+                return
+
+            try:
+                raw = await conn.get_raw_connection()
+                yield raw.driver_connection
+            finally:
+                await conn.close()
+        finally:
+            replica.outstanding -= 1
+
+    @classmethod
+    @asynccontextmanager
+    async def acquire_shard(cls, index: int) -> AsyncIterator[asyncpg.Connection]:
+        async with get_shards()[index].connect() as conn:
+            raw = await conn.get_raw_connection()
+            yield raw.driver_connection
+
+    @classmethod
+    def _pick_replica(cls) -> Optional[Replica]:
+        healthy = [replica for replica in get_replicas() if replica.healthy]
+        if not healthy:
+            return None
+        fewest = min(replica.outstanding for replica in healthy)
+        return random.choice([replica for replica in healthy if replica.outstanding == fewest])
+
+    @classmethod
+    async def warm(cls, size: Optional[int] = None) -> None:
+        """Open `size` connections concurrently and return them to the pool"""
+        size = size or config.db_pool_min_size
+
+        async def fill(engine: AsyncEngine) -> None:
+            conns = [engine.connect() for _ in range(size)]
+            await asyncio.gather(*(conn.start() for conn in conns))
+            await asyncio.gather(*(conn.close() for conn in conns))
+
+        replicas = get_replicas()
+        results = await asyncio.gather(
+            fill(get_engine()),
+            *(fill(shard) for shard in get_shards()),
+            *(fill(replica.engine) for replica in replicas),
+            return_exceptions=True,
+        )
+        for replica, result in zip(replicas, results[len(results) - len(replicas):]):
+            if isinstance(result, Exception):
+                logger.warning("Replica %s not reachable at startup: %s", replica.name, result)
+                replica.healthy = False
+        for result in results[:len(results) - len(replicas)]:
+            if isinstance(result, BaseException):
+                raise result
+
+    @classmethod
+    def start_health_checks(cls) -> None:
+        global _health_task
+
+        if get_replicas() and _health_task is None:
+            _health_task = asyncio.create_task(cls._health_loop())
+
+    @classmethod
+    async def check_replicas(cls) -> None:
+        """Measure replay lag and eject replicas that are down or too far behind"""
+        async def check(replica: Replica) -> None:
+            try:
+                async with replica.engine.connect() as conn:
+                    replica.lag = float(await asyncio.wait_for(conn.scalar(text(LAG_SQL)), timeout=2))
+                healthy = replica.lag <= config.db_replica_max_lag
+            except Exception:
+                healthy = False
+
+            if healthy != replica.healthy:
+                logger.warning(
+                    "Replica %s %s (lag %.1fs)",
+                    replica.name, "back in rotation" if healthy else "ejected", replica.lag,
+                )
+            replica.healthy = healthy
+
+        await asyncio.gather(*(check(replica) for replica in get_replicas()))
+
+    @classmethod
+    async def _health_loop(cls) -> None:
+        while True:
+            await cls.check_replicas()
+            await asyncio.sleep(config.db_replica_check_interval)
+
+    @classmethod
+    def replica_status(cls) -> List[dict]:
+        return [
+            {"replica": r.name, "healthy": r.healthy, "lag": r.lag, "outstanding": r.outstanding}
+            for r in get_replicas()
+        ]
+
     @classmethod
     async def close(cls):
-        if cls._pool:
-            await cls._pool.close()
-            cls._pool = None
+        global _engine, _replicas, _shards, _health_task
+
+        if _health_task is not None:
+            _health_task.cancel()
+            _health_task = None
+        for replica in _replicas or []:
+            await replica.engine.dispose()
+        _replicas = None
+        for shard in _shards or []:
+            await shard.dispose()
+        _shards = None
+        if _engine is not None:
+            await _engine.dispose()
+            _engine = None
 
 
 @asynccontextmanager
 async def get_session() -> AsyncGenerator[AsyncSession, None]:
+    get_engine()
     async with async_session_maker() as session:
         try:
             yield session
@@ -57,6 +242,7 @@ async def get_session() -> AsyncGenerator[AsyncSession, None]:
 
 
 async def get_db() -> AsyncGenerator[AsyncSession, None]:
+    get_engine()
     async with async_session_maker() as session:
         try:
             yield session
@@ -64,13 +250,35 @@ async def get_db() -> AsyncGenerator[AsyncSession, None]:
             await session.close()
 
 
+def _alembic_head() -> Optional[str]:
+    from alembic.config import Config as AlembicConfig
+    from alembic.script import ScriptDirectory
+
+    script = ScriptDirectory.from_config(AlembicConfig(str(ALEMBIC_INI)))
+    return script.get_current_head()
+
+
+async def _current_revision() -> Optional[str]:
+    async with get_engine().connect() as conn:
+        has_table = await conn.scalar(text("SELECT to_regclass('alembic_version') IS NOT NULL"))
+        if not has_table:
+            return None
+        return await conn.scalar(text("SELECT version_num FROM alembic_version"))
+
+
 async def init_db():
-    from database.models import Base
-    
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+    """Fail fast unless the schema is at the Alembic head"""
+    head, current = await asyncio.gather(
+        asyncio.to_thread(_alembic_head),
+        _current_revision(),
+    )
+
+    if current != head:
+        raise RuntimeError(
+            f"Schema revision {current} does not match head {head}: run `alembic upgrade head`"
+        )
+    logger.info("Schema at Alembic head %s", head)
 
 
 async def close_db():
     await DatabasePool.close()
-    await engine.dispose()
\ No newline at end of file
@@ -0,0 +1,43 @@
+"""
+Placement of analytics rows across DB_SHARD_URLS
+
+A video and all of its snapshots live on the shard of its creator, so joins
+between `videos` and `video_snapshots` and COUNT(DISTINCT video_id /
+creator_id) stay shard-local. crc32 keeps the placement stable across
+processes and Python versions.
+"""
+import zlib
+from typing import Dict, List, Tuple
+
+from sqlalchemy.engine import make_url
+
+
+def normalize_creator_id(creator_id: str) -> str:
+    """Canonical form the importer stores and every router hashes: 32 lowercase hex digits"""
+    return creator_id.replace("-", "").lower()
+
+
+def shard_for(creator_id: str, shards: int) -> int:
+    return zlib.crc32(normalize_creator_id(creator_id).encode()) % shards
+
+
+def asyncpg_dsn(url: str) -> str:
+    """DATABASE_URL-style SQLAlchemy URL as a plain asyncpg DSN"""
+    return make_url(url).set(drivername="postgresql").render_as_string(hide_password=False)
+
+
+def partition_records(video_records: List[Tuple], snapshot_records: List[Tuple],
+                      shards: int) -> List[Tuple[List[Tuple], List[Tuple]]]:
+    """Split importer records (id, creator_id, ...) / (id, video_id, ...) by shard"""
+    parts: List[Tuple[List[Tuple], List[Tuple]]] = [([], []) for _ in range(shards)]
+    video_shard: Dict[str, int] = {}
+
+    for record in video_records:
+        index = shard_for(record[1], shards)
+        video_shard[record[0]] = index
+        parts[index][0].append(record)
+
+    for record in snapshot_records:
+        parts[video_shard[record[1]]][1].append(record)
+
+    return parts
@@ -1,35 +1,64 @@
 import asyncio
 import logging
+import time
 from aiogram import Bot, Dispatcher
 from aiogram.enums import ParseMode
 from dotenv import load_dotenv
 
 from core.config import config
 from core.logging import setup_logging
-from database.database import init_db
+from database.session import DatabasePool, init_db, close_db
 from bot.handlers import register_handlers
-from bot.middlewares import AuthMiddleware, ThrottlingMiddleware
+from services.chart_service import chart_service
+from services.gemini_service import gemini_service
+from services.outbox import outbox
+from services.query_log import query_log
+from services.video_store import video_store
+from bot.middlewares import AuthMiddleware, InFlightMiddleware, RequestContextMiddleware, ThrottlingMiddleware
 
 load_dotenv()
 setup_logging()
 
 logger = logging.getLogger(__name__)
 
-async def main():
-    """Initialize and start the bot"""
-    bot = Bot(token=config.bot_token)
+def build_dispatcher() -> Dispatcher:
+    """Middleware chain and handlers, shared with scripts/load_test.py"""
     dp = Dispatcher()
+    dp.update.outer_middleware(RequestContextMiddleware())
     dp.message.middleware(ThrottlingMiddleware(rate_limit=0.5))
     dp.message.middleware(AuthMiddleware())
-    
-    await init_db()
-    logger.info("Database initialized")
-    
+    dp.message.middleware(InFlightMiddleware())
     register_handlers(dp)
+    return dp
+
+async def main():
+    """Initialize and start the bot"""
+    started = time.perf_counter()
+
+    bot = Bot(token=config.bot_token)
+    warmup = asyncio.create_task(DatabasePool.warm())
+
+    dp = build_dispatcher()
     logger.info("Handlers registered")
-    
-    logger.info("Bot started")
-    await dp.start_polling(bot)
+
+    await asyncio.gather(warmup, init_db())
+    logger.info("Database initialized")
+    DatabasePool.start_health_checks()
+    query_log.start()
+    outbox.start(bot)
+
+    if video_store.enabled:
+        await video_store.refresh()
+
+    logger.info("Bot started in %.1f ms", (time.perf_counter() - started) * 1000)
+    try:
+        await dp.start_polling(bot)
+    finally:
+        await outbox.close()
+        await query_log.close()
+        await gemini_service.close()
+        chart_service.close()
+        await close_db()
 
 if __name__ == "__main__":
     try:
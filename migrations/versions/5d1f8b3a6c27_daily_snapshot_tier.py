@@ -0,0 +1,44 @@
+"""Daily snapshot tier
+
+Revision ID: 5d1f8b3a6c27
+Revises: e8a5c7f1d392
+Create Date: 2026-10-19 16:12:38.402716
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from database.compact_schema import DAILY_INDEX_SQL, DAILY_STORAGE_SQL, TIERED_VIEWS_SQL, VIEWS_SQL
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5d1f8b3a6c27'
+down_revision: Union[str, Sequence[str], None] = 'e8a5c7f1d392'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for statement in DAILY_STORAGE_SQL + DAILY_INDEX_SQL + TIERED_VIEWS_SQL:
+        op.execute(statement)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Daily rows go back as one snapshot per video per day
+    op.execute("""
+        INSERT INTO snapshot_rows (id, created_at, updated_at, video_idx,
+                                   views_count, likes_count, comments_count, reports_count,
+                                   delta_views_count, delta_likes_count, delta_comments_count, delta_reports_count)
+        SELECT id, created_at, updated_at, video_idx,
+               views_count, likes_count, comments_count, reports_count,
+               delta_views_count, delta_likes_count, delta_comments_count, delta_reports_count
+        FROM daily_snapshot_rows
+        ON CONFLICT (id) DO NOTHING
+    """)
+    op.execute("DROP VIEW video_snapshots")
+    op.execute(VIEWS_SQL[1])
+    op.drop_table('daily_snapshot_rows')
@@ -0,0 +1,34 @@
+"""Data version added
+
+Revision ID: 7c2e9d41a5b0
+Revises: 3a85b3d6b186
+Create Date: 2026-10-19 10:12:31.402117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c2e9d41a5b0'
+down_revision: Union[str, Sequence[str], None] = '3a85b3d6b186'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('data_version',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('version', sa.BigInteger(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.execute("INSERT INTO data_version (id, version, updated_at) VALUES (1, 0, NOW())")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('data_version')
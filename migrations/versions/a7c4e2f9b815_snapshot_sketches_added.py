@@ -0,0 +1,35 @@
+"""Snapshot sketches added
+
+Revision ID: a7c4e2f9b815
+Revises: 5d1f8b3a6c27
+Create Date: 2026-10-19 17:03:51.207164
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a7c4e2f9b815'
+down_revision: Union[str, Sequence[str], None] = '5d1f8b3a6c27'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('snapshot_sketches',
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('metric', sa.String(length=32), nullable=False),
+    sa.Column('precision', sa.SmallInteger(), nullable=False),
+    sa.Column('registers', sa.LargeBinary(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+    sa.PrimaryKeyConstraint('day', 'metric')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('snapshot_sketches')
@@ -0,0 +1,89 @@
+"""Compact keys for videos and snapshots
+
+Revision ID: b41f0c2d8e73
+Revises: 7c2e9d41a5b0
+Create Date: 2026-10-19 14:02:47.118305
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from database.compact_schema import INDEX_SQL, MIGRATE_SQL, STORAGE_SQL, VIEWS_SQL
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b41f0c2d8e73'
+down_revision: Union[str, Sequence[str], None] = '7c2e9d41a5b0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for statement in STORAGE_SQL + MIGRATE_SQL:
+        op.execute(statement)
+
+    op.drop_table('video_snapshots')
+    op.drop_table('videos')
+
+    for statement in VIEWS_SQL + INDEX_SQL:
+        op.execute(statement)
+
+    op.execute("ANALYZE creators")
+    op.execute("ANALYZE video_rows")
+    op.execute("ANALYZE snapshot_rows")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.create_table('videos_text',
+    sa.Column('id', sa.String(length=36), nullable=False),
+    sa.Column('creator_id', sa.String(length=32), nullable=False),
+    sa.Column('video_created_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('views_count', sa.Integer(), nullable=True),
+    sa.Column('likes_count', sa.Integer(), nullable=True),
+    sa.Column('comments_count', sa.Integer(), nullable=True),
+    sa.Column('reports_count', sa.Integer(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+    sa.PrimaryKeyConstraint('id', name='videos_pkey')
+    )
+    op.create_table('video_snapshots_text',
+    sa.Column('id', sa.String(length=32), nullable=False),
+    sa.Column('video_id', sa.String(length=36), nullable=False),
+    sa.Column('views_count', sa.Integer(), nullable=True),
+    sa.Column('likes_count', sa.Integer(), nullable=True),
+    sa.Column('comments_count', sa.Integer(), nullable=True),
+    sa.Column('reports_count', sa.Integer(), nullable=True),
+    sa.Column('delta_views_count', sa.Integer(), nullable=True),
+    sa.Column('delta_likes_count', sa.Integer(), nullable=True),
+    sa.Column('delta_comments_count', sa.Integer(), nullable=True),
+    sa.Column('delta_reports_count', sa.Integer(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+    sa.PrimaryKeyConstraint('id', name='video_snapshots_pkey')
+    )
+    op.execute("INSERT INTO videos_text SELECT * FROM videos")
+    op.execute("INSERT INTO video_snapshots_text SELECT * FROM video_snapshots")
+
+    op.execute("DROP VIEW video_snapshots")
+    op.execute("DROP VIEW videos")
+    op.drop_table('snapshot_rows')
+    op.drop_table('video_rows')
+    op.drop_table('creators')
+
+    op.rename_table('videos_text', 'videos')
+    op.rename_table('video_snapshots_text', 'video_snapshots')
+    op.create_foreign_key('video_snapshots_video_id_fkey', 'video_snapshots', 'videos',
+                          ['video_id'], ['id'], ondelete='CASCADE')
+
+    op.create_index('idx_videos_creator_video_date', 'videos', ['creator_id', 'video_created_at'], unique=False)
+    op.create_index('idx_videos_video_created_at', 'videos', ['video_created_at'], unique=False)
+    op.create_index('idx_videos_views_count', 'videos', ['views_count'], unique=False)
+    op.create_index(op.f('ix_videos_creator_id'), 'videos', ['creator_id'], unique=False)
+    op.create_index('idx_snapshots_created_at', 'video_snapshots', ['created_at'], unique=False)
+    op.create_index('idx_snapshots_delta_views_positive', 'video_snapshots', ['delta_views_count'], unique=False, postgresql_where='delta_views_count > 0')
+    op.create_index('idx_snapshots_video_created', 'video_snapshots', ['video_id', 'created_at'], unique=False)
+    op.create_index('idx_snapshots_video_id', 'video_snapshots', ['video_id'], unique=False)
@@ -0,0 +1,44 @@
+"""Query log added
+
+Revision ID: e8a5c7f1d392
+Revises: b41f0c2d8e73
+Create Date: 2026-10-19 15:26:03.554871
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e8a5c7f1d392'
+down_revision: Union[str, Sequence[str], None] = 'b41f0c2d8e73'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('query_log',
+    sa.Column('id', sa.BigInteger(), autoincrement=True, nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('request_id', sa.String(length=32), nullable=True),
+    sa.Column('kind', sa.String(length=16), nullable=False),
+    sa.Column('question', sa.Text(), nullable=False),
+    sa.Column('sql', sa.Text(), nullable=True),
+    sa.Column('shape', sa.Text(), nullable=True),
+    sa.Column('result', sa.BigInteger(), nullable=True),
+    sa.Column('error', sa.Text(), nullable=True),
+    sa.Column('llm_ms', sa.Float(), nullable=True),
+    sa.Column('db_ms', sa.Float(), nullable=True),
+    sa.Column('total_ms', sa.Float(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('idx_query_log_created_at', 'query_log', ['created_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('idx_query_log_created_at', table_name='query_log')
+    op.drop_table('query_log')
@@ -0,0 +1,93 @@
+"""
+Throughput of live snapshot ingestion
+
+    python -m scripts.benchmark_ingest --rows 200000 --producers 8 --request-rows 500
+
+Producers submit synthetic snapshots of existing videos concurrently, the
+way scripts/ingest_server.py does for parallel POSTs, and the report shows
+rows/s and submit latency for the configured batch size. The rows are real
+inserts that move `videos` counters forward: run it against a scratch
+database, or pass --cleanup to delete the inserted snapshots afterwards
+(counters on `videos` are not restored).
+"""
+import argparse
+import asyncio
+import statistics
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+import sys
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from database.session import DatabasePool, close_db
+from services.ingestion import SnapshotIngestor
+from services.sql_shapes import COUNT_COLUMNS
+
+
+async def benchmark(total: int, producers: int, request_rows: int, batch_rows: int, cleanup: bool) -> None:
+    async with DatabasePool.acquire() as conn:
+        video_ids = [row["id"] for row in await conn.fetch("SELECT id::text FROM videos LIMIT 10000")]
+    if not video_ids:
+        print("No videos to snapshot; import data first")
+        return
+
+    started_at = datetime.now(timezone.utc) + timedelta(days=1)
+    ids = []
+
+    def request(offset: int) -> list:
+        rows = []
+        for n in range(offset, min(offset + request_rows, total)):
+            snapshot_id = uuid.uuid4().hex
+            ids.append(snapshot_id)
+            created_at = started_at + timedelta(seconds=n)
+            rows.append((snapshot_id, video_ids[n % len(video_ids)], *(n for _ in COUNT_COLUMNS), created_at, created_at))
+        return rows
+
+    ingestor = SnapshotIngestor(batch_rows=batch_rows, max_pending_rows=batch_rows * 10)
+    ingestor.start()
+    offsets = iter(range(0, total, request_rows))
+    latencies = []
+
+    async def produce() -> None:
+        for offset in offsets:
+            rows = request(offset)
+            began = time.perf_counter()
+            await ingestor.submit(rows)
+            latencies.append(time.perf_counter() - began)
+
+    began = time.perf_counter()
+    await asyncio.gather(*(produce() for _ in range(producers)))
+    elapsed = time.perf_counter() - began
+    await ingestor.close()
+
+    ordered = sorted(latencies)
+    print(f"Rows:        {total} in {elapsed:.2f} s ({total / elapsed:,.0f} rows/s)")
+    print(f"Inserted:    {ingestor.inserted}, skipped {ingestor.skipped}, {ingestor.batches} transactions")
+    print(f"Submit:      p50 {statistics.median(ordered) * 1000:.1f} ms  "
+          f"p99 {ordered[min(int(0.99 * len(ordered)), len(ordered) - 1)] * 1000:.1f} ms")
+
+    if cleanup:
+        async with DatabasePool.acquire() as conn:
+            layout = await conn.fetchval("SELECT to_regclass('snapshot_rows') IS NOT NULL")
+            if layout:
+                await conn.execute("DELETE FROM snapshot_rows WHERE id = ANY($1::uuid[])", ids)
+            else:
+                await conn.execute("DELETE FROM video_snapshots WHERE id = ANY($1::text[])", ids)
+    await close_db()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Measure snapshot ingestion throughput")
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--producers", type=int, default=8, help="concurrent submitters")
+    parser.add_argument("--request-rows", type=int, default=500, help="rows per submit")
+    parser.add_argument("--batch-rows", type=int, default=20000, help="rows per transaction")
+    parser.add_argument("--cleanup", action="store_true", help="delete the inserted snapshots afterwards")
+    args = parser.parse_args()
+    asyncio.run(benchmark(args.rows, args.producers, args.request_rows, args.batch_rows, args.cleanup))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Memory and latency of loading videos with and without their snapshots
+
+    python -m scripts.benchmark_videos --videos 200
+
+"eager" is what every Video load did while `Video.snapshots` was
+lazy="selectin"; the other rows go through database.repositories. Peak
+memory is measured with tracemalloc, so absolute timings are inflated.
+"""
+import argparse
+import asyncio
+import gc
+import time
+import tracemalloc
+from pathlib import Path
+import sys
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from sqlalchemy import select, text
+from sqlalchemy.orm import selectinload
+
+from database.models import Video
+from database.repositories import VideoRepository
+from database.session import async_session_maker, close_db, get_engine
+
+
+async def measure(label: str, work) -> None:
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    async with async_session_maker() as session:
+        rows = await work(session)
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:44} {elapsed * 1000:10.1f} ms  peak {peak / 2 ** 20:8.2f} MiB  rows {rows}")
+
+
+async def benchmark(videos: int):
+    get_engine()
+    async with async_session_maker() as session:
+        ids = list((await session.execute(select(Video.id).order_by(Video.id).limit(videos))).scalars())
+        busiest = await session.scalar(
+            text("SELECT video_id FROM video_snapshots GROUP BY video_id ORDER BY COUNT(*) DESC LIMIT 1")
+        )
+    if not ids:
+        print("No videos, run scripts/import_data.py first")
+        return
+    video_id = busiest or ids[0]
+
+    async def eager_many(session):
+        result = await session.execute(select(Video).where(Video.id.in_(ids)).options(selectinload(Video.snapshots)))
+        loaded = list(result.scalars())
+        return len(loaded) + sum(len(video.snapshots) for video in loaded)
+
+    async def plain_many(session):
+        return len(await VideoRepository(session).get_many(ids))
+
+    async def eager_one(session):
+        video = await VideoRepository(session).get(video_id, with_snapshots=True)
+        return 1 + len(video.snapshots)
+
+    async def plain_one(session):
+        return int(await VideoRepository(session).get(video_id) is not None)
+
+    async def first_page(session):
+        return len((await VideoRepository(session).snapshot_page(video_id, limit=100)).snapshots)
+
+    async def all_pages(session):
+        repository, rows, cursor = VideoRepository(session), 0, None
+        while True:
+            page = await repository.snapshot_page(video_id, limit=100, cursor=cursor)
+            rows += len(page.snapshots)
+            session.expunge_all()
+            if page.next_cursor is None:
+                return rows
+            cursor = page.next_cursor
+
+    async def stream_one(session):
+        return sum([1 async for _ in VideoRepository(session).stream_snapshots(video_id)])
+
+    async def stream_videos(session):
+        rows = 0
+        async for _ in VideoRepository(session).iter_videos():
+            rows += 1
+        return rows
+
+    async def list_videos(session):
+        return len(list((await session.execute(select(Video))).scalars()))
+
+    print(f"{len(ids)} videos, single-video rows use {video_id} (most snapshots)\n")
+    await measure(f"eager: {len(ids)} videos with snapshots", eager_many)
+    await measure(f"repository: {len(ids)} videos", plain_many)
+    await measure("eager: one video with snapshots", eager_one)
+    await measure("repository: one video", plain_one)
+    await measure("repository: first snapshot page (100)", first_page)
+    await measure("repository: all snapshot pages", all_pages)
+    await measure("repository: streamed snapshots", stream_one)
+    await measure("all videos as one list", list_videos)
+    await measure("repository: all videos, yield_per", stream_videos)
+
+    await close_db()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare eager snapshot loading with the video repository")
+    parser.add_argument("--videos", type=int, default=200, help="videos in the multi-video rows")
+    args = parser.parse_args()
+
+    asyncio.run(benchmark(args.videos))
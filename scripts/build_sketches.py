@@ -0,0 +1,80 @@
+"""
+Build per-day HyperLogLog sketches for distinct-video questions
+
+    python -m scripts.build_sketches            # days marked dirty by ingestion
+    python -m scripts.build_sketches --all      # every day, e.g. after changing HLL_PRECISION
+    python -m scripts.build_sketches --check 2025-11-01 2025-11-30
+"""
+import argparse
+import asyncio
+import time
+from datetime import date
+from pathlib import Path
+import sys
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import asyncpg
+from core.config import config
+from database.session import close_db
+from services.sketch_store import build_sketches, rebuild_dirty, sketch_store
+from services.sql_shapes import DELTA_COLUMNS, parse_aggregate_query
+
+
+async def build(rebuild_all: bool):
+    conn = await asyncpg.connect(dsn=config.asyncpg_dsn)
+
+    try:
+        started = time.perf_counter()
+        if rebuild_all:
+            days = await build_sketches(conn, config.hll_precision)
+        else:
+            days = await rebuild_dirty(conn, config.hll_precision)
+        print(f"Built sketches for {days} days in {time.perf_counter() - started:.2f} s")
+    finally:
+        await conn.close()
+
+
+async def check(first: date, last: date):
+    """Estimated vs exact COUNT(DISTINCT video_id) for the range"""
+    sketch_store.enabled = True
+    conn = await asyncpg.connect(dsn=config.asyncpg_dsn)
+
+    try:
+        for column in (None, *DELTA_COLUMNS):
+            sql = (
+                f"SELECT COUNT(DISTINCT video_id) FROM video_snapshots "
+                f"WHERE created_at::date BETWEEN '{first}' AND '{last}'"
+            )
+            if column:
+                sql += f" AND {column} > 0"
+
+            started = time.perf_counter()
+            estimate = await sketch_store.answer(parse_aggregate_query(sql))
+            sketch_ms = (time.perf_counter() - started) * 1000
+
+            started = time.perf_counter()
+            exact = await conn.fetchval(sql)
+            exact_ms = (time.perf_counter() - started) * 1000
+
+            if estimate is None:
+                print(f"{column or 'all':22} sketches unavailable (dirty or not built), exact {exact}")
+                continue
+            error = (estimate - exact) / exact if exact else 0.0
+            print(
+                f"{column or 'all':22} estimate {estimate:9} ({sketch_ms:7.2f} ms)  "
+                f"exact {exact:9} ({exact_ms:8.1f} ms)  error {error:+.2%} (expected ±{estimate.relative_error:.2%})"
+            )
+    finally:
+        await conn.close()
+        await close_db()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build distinct-video sketches")
+    parser.add_argument("--all", action="store_true", help="rebuild every day, not only dirty ones")
+    parser.add_argument("--check", nargs=2, type=date.fromisoformat, metavar=("FROM", "TO"),
+                        help="compare estimates with exact counts for a date range")
+    args = parser.parse_args()
+
+    asyncio.run(check(*args.check) if args.check else build(args.all))
@@ -0,0 +1,64 @@
+import asyncio
+import time
+from pathlib import Path
+import sys
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from database.session import DatabasePool, close_db
+from services.video_store import video_store
+
+
+async def sample_queries() -> list:
+    async with DatabasePool.acquire() as conn:
+        creator_id = await conn.fetchval("SELECT creator_id FROM videos LIMIT 1")
+        first_day = await conn.fetchval("SELECT MIN(video_created_at)::date FROM videos")
+    
+    queries = [
+        "SELECT COUNT(*) FROM videos",
+        "SELECT COUNT(*) FROM videos WHERE views_count > 100000",
+        "SELECT COALESCE(SUM(likes_count), 0) FROM videos",
+        "SELECT COALESCE(SUM(views_count), 0) FROM videos WHERE reports_count >= 1",
+        "SELECT COUNT(DISTINCT creator_id) FROM videos",
+    ]
+    
+    if creator_id and first_day:
+        day = first_day.isoformat()
+        queries += [
+            f"SELECT COUNT(*) FROM videos WHERE creator_id = '{creator_id}'",
+            f"SELECT COUNT(*) FROM videos WHERE creator_id = '{creator_id}' AND video_created_at::date BETWEEN '{day}' AND '2025-12-31'",
+            f"SELECT COUNT(*) FROM videos WHERE video_created_at::date = '{day}'",
+            f"SELECT COUNT(*) FROM videos WHERE video_created_at::date > '{day}' AND views_count < 1000",
+            f"SELECT COALESCE(SUM(comments_count), 0) FROM videos WHERE video_created_at >= '{day}'",
+        ]
+    
+    return queries
+
+
+async def check():
+    await video_store.refresh()
+    mismatches = 0
+    
+    for sql in await sample_queries():
+        started = time.perf_counter()
+        fast = await video_store.try_answer(sql)
+        fast_ms = (time.perf_counter() - started) * 1000
+        
+        started = time.perf_counter()
+        async with DatabasePool.acquire() as conn:
+            expected = await conn.fetchval(sql) or 0
+        sql_ms = (time.perf_counter() - started) * 1000
+        
+        status = "OK" if fast == expected else "MISMATCH"
+        if fast != expected:
+            mismatches += 1
+        print(f"{status:8} store={fast} ({fast_ms:.3f} ms) postgres={expected} ({sql_ms:.1f} ms)  {sql}")
+    
+    await close_db()
+    
+    print(f"\n{mismatches} mismatches")
+    return mismatches
+
+
+if __name__ == "__main__":
+    sys.exit(1 if asyncio.run(check()) else 0)
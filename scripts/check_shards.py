@@ -0,0 +1,80 @@
+"""
+Compare scatter-gather answers with an unsharded copy of the same data
+
+    createdb shard0; createdb shard1; createdb shard2
+    DB_SHARD_URLS= python -m scripts.import_data          # reference copy in DATABASE_URL
+    python -m scripts.import_data                         # with DB_SHARD_URLS set
+    python -m scripts.check_shards
+"""
+import asyncio
+import time
+from pathlib import Path
+import sys
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from database.session import DatabasePool, close_db
+from services.shard_router import NotShardable, shard_router
+
+
+async def sample_queries() -> list:
+    async with DatabasePool.acquire() as conn:
+        creator_id = await conn.fetchval("SELECT creator_id FROM videos LIMIT 1")
+        day = await conn.fetchval("SELECT MAX(created_at)::date FROM video_snapshots")
+
+    queries = [
+        "SELECT COUNT(*) FROM videos",
+        "SELECT COUNT(*) FROM videos WHERE views_count > 100000",
+        "SELECT COALESCE(SUM(likes_count), 0) FROM videos",
+        "SELECT COUNT(DISTINCT creator_id) FROM videos",
+        "SELECT MAX(views_count) FROM videos",
+        "SELECT COUNT(*) FROM video_snapshots WHERE delta_views_count < 0",
+    ]
+
+    if creator_id and day:
+        queries += [
+            f"SELECT COUNT(*) FROM videos WHERE creator_id = '{creator_id}'",
+            f"SELECT COALESCE(SUM(delta_views_count), 0) FROM video_snapshots WHERE created_at::date = '{day}'",
+            f"SELECT COUNT(DISTINCT video_id) FROM video_snapshots WHERE created_at::date = '{day}' AND delta_views_count > 0",
+            f"SELECT COALESCE(SUM(s.delta_views_count), 0) FROM video_snapshots s JOIN videos v ON v.id = s.video_id WHERE s.created_at::date = '{day}'",
+            f"SELECT COALESCE(SUM(delta_views_count), 0) FROM video_snapshots WHERE video_id IN (SELECT id FROM videos WHERE creator_id = '{creator_id}')",
+            "SELECT COUNT(*) FROM videos WHERE views_count > (SELECT AVG(views_count) FROM videos)",
+        ]
+
+    return queries
+
+
+async def check():
+    if not shard_router.enabled:
+        print("DB_SHARD_URLS is not set")
+        return 1
+
+    mismatches = 0
+
+    for sql in await sample_queries():
+        async with DatabasePool.acquire() as conn:
+            expected = await conn.fetchval(sql)
+
+        try:
+            plan = shard_router.plan(sql)
+        except NotShardable:
+            print(f"{'REJECTED':8} {sql}")
+            continue
+
+        started = time.perf_counter()
+        result = await shard_router.fetchval(sql)
+        elapsed = (time.perf_counter() - started) * 1000
+
+        status = "OK" if result == expected else "MISMATCH"
+        if result != expected:
+            mismatches += 1
+        print(f"{status:8} shards={len(plan.shards)} merge={plan.merge} sharded={result} ({elapsed:.1f} ms) reference={expected}  {sql}")
+
+    await close_db()
+
+    print(f"\n{mismatches} mismatches")
+    return mismatches
+
+
+if __name__ == "__main__":
+    sys.exit(1 if asyncio.run(check()) else 0)
@@ -0,0 +1,79 @@
+"""
+Time each stage of the bot's startup, without polling Telegram
+
+    python -m scripts.cold_start --runs 5
+
+Every run is a fresh interpreter, so imports are measured cold. The stages
+mirror main.main(): import, Bot and Dispatcher construction, pool warm-up
+and the schema check (run concurrently there, timed apart here), and the
+column store refresh.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).parent.parent
+
+STAGES = r'''
+import asyncio, json, time
+started = time.perf_counter()
+timings = {}
+
+def mark(stage, since):
+    timings[stage] = (time.perf_counter() - since) * 1000
+    return time.perf_counter()
+
+import main
+from aiogram import Bot
+from core.config import config
+from database.session import DatabasePool, close_db, init_db
+from services.video_store import video_store
+now = mark("import", started)
+
+async def run():
+    now = time.perf_counter()
+    bot = Bot(token=config.bot_token)
+    dp = main.build_dispatcher()
+    now = mark("dispatcher", now)
+    await DatabasePool.warm()
+    now = mark("pool warm-up", now)
+    await init_db()
+    now = mark("schema check", now)
+    if video_store.enabled:
+        await video_store.refresh()
+    now = mark("column store", now)
+    await close_db()
+    await bot.session.close()
+
+asyncio.run(run())
+timings["total"] = (time.perf_counter() - started) * 1000
+print(json.dumps(timings))
+'''
+
+
+def measure_once() -> dict:
+    env = {**os.environ, "LOG_LEVEL": "WARNING", "BOT_TOKEN": os.environ.get("BOT_TOKEN", "123456:cold-start")}
+    result = subprocess.run(
+        [sys.executable, "-c", STAGES], cwd=ROOT, env=env, capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Time the bot's cold start stage by stage")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    runs = [measure_once() for _ in range(args.runs)]
+    print(f"{'stage':16} {'median':>10} {'min':>10} {'max':>10}")
+    for stage in runs[0]:
+        values = [run[stage] for run in runs]
+        print(f"{stage:16} {statistics.median(values):8.1f} ms {min(values):8.1f} ms {max(values):8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
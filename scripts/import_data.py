@@ -1,18 +1,27 @@
+import argparse
 import asyncio
 import json
 import time
+import uuid
 from datetime import datetime
 from pathlib import Path
-from typing import List, Tuple
+from typing import Dict, List, Optional, Tuple
 import sys
 
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 import asyncpg
 from core.config import config
+from database.compact_schema import (
+    COMPACT_TABLES, DAILY_INDEX_SQL, DAILY_STORAGE_SQL, INDEX_SQL, STORAGE_SQL, TIERED_VIEWS_SQL, VIEWS_SQL,
+)
+from database.sharding import asyncpg_dsn, normalize_creator_id, partition_records
+from services.data_version import bump_data_version, fetch_data_version
+from services.sketch_store import build_sketches
+from services.snapshot_store import export_snapshot_columns
 
 
-async def create_tables(conn: asyncpg.Connection):
+async def create_tables(conn: asyncpg.Connection, compact: bool = False):
     tables_exist = await conn.fetchval("""
         SELECT EXISTS (
             SELECT FROM information_schema.tables 
@@ -26,6 +35,12 @@ async def create_tables(conn: asyncpg.Connection):
     
     print("Creating tables...")
     
+    if compact:
+        for statement in STORAGE_SQL + DAILY_STORAGE_SQL + VIEWS_SQL + TIERED_VIEWS_SQL:
+            await conn.execute(statement)
+        print("Compact tables and views created")
+        return True
+    
     await conn.execute("""
         CREATE TABLE videos (
             id VARCHAR(36) PRIMARY KEY,
@@ -61,9 +76,15 @@ async def create_tables(conn: asyncpg.Connection):
     return True
 
 
-async def create_indexes(conn: asyncpg.Connection):
+async def create_indexes(conn: asyncpg.Connection, compact: bool = False):
     print("Creating indexes...")
     
+    if compact:
+        for statement in INDEX_SQL + DAILY_INDEX_SQL:
+            await conn.execute(statement)
+        print("Indexes created")
+        return
+    
     await conn.execute("CREATE INDEX idx_videos_creator_id ON videos(creator_id)")
     await conn.execute("CREATE INDEX idx_videos_video_created_at ON videos(video_created_at)")
     await conn.execute("CREATE INDEX idx_videos_views_count ON videos(views_count)")
@@ -83,7 +104,7 @@ def parse_datetime(dt_str: str) -> datetime:
 def prepare_video_record(video: dict) -> Tuple:
     return (
         video['id'],
-        video['creator_id'],
+        normalize_creator_id(video['creator_id']),
         parse_datetime(video['video_created_at']),
         video.get('views_count', 0),
         video.get('likes_count', 0),
@@ -111,9 +132,115 @@ def prepare_snapshot_record(snapshot: dict) -> Tuple:
     )
 
 
-async def import_data():
-    json_path = Path(__file__).parent.parent / "data" / "videos.json"
+async def insert_rows(conn: asyncpg.Connection, video_records: List[Tuple], snapshot_records: List[Tuple]):
+    print("Inserting videos...")
+    await conn.copy_records_to_table(
+        'videos',
+        records=video_records,
+        columns=[
+            'id', 'creator_id', 'video_created_at',
+            'views_count', 'likes_count', 'comments_count', 'reports_count',
+            'created_at', 'updated_at'
+        ]
+    )
+    print(f"Inserted {len(video_records)} videos")
+    
+    print("Inserting snapshots...")
+    await conn.copy_records_to_table(
+        'video_snapshots',
+        records=snapshot_records,
+        columns=[
+            'id', 'video_id',
+            'views_count', 'likes_count', 'comments_count', 'reports_count',
+            'delta_views_count', 'delta_likes_count', 'delta_comments_count', 'delta_reports_count',
+            'created_at', 'updated_at'
+        ]
+    )
+    print(f"Inserted {len(snapshot_records)} snapshots")
+
+
+async def insert_compact(conn: asyncpg.Connection, video_records: List[Tuple], snapshot_records: List[Tuple]):
+    """COPY into creators / video_rows / snapshot_rows with surrogate keys assigned here"""
+    creators: Dict[str, int] = {}
+    video_idx: Dict[str, int] = {}
+    
+    video_rows = []
+    for idx, (video_id, creator_id, video_created_at, views, likes, comments, reports,
+              created_at, updated_at) in enumerate(video_records, 1):
+        creator_idx = creators.setdefault(creator_id, len(creators) + 1)
+        video_idx[video_id] = idx
+        video_rows.append((idx, uuid.UUID(video_id), video_created_at, created_at, updated_at,
+                           creator_idx, views, likes, comments, reports))
+    
+    snapshot_rows = [
+        (uuid.UUID(record[0]), record[10], record[11], video_idx[record[1]], *record[2:10])
+        for record in snapshot_records
+    ]
+    snapshot_rows.sort(key=lambda row: row[1])
+    
+    await conn.copy_records_to_table(
+        'creators',
+        records=[(idx, uuid.UUID(creator_id)) for creator_id, idx in creators.items()],
+        columns=['id', 'key'],
+    )
+    await conn.copy_records_to_table(
+        'video_rows',
+        records=video_rows,
+        columns=[
+            'idx', 'id', 'video_created_at', 'created_at', 'updated_at', 'creator_idx',
+            'views_count', 'likes_count', 'comments_count', 'reports_count'
+        ]
+    )
+    await conn.copy_records_to_table(
+        'snapshot_rows',
+        records=snapshot_rows,
+        columns=[
+            'id', 'created_at', 'updated_at', 'video_idx',
+            'views_count', 'likes_count', 'comments_count', 'reports_count',
+            'delta_views_count', 'delta_likes_count', 'delta_comments_count', 'delta_reports_count'
+        ]
+    )
+    await conn.execute("SELECT setval(pg_get_serial_sequence('creators', 'id'), $1)", max(len(creators), 1))
+    await conn.execute("SELECT setval(pg_get_serial_sequence('video_rows', 'idx'), $1)", max(len(video_rows), 1))
+    print(f"Inserted {len(creators)} creators, {len(video_rows)} videos, {len(snapshot_rows)} snapshots")
+
+
+async def prepare_database(conn: asyncpg.Connection, compact: bool) -> Optional[bool]:
+    """Create tables if needed; returns the layout in use, or None when data is already there"""
+    tables_created = await create_tables(conn, compact)
+    
+    if not tables_created:
+        compact = await conn.fetchval("SELECT to_regclass('snapshot_rows') IS NOT NULL")
+        existing_count = await conn.fetchval("SELECT COUNT(*) FROM videos")
+        if existing_count > 0:
+            print(f"Database already has {existing_count} videos. Skipping import.")
+            return None
+    
+    return compact
+
+
+async def load_database(conn: asyncpg.Connection, compact: bool,
+                        video_records: List[Tuple], snapshot_records: List[Tuple]):
+    if compact:
+        await insert_compact(conn, video_records, snapshot_records)
+    else:
+        await insert_rows(conn, video_records, snapshot_records)
+    
+    await create_indexes(conn, compact)
     
+    print("Running ANALYZE...")
+    for table in COMPACT_TABLES if compact else ("videos", "video_snapshots"):
+        await conn.execute(f"ANALYZE {table}")
+
+
+def target_dsns() -> List[str]:
+    """Shard databases in sharded mode, otherwise the main database"""
+    if config.db_shard_urls:
+        return [asyncpg_dsn(url) for url in config.db_shard_urls]
+    return [config.asyncpg_dsn]
+
+
+async def import_data(json_path: Path, compact: bool = False):
     if not json_path.exists():
         print(f"File not found: {json_path}")
         print("Make sure videos.json is in the 'data' folder!")
@@ -121,19 +248,18 @@ async def import_data():
     
     start_time = time.time()
     
-    dsn = config.asyncpg_dsn
-    print(f"Connecting to: {config.db_host}:{config.db_port}/{config.db_name}")
+    dsns = target_dsns()
+    if config.db_shard_urls:
+        print(f"Sharded import into {len(dsns)} databases")
+    else:
+        print(f"Connecting to: {config.db_host}:{config.db_port}/{config.db_name}")
     
-    conn = await asyncpg.connect(dsn=dsn)
+    conns = [await asyncpg.connect(dsn=dsn) for dsn in dsns]
     
     try:
-        tables_created = await create_tables(conn)
-        
-        if not tables_created:
-            existing_count = await conn.fetchval("SELECT COUNT(*) FROM videos")
-            if existing_count > 0:
-                print(f"Database already has {existing_count} videos. Skipping import.")
-                return
+        layouts = [await prepare_database(conn, compact) for conn in conns]
+        if any(layout is None for layout in layouts):
+            return
         
         print(f"Loading JSON from: {json_path}")
         
@@ -156,36 +282,25 @@ async def import_data():
         
         print(f"Prepared {len(video_records)} videos, {len(snapshot_records)} snapshots")
         
-        print("Inserting videos...")
-        await conn.copy_records_to_table(
-            'videos',
-            records=video_records,
-            columns=[
-                'id', 'creator_id', 'video_created_at',
-                'views_count', 'likes_count', 'comments_count', 'reports_count',
-                'created_at', 'updated_at'
-            ]
-        )
-        print(f"Inserted {len(video_records)} videos")
-        
-        print("Inserting snapshots...")
-        await conn.copy_records_to_table(
-            'video_snapshots',
-            records=snapshot_records,
-            columns=[
-                'id', 'video_id',
-                'views_count', 'likes_count', 'comments_count', 'reports_count',
-                'delta_views_count', 'delta_likes_count', 'delta_comments_count', 'delta_reports_count',
-                'created_at', 'updated_at'
-            ]
-        )
-        print(f"Inserted {len(snapshot_records)} snapshots")
+        parts = partition_records(video_records, snapshot_records, len(conns))
+        for index, (videos, snapshots) in enumerate(parts if len(parts) > 1 else []):
+            print(f"   Shard {index}: {len(videos)} videos, {len(snapshots)} snapshots")
         
-        await create_indexes(conn)
+        await asyncio.gather(*(
+            load_database(conn, layout, videos, snapshots)
+            for conn, layout, (videos, snapshots) in zip(conns, layouts, parts)
+        ))
         
-        print("Running ANALYZE...")
-        await conn.execute("ANALYZE videos")
-        await conn.execute("ANALYZE video_snapshots")
+        # The bot reads the data version from the main database in both modes
+        if config.db_shard_urls:
+            main = await asyncpg.connect(dsn=config.asyncpg_dsn)
+            try:
+                version = await bump_data_version(main)
+            finally:
+                await main.close()
+        else:
+            version = await bump_data_version(conns[0])
+        print(f"Data version: {version}")
         
         elapsed = time.time() - start_time
         print(f"\nImport completed in {elapsed:.2f} seconds!")
@@ -193,12 +308,45 @@ async def import_data():
         print(f"   Snapshots: {len(snapshot_records)}")
         print(f"   Speed: {(len(video_records) + len(snapshot_records)) / elapsed:.0f} records/sec")
         
+    finally:
+        for conn in conns:
+            await conn.close()
+
+
+async def export_columns(directory: str):
+    conn = await asyncpg.connect(dsn=config.asyncpg_dsn)
+    
+    try:
+        start_time = time.time()
+        version = await fetch_data_version(conn)
+        target = await export_snapshot_columns(conn, directory, version)
+        print(f"\nExported snapshot columns (version {version}) to {target} in {time.time() - start_time:.2f} seconds")
+        
+    finally:
+        await conn.close()
+
+
+async def build_distinct_sketches():
+    conn = await asyncpg.connect(dsn=config.asyncpg_dsn)
+    
+    try:
+        start_time = time.time()
+        days = await build_sketches(conn, config.hll_precision)
+        print(f"\nBuilt distinct-video sketches for {days} days in {time.time() - start_time:.2f} seconds")
+        
     finally:
         await conn.close()
 
 
 async def verify_data():
-    dsn = config.asyncpg_dsn
+    dsns = target_dsns()
+    for index, dsn in enumerate(dsns):
+        if len(dsns) > 1:
+            print(f"\nShard {index}:")
+        await verify_database(dsn)
+
+
+async def verify_database(dsn: str):
     conn = await asyncpg.connect(dsn=dsn)
     
     try:
@@ -244,5 +392,24 @@ if __name__ == "__main__":
     print("Video Analytics Data Importer")
     print("=" * 50)
     
-    asyncio.run(import_data())
-    asyncio.run(verify_data())
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Import videos.json into PostgreSQL")
+    parser.add_argument("json_path", nargs="?", type=Path,
+                        default=Path(__file__).parent.parent / "data" / "videos.json")
+    parser.add_argument("--compact", action="store_true",
+                        help="store uuid/integer keys behind videos and video_snapshots views")
+    parser.add_argument("--sketches", action="store_true", default=config.distinct_estimates,
+                        help="build per-day HyperLogLog sketches for distinct-video questions")
+    parser.add_argument("--export-columns", metavar="DIR", default=config.snapshot_columns_dir,
+                        help="also write memory-mapped video_snapshots columns to DIR")
+    args = parser.parse_args()
+    
+    asyncio.run(import_data(args.json_path, args.compact))
+    asyncio.run(verify_data())
+    
+    if args.sketches and not config.db_shard_urls:
+        asyncio.run(build_distinct_sketches())
+    
+    if args.export_columns and config.db_shard_urls:
+        print("Column export is not available in sharded mode")
+    elif args.export_columns:
+        asyncio.run(export_columns(args.export_columns))
\ No newline at end of file
@@ -0,0 +1,336 @@
+"""
+Index advisor driven by the SQL the LLM actually generated
+
+Reads "Generated SQL" records from the bot logs (or the query_log table
+with --query-log DAYS), groups them into shapes (literals replaced by
+placeholders), EXPLAINs one example per shape and proposes covering,
+partial and BRIN indexes for them. Each candidate is
+costed against the whole workload with hypothetical indexes (HypoPG), or
+with real indexes created inside a rolled-back transaction when --real is
+given. Accepted candidates are written out as an Alembic migration:
+
+    python -m scripts.index_advisor logs/bot.log*
+    python -m scripts.index_advisor logs/bot.log* --accept 1,3
+    python -m scripts.index_advisor --query-log 7
+"""
+import argparse
+import asyncio
+import glob
+import json
+import re
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+import sys
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import asyncpg
+from core.config import config
+from services.sql_shapes import ID_COLUMNS, TIMESTAMP_COLUMNS, parse_aggregate_query, sql_shape
+
+MIGRATIONS_DIR = Path(__file__).parent.parent / "migrations" / "versions"
+ALEMBIC_INI = Path(__file__).parent.parent / "alembic.ini"
+
+_TEXT_RECORD = re.compile(r"Generated SQL: (?P<sql>.+?)(?: \[request_id=.*)?$")
+_DATE_CAST = re.compile(r"\b(\w+)::date\b", re.IGNORECASE)
+
+# Tables larger than this (pages) with a well-correlated timestamp get a BRIN candidate
+BRIN_MIN_PAGES = 1000
+BRIN_MIN_CORRELATION = 0.9
+
+
+@dataclass
+class Shape:
+    text: str
+    example: str
+    count: int = 0
+    cost: float = 0.0
+    plan: str = ""
+
+
+@dataclass
+class Candidate:
+    table: str
+    columns: List[str]
+    include: List[str] = field(default_factory=list)
+    where: Optional[str] = None
+    using: str = "btree"
+    benefit: float = 0.0
+    size: Optional[int] = None
+    improved: List[str] = field(default_factory=list)
+
+    @property
+    def name(self) -> str:
+        parts = ["idx", "adv", self.table, *self.columns]
+        if self.include:
+            parts += ["incl", *self.include]
+        if self.where:
+            parts.append("partial")
+        if self.using != "btree":
+            parts.append(self.using)
+        return "_".join(parts)[:63]
+
+    @property
+    def key(self) -> tuple:
+        return self.table, tuple(self.columns), tuple(self.include), self.where, self.using
+
+    def ddl(self) -> str:
+        sql = f"CREATE INDEX {self.name} ON {self.table} USING {self.using} ({', '.join(self.columns)})"
+        if self.include:
+            sql += f" INCLUDE ({', '.join(self.include)})"
+        if self.where:
+            sql += f" WHERE {self.where}"
+        return sql
+
+
+def read_workload(paths: List[str]) -> Dict[str, Shape]:
+    shapes: Dict[str, Shape] = {}
+    for path in paths:
+        with open(path, encoding="utf-8", errors="replace") as f:
+            for line in f:
+                sql = _extract_sql(line)
+                # Only statements that passed as reads are EXPLAINed
+                if not sql or not re.match(r"\s*(SELECT|WITH)\b", sql, re.IGNORECASE):
+                    continue
+                text = sql_shape(sql)
+                shape = shapes.setdefault(text, Shape(text, sql))
+                shape.count += 1
+    return shapes
+
+
+def _extract_sql(line: str) -> Optional[str]:
+    line = line.strip()
+    if line.startswith("{"):
+        try:
+            return json.loads(line).get("sql")
+        except json.JSONDecodeError:
+            return None
+    match = _TEXT_RECORD.search(line)
+    return match.group("sql") if match else None
+
+
+def propose(shape: Shape, table_stats: Dict[str, dict]) -> List[Candidate]:
+    """Candidates for the simple aggregate shapes services.sql_shapes understands"""
+    query = parse_aggregate_query(shape.example)
+    if query is None or table_stats.get(query.table, {}).get("kind") != "r":
+        return []
+
+    timestamp = TIMESTAMP_COLUMNS[query.table]
+    equal = sorted({c.column for c in query.conditions if c.column == ID_COLUMNS[query.table]})
+    ranged = [timestamp] if any(c.column == timestamp for c in query.conditions) else []
+    filters = [c for c in query.other_conditions() if c.column not in equal]
+    payload = [query.column] if query.column and query.column not in equal else []
+
+    keys = equal + ranged
+    candidates = []
+    if keys:
+        include = sorted(set(payload + [c.column for c in filters]) - set(keys))
+        candidates.append(Candidate(query.table, keys, include))
+    for condition in filters:
+        where = f"{condition.column} {condition.operator} {condition.value}"
+        candidates.append(Candidate(query.table, keys or [condition.column], payload, where))
+
+    stats = table_stats[query.table]
+    if ranged and stats["pages"] >= BRIN_MIN_PAGES and abs(stats["correlation"].get(timestamp, 0)) >= BRIN_MIN_CORRELATION:
+        candidates.append(Candidate(query.table, [timestamp], using="brin"))
+    return candidates
+
+
+async def table_stats(conn: asyncpg.Connection) -> Dict[str, dict]:
+    rows = await conn.fetch(
+        "SELECT relname, relkind, relpages FROM pg_class WHERE relname = ANY($1::text[])",
+        list(TIMESTAMP_COLUMNS),
+    )
+    stats = {row["relname"]: {"kind": row["relkind"], "pages": row["relpages"], "correlation": {}} for row in rows}
+    for row in await conn.fetch(
+        "SELECT tablename, attname, correlation FROM pg_stats WHERE tablename = ANY($1::text[])",
+        list(TIMESTAMP_COLUMNS),
+    ):
+        if row["tablename"] in stats and row["correlation"] is not None:
+            stats[row["tablename"]]["correlation"][row["attname"]] = row["correlation"]
+    return stats
+
+
+async def explain(conn: asyncpg.Connection, sql: str) -> Tuple[float, str]:
+    result = await conn.fetchval(f"EXPLAIN (FORMAT JSON) {sql.rstrip().rstrip(';')}")
+    plan = (json.loads(result) if isinstance(result, str) else result)[0]["Plan"]
+    return plan["Total Cost"], _plan_summary(plan)
+
+
+def _plan_summary(plan: dict) -> str:
+    nodes = []
+    stack = [plan]
+    while stack:
+        node = stack.pop()
+        label = node["Node Type"]
+        if "Index Name" in node:
+            label += f" using {node['Index Name']}"
+        elif "Relation Name" in node:
+            label += f" on {node['Relation Name']}"
+        nodes.append(label)
+        stack.extend(reversed(node.get("Plans", [])))
+    return " > ".join(nodes)
+
+
+async def evaluate(conn: asyncpg.Connection, candidate: Candidate, shapes: List[Shape], real: bool) -> None:
+    """Cost the workload with the candidate in place, hypothetically or in a rolled-back transaction"""
+    relevant = [shape for shape in shapes if re.search(rf"\b{candidate.table}\b", shape.text, re.IGNORECASE)]
+
+    transaction = conn.transaction()
+    await transaction.start()
+    try:
+        if real:
+            await conn.execute(candidate.ddl())
+            candidate.size = await conn.fetchval("SELECT pg_relation_size($1::regclass)", candidate.name)
+        else:
+            oid = await conn.fetchval("SELECT indexrelid FROM hypopg_create_index($1)", candidate.ddl())
+            candidate.size = await conn.fetchval("SELECT hypopg_relation_size($1)", oid)
+
+        for shape in relevant:
+            cost, _ = await explain(conn, shape.example)
+            saved = shape.cost - cost
+            if saved > 0.01 * shape.cost:
+                candidate.benefit += saved * shape.count
+                candidate.improved.append(f"{shape.cost:.0f} -> {cost:.0f}  x{shape.count}  {shape.text}")
+    finally:
+        if not real:
+            await conn.execute("SELECT hypopg_reset()")
+        await transaction.rollback()
+
+
+def write_migration(candidates: List[Candidate]) -> Path:
+    from alembic.config import Config as AlembicConfig
+    from alembic.script import ScriptDirectory
+
+    head = ScriptDirectory.from_config(AlembicConfig(str(ALEMBIC_INI))).get_current_head()
+    revision = uuid.uuid4().hex[:12]
+    now = datetime.now()
+
+    upgrade, downgrade = [], []
+    for candidate in candidates:
+        options = []
+        if candidate.include:
+            options.append(f"postgresql_include={candidate.include!r}")
+        if candidate.where:
+            options.append(f"postgresql_where=sa.text({candidate.where!r})")
+        if candidate.using != "btree":
+            options.append(f"postgresql_using={candidate.using!r}")
+        args = ", ".join([repr(candidate.name), repr(candidate.table), repr(candidate.columns), "unique=False", *options])
+        upgrade.append(f"    op.create_index({args})")
+        downgrade.insert(0, f"    op.drop_index({candidate.name!r}, table_name={candidate.table!r})")
+
+    path = MIGRATIONS_DIR / f"{revision}_advised_indexes.py"
+    path.write_text(f'''"""Advised indexes
+
+Revision ID: {revision}
+Revises: {head}
+Create Date: {now}
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = {revision!r}
+down_revision: Union[str, Sequence[str], None] = {head!r}
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+{chr(10).join(upgrade)}
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+{chr(10).join(downgrade)}
+''')
+    return path
+
+
+async def read_query_log(conn: asyncpg.Connection, days: int) -> Dict[str, Shape]:
+    rows = await conn.fetch(
+        "SELECT shape, COUNT(*) AS count, MIN(sql) AS example FROM query_log "
+        "WHERE created_at >= NOW() - make_interval(days => $1) AND shape IS NOT NULL GROUP BY shape",
+        days,
+    )
+    return {row["shape"]: Shape(row["shape"], row["example"], row["count"]) for row in rows}
+
+
+async def advise(paths: List[str], days: Optional[int], real: bool, accept: Optional[str], min_benefit: float):
+    conn = await asyncpg.connect(dsn=config.asyncpg_dsn)
+    try:
+        shapes = await read_query_log(conn, days) if days else read_workload(paths)
+        if not shapes:
+            print("No generated SQL found")
+            return
+
+        if not real and not await conn.fetchval("SELECT EXISTS (SELECT FROM pg_extension WHERE extname = 'hypopg')"):
+            print("HypoPG is not installed (CREATE EXTENSION hypopg), rerun with --real to build indexes in a rolled-back transaction")
+            return
+
+        stats = await table_stats(conn)
+        ordered = sorted(shapes.values(), key=lambda s: s.count, reverse=True)
+
+        print(f"Workload: {sum(s.count for s in ordered)} queries, {len(ordered)} shapes\n")
+        for shape in ordered:
+            try:
+                shape.cost, shape.plan = await explain(conn, shape.example)
+            except asyncpg.PostgresError as e:
+                print(f"   skip ({e.__class__.__name__}): {shape.text}")
+                continue
+            print(f"x{shape.count:<5} cost {shape.cost:>10.0f}  {shape.text}\n        {shape.plan}")
+            if _DATE_CAST.search(shape.text):
+                print("        note: ::date on timestamptz cannot use an index; ranges from QUERY_IR can")
+
+        candidates: Dict[tuple, Candidate] = {}
+        for shape in ordered:
+            for candidate in propose(shape, stats):
+                candidates.setdefault(candidate.key, candidate)
+
+        costed = [shape for shape in ordered if shape.plan]
+        for candidate in candidates.values():
+            await evaluate(conn, candidate, costed, real)
+    finally:
+        await conn.close()
+
+    ranked = sorted(candidates.values(), key=lambda c: c.benefit, reverse=True)
+    print("\nCandidates (benefit = planner cost saved x frequency):")
+    for number, candidate in enumerate(ranked, 1):
+        size = f"{candidate.size / 1024 / 1024:.1f} MB" if candidate.size is not None else "?"
+        print(f"{number:3}. benefit {candidate.benefit:>12.0f}  size {size:>9}  {candidate.ddl()}")
+        for line in candidate.improved:
+            print(f"        {line}")
+
+    if accept is None:
+        return
+
+    if accept == "all":
+        chosen = [c for c in ranked if c.benefit > 0 and c.benefit >= min_benefit]
+    else:
+        chosen = [ranked[int(number) - 1] for number in accept.split(",") if number.strip()]
+    if not chosen:
+        print("\nNothing to accept")
+        return
+
+    print(f"\nWrote {write_migration(chosen)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Propose indexes for the generated SQL workload")
+    parser.add_argument("logs", nargs="*", default=["logs/bot.log*"], help="log files (globs allowed)")
+    parser.add_argument("--query-log", type=int, metavar="DAYS", help="read the workload from the query_log table instead")
+    parser.add_argument("--real", action="store_true", help="cost with real indexes in a rolled-back transaction instead of HypoPG")
+    parser.add_argument("--accept", help="comma-separated candidate numbers, or 'all'")
+    parser.add_argument("--min-benefit", type=float, default=0.0, help="threshold for --accept all")
+    args = parser.parse_args()
+
+    paths = sorted({path for pattern in args.logs for path in glob.glob(pattern)})
+    asyncio.run(advise(paths, args.query_log, args.real, args.accept, args.min_benefit))
@@ -0,0 +1,139 @@
+"""
+Long-running snapshot ingestion: HTTP endpoint and spool directory
+
+    python -m scripts.ingest_server
+
+POST /snapshots takes NDJSON (or a JSON array) of snapshot objects and
+answers once they are committed, with how many were inserted and how many
+skipped (already stored, unknown video, bad id or a rolled-up day). Files dropped into INGEST_SPOOL_DIR as
+*.ndjson are ingested and deleted; failed files are renamed to *.failed.
+Write spool files under another name and rename them in when complete.
+Refuses to start in sharded mode (DB_SHARD_URLS).
+"""
+import asyncio
+import json
+import logging
+from pathlib import Path
+from typing import List, Tuple
+import sys
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from aiohttp import web
+
+from core.config import config
+from core.logging import setup_logging
+from database.session import close_db
+from services.ingestion import InvalidSnapshot, parse_snapshot, snapshot_ingestor
+
+
+logger = logging.getLogger(__name__)
+
+SPOOL_POLL_INTERVAL = 1.0
+MAX_BODY_SIZE = 64 * 1024 * 1024
+
+
+def parse_body(text: str) -> List[Tuple]:
+    """Snapshot rows from NDJSON or a JSON array"""
+    stripped = text.lstrip()
+    if stripped.startswith("["):
+        try:
+            items = json.loads(stripped)
+        except json.JSONDecodeError as e:
+            raise InvalidSnapshot(f"invalid JSON: {e}") from e
+        return [parse_snapshot(item) for item in items]
+
+    rows = []
+    for number, line in enumerate(text.splitlines(), 1):
+        if not line.strip():
+            continue
+        try:
+            rows.append(parse_snapshot(json.loads(line)))
+        except (json.JSONDecodeError, InvalidSnapshot) as e:
+            raise InvalidSnapshot(f"line {number}: {e}") from e
+    return rows
+
+
+async def post_snapshots(request: web.Request) -> web.Response:
+    if config.ingest_token and request.headers.get("Authorization") != f"Bearer {config.ingest_token}":
+        return web.json_response({"error": "unauthorized"}, status=401)
+
+    try:
+        rows = parse_body(await request.text())
+    except InvalidSnapshot as e:
+        return web.json_response({"error": str(e)}, status=400)
+
+    inserted = skipped = 0
+    if rows:
+        try:
+            inserted, skipped = await snapshot_ingestor.submit(rows)
+        except Exception as e:
+            return web.json_response({"error": str(e)}, status=500)
+
+    return web.json_response({"received": len(rows), "inserted": inserted, "skipped": skipped})
+
+
+async def get_stats(request: web.Request) -> web.Response:
+    return web.json_response({
+        "inserted": snapshot_ingestor.inserted,
+        "skipped": snapshot_ingestor.skipped,
+        "batches": snapshot_ingestor.batches,
+    })
+
+
+async def ingest_file(path: Path) -> None:
+    processing = path.with_suffix(".processing")
+    path.rename(processing)
+
+    inserted = skipped = 0
+    try:
+        rows = parse_body(await asyncio.to_thread(processing.read_text))
+        if rows:
+            inserted, skipped = await snapshot_ingestor.submit(rows)
+    except Exception:
+        logger.exception("Spool file %s failed", path.name)
+        processing.rename(path.with_suffix(".failed"))
+        return
+
+    processing.unlink()
+    logger.info("Spool file %s: %d snapshots, %d inserted, %d skipped", path.name, len(rows), inserted, skipped)
+
+
+async def watch_spool(directory: Path) -> None:
+    """Poll the spool directory; files are submitted concurrently so they share micro-batches"""
+    directory.mkdir(parents=True, exist_ok=True)
+    logger.info("Watching spool directory %s", directory)
+
+    while True:
+        files = sorted(directory.glob("*.ndjson"))
+        if files:
+            await asyncio.gather(*(ingest_file(path) for path in files))
+        else:
+            await asyncio.sleep(SPOOL_POLL_INTERVAL)
+
+
+async def on_startup(app: web.Application) -> None:
+    snapshot_ingestor.start()
+    if config.ingest_spool_dir:
+        app["spool"] = asyncio.create_task(watch_spool(Path(config.ingest_spool_dir)))
+
+
+async def on_cleanup(app: web.Application) -> None:
+    if "spool" in app:
+        app["spool"].cancel()
+    await snapshot_ingestor.close()
+    await close_db()
+
+
+def create_app() -> web.Application:
+    app = web.Application(client_max_size=MAX_BODY_SIZE)
+    app.router.add_post("/snapshots", post_snapshots)
+    app.router.add_get("/stats", get_stats)
+    app.on_startup.append(on_startup)
+    app.on_cleanup.append(on_cleanup)
+    return app
+
+
+if __name__ == "__main__":
+    setup_logging()
+    web.run_app(create_app(), host=config.ingest_host, port=config.ingest_port, print=None)
@@ -0,0 +1,124 @@
+"""
+Table/index sizes and scan times for the videos and snapshot storage
+
+Run once before `alembic upgrade head` (or before importing with --compact)
+with --save, and once after with --compare to get a before/after report:
+
+    python -m scripts.key_size_report --save before.json
+    alembic upgrade head
+    python -m scripts.key_size_report --compare before.json
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from pathlib import Path
+import sys
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import asyncpg
+from core.config import config
+
+TABLES = ("videos", "video_snapshots", "creators", "video_rows", "snapshot_rows", "daily_snapshot_rows")
+
+SIZES_SQL = """
+    SELECT c.relname AS name,
+           pg_relation_size(c.oid) AS heap,
+           pg_indexes_size(c.oid) AS indexes,
+           pg_total_relation_size(c.oid) AS total
+    FROM pg_class c
+    WHERE c.relname = ANY($1::text[]) AND c.relkind = 'r'
+    ORDER BY c.relname
+"""
+
+INDEX_SIZES_SQL = """
+    SELECT i.indrelid::regclass::text AS table_name,
+           i.indexrelid::regclass::text AS name,
+           pg_relation_size(i.indexrelid) AS size
+    FROM pg_index i
+    WHERE i.indrelid::regclass::text = ANY($1::text[])
+    ORDER BY 1, 2
+"""
+
+
+async def scan_queries(conn: asyncpg.Connection) -> list:
+    creator_id = await conn.fetchval("SELECT creator_id FROM videos LIMIT 1")
+    video_id = await conn.fetchval("SELECT id FROM videos LIMIT 1")
+    day = await conn.fetchval("SELECT MAX(created_at)::date FROM video_snapshots")
+
+    return [
+        ("count snapshots", "SELECT COUNT(*) FROM video_snapshots"),
+        ("snapshots on a day", f"SELECT COALESCE(SUM(delta_views_count), 0) FROM video_snapshots WHERE created_at::date = '{day}'"),
+        ("distinct videos on a day", f"SELECT COUNT(DISTINCT video_id) FROM video_snapshots WHERE created_at::date = '{day}' AND delta_views_count > 0"),
+        ("snapshots of a video", f"SELECT COUNT(*) FROM video_snapshots WHERE video_id = '{video_id}'"),
+        ("videos of a creator", f"SELECT COUNT(*) FROM videos WHERE creator_id = '{creator_id}'"),
+        ("distinct creators", "SELECT COUNT(DISTINCT creator_id) FROM videos"),
+    ]
+
+
+async def timed(conn: asyncpg.Connection, sql: str, runs: int) -> float:
+    await conn.fetchval(sql)
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        await conn.fetchval(sql)
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+async def collect(runs: int) -> dict:
+    conn = await asyncpg.connect(dsn=config.asyncpg_dsn)
+
+    try:
+        sizes = [dict(row) for row in await conn.fetch(SIZES_SQL, list(TABLES))]
+        indexes = [dict(row) for row in await conn.fetch(INDEX_SIZES_SQL, list(TABLES))]
+        scans = {name: await timed(conn, sql, runs) for name, sql in await scan_queries(conn)}
+    finally:
+        await conn.close()
+
+    return {"tables": sizes, "indexes": indexes, "scans_ms": scans}
+
+
+def mb(size: int) -> str:
+    return f"{size / 1024 / 1024:.1f} MB"
+
+
+def print_report(report: dict, before: dict = None):
+    print("Tables:")
+    for row in report["tables"]:
+        print(f"   {row['name']:16} heap {mb(row['heap']):>10}  indexes {mb(row['indexes']):>10}  total {mb(row['total']):>10}")
+
+    print("\nIndexes:")
+    for row in report["indexes"]:
+        print(f"   {row['table_name']:16} {row['name']:42} {mb(row['size']):>10}")
+
+    total = sum(row["total"] for row in report["tables"])
+    if before:
+        previous = sum(row["total"] for row in before["tables"])
+        print(f"\nTotal: {mb(previous)} -> {mb(total)} ({(total - previous) / max(previous, 1) * 100:+.1f}%)")
+    else:
+        print(f"\nTotal: {mb(total)}")
+
+    print("\nScans (median ms):")
+    for name, ms in report["scans_ms"].items():
+        line = f"   {name:26} {ms:9.2f}"
+        if before and name in before["scans_ms"]:
+            line = f"   {name:26} {before['scans_ms'][name]:9.2f} -> {ms:9.2f}"
+        print(line)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Report storage sizes and scan times")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--save", type=Path, help="write the report as JSON")
+    parser.add_argument("--compare", type=Path, help="compare against a report saved earlier")
+    args = parser.parse_args()
+
+    report = asyncio.run(collect(args.runs))
+    before = json.loads(args.compare.read_text()) if args.compare else None
+    print_report(report, before)
+
+    if args.save:
+        args.save.write_text(json.dumps(report, indent=2))
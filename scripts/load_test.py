@@ -0,0 +1,268 @@
+"""
+Push synthetic updates through the bot's real Dispatcher
+
+    python -m scripts.load_test --users 200 --messages 20
+    python -m scripts.load_test --users 50 --interval 0.1 --llm-latency 0.5 --telegram-limits
+
+Every simulated user sends `--messages` questions `--interval` seconds apart
+through `Dispatcher.feed_update`, so the whole chain runs: request context,
+throttling, auth (against the DATABASE_URL Postgres), in-flight tracking and
+handlers. The LLM is replaced by a stub answering canned SQL after
+`--llm-latency` seconds and the Bot API by a session that records calls.
+Outbound rate limits are lifted unless --telegram-limits is given. Reports
+throughput, feed_update latency, event-loop lag and the time spent in each
+middleware excluding what it awaits downstream.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+parser = argparse.ArgumentParser(description="Load-test the Dispatcher with synthetic updates")
+parser.add_argument("--users", type=int, default=100, help="simulated users")
+parser.add_argument("--messages", type=int, default=10, help="messages per user")
+parser.add_argument("--interval", type=float, default=0.6, help="seconds between a user's messages")
+parser.add_argument("--llm-latency", type=float, default=0.2, help="stub LLM response time")
+parser.add_argument("--api-latency", type=float, default=0.0, help="fake Bot API response time")
+parser.add_argument("--telegram-limits", action="store_true", help="keep the outbox rate limits")
+parser.add_argument("--first-user-id", type=int, default=9_000_000_000, help="ids of the synthetic users start here")
+args = parser.parse_args()
+
+if not args.telegram_limits:
+    for name in ("OUTBOX_RATE", "OUTBOX_CHAT_RATE", "OUTBOX_GROUP_RATE", "OUTBOX_CHAT_BURST", "OUTBOX_MAX_IN_FLIGHT"):
+        os.environ[name] = "1000000"
+os.environ.setdefault("BOT_TOKEN", "123456:load-test")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+os.environ["QUERY_LOG"] = "false"
+
+from aiogram import BaseMiddleware, Bot
+from aiogram.client.session.base import BaseSession
+from aiogram.methods import TelegramMethod
+from aiogram.types import Chat, Message, PhotoSize, TelegramObject, Update, User
+
+from database.session import DatabasePool, close_db, init_db
+from main import build_dispatcher
+from services.gemini_service import IR_INSTRUCTIONS, gemini_service
+from services.outbox import outbox
+from services.profiler import measure_lag
+
+
+QUESTIONS = [
+    (
+        "Сколько всего видео в системе?",
+        "SELECT COUNT(*) FROM videos",
+        {"table": "videos", "aggregation": "count", "metric": None, "filters": [], "date_range": None},
+    ),
+    (
+        "Сколько видео набрало больше 100000 просмотров?",
+        "SELECT COUNT(*) FROM videos WHERE views_count > 100000",
+        {"table": "videos", "aggregation": "count", "metric": None,
+         "filters": [{"column": "views_count", "op": ">", "value": 100000}], "date_range": None},
+    ),
+    (
+        "На сколько просмотров выросли видео 28 ноября 2025?",
+        "SELECT COALESCE(SUM(delta_views_count), 0) FROM video_snapshots WHERE created_at::date = '2025-11-28'",
+        None,
+    ),
+    (
+        "Сколько разных видео получали новые просмотры с 1 по 5 ноября 2025?",
+        "SELECT COUNT(DISTINCT video_id) FROM video_snapshots "
+        "WHERE created_at::date BETWEEN '2025-11-01' AND '2025-11-05' AND delta_views_count > 0",
+        None,
+    ),
+]
+
+
+class StubLLM:
+    """Answers the known questions with canned SQL or query IR"""
+
+    name = "stub"
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.calls = 0
+
+    async def complete(self, prompt: str, stop_when=None, max_tokens: Optional[int] = None) -> str:
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        for question, sql, ir in QUESTIONS:
+            if prompt.endswith(question):
+                if IR_INSTRUCTIONS in prompt:
+                    return json.dumps(ir) if ir else "{}"
+                return sql
+        return "SELECT COUNT(*) FROM videos"
+
+    async def close(self) -> None:
+        pass
+
+
+class RecordingSession(BaseSession):
+    """Bot API session that answers every call locally"""
+
+    def __init__(self, latency: float):
+        super().__init__()
+        self.latency = latency
+        self.calls: Counter = Counter()
+
+    async def make_request(self, bot: Bot, method: TelegramMethod, timeout: Optional[int] = None) -> Any:
+        self.calls[type(method).__name__] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        chat_id = getattr(method, "chat_id", None)
+        if chat_id is None:
+            return True
+        return Message(
+            message_id=sum(self.calls.values()),
+            date=datetime.now(timezone.utc),
+            chat=Chat(id=chat_id, type="private"),
+            text=getattr(method, "text", None),
+            photo=[PhotoSize(file_id="stub", file_unique_id="stub", width=1, height=1)]
+            if type(method).__name__ == "SendPhoto" else None,
+        )
+
+    async def stream_content(self, url: str, headers: Optional[Dict[str, Any]] = None, timeout: int = 30,
+                             chunk_size: int = 65536, raise_for_status: bool = True):
+        yield b""
+
+    async def close(self) -> None:
+        pass
+
+
+class TimedMiddleware(BaseMiddleware):
+    """Records a middleware's own time: total minus the time spent in `handler`"""
+
+    def __init__(self, inner: Callable, samples: List[float]):
+        self.inner = inner
+        self.samples = samples
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        downstream = 0.0
+
+        async def timed(event: TelegramObject, data: Dict[str, Any]) -> Any:
+            nonlocal downstream
+            started = time.perf_counter()
+            try:
+                return await handler(event, data)
+            finally:
+                downstream += time.perf_counter() - started
+
+        started = time.perf_counter()
+        try:
+            return await self.inner(timed, event, data)
+        finally:
+            self.samples.append(time.perf_counter() - started - downstream)
+
+
+async def passthrough(handler, event, data):
+    return await handler(event, data)
+
+
+def instrument(dp, costs: Dict[str, List[float]]) -> None:
+    """Wrap every middleware, plus one innermost pass-through that times the handlers"""
+    for manager in (dp.update.outer_middleware, dp.message.middleware):
+        middlewares = list(manager)
+        for middleware in middlewares:
+            manager.unregister(middleware)
+        for middleware in middlewares:
+            manager.register(TimedMiddleware(middleware, costs[type(middleware).__name__]))
+    dp.message.middleware.register(TimedMiddleware(passthrough, costs["handlers"]))
+
+
+def make_update(update_id: int, user_id: int, text: str) -> Update:
+    return Update(
+        update_id=update_id,
+        message=Message(
+            message_id=update_id,
+            date=datetime.now(timezone.utc),
+            chat=Chat(id=user_id, type="private"),
+            from_user=User(id=user_id, is_bot=False, first_name=f"load{user_id}"),
+            text=text,
+        ),
+    )
+
+
+def percentiles(samples: List[float]) -> str:
+    if not samples:
+        return "-"
+    ordered = sorted(samples)
+
+    def at(q: float) -> float:
+        return ordered[min(int(q * len(ordered)), len(ordered) - 1)] * 1000
+
+    return (
+        f"mean {statistics.fmean(ordered) * 1000:8.2f}  p50 {at(0.5):8.2f}  "
+        f"p90 {at(0.9):8.2f}  p99 {at(0.99):8.2f}  max {ordered[-1] * 1000:8.2f} ms"
+    )
+
+
+async def run() -> None:
+    session = RecordingSession(args.api_latency)
+    bot = Bot(token=os.environ["BOT_TOKEN"], session=session)
+    llm = StubLLM(args.llm_latency)
+    gemini_service.backend = llm
+
+    dp = build_dispatcher()
+    costs: Dict[str, List[float]] = defaultdict(list)
+    instrument(dp, costs)
+
+    await asyncio.gather(DatabasePool.warm(), init_db())
+    outbox.start(bot)
+
+    latencies: List[float] = []
+    lag: List[float] = []
+    stop = asyncio.Event()
+    monitor = asyncio.create_task(measure_lag(lag, stop))
+    update_ids = iter(range(1, sys.maxsize))
+
+    async def simulate(user_id: int) -> None:
+        await asyncio.sleep(random.uniform(0, args.interval))
+        for _ in range(args.messages):
+            update = make_update(next(update_ids), user_id, random.choice(QUESTIONS)[0])
+            started = time.perf_counter()
+            await dp.feed_update(bot, update)
+            latencies.append(time.perf_counter() - started)
+            await asyncio.sleep(args.interval)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(simulate(args.first_user_id + n) for n in range(args.users)))
+    elapsed = time.perf_counter() - started
+    await outbox.close(timeout=30)
+    stop.set()
+    await monitor
+
+    async with DatabasePool.acquire() as conn:
+        await conn.execute(
+            "DELETE FROM users WHERE id >= $1 AND id < $2", args.first_user_id, args.first_user_id + args.users
+        )
+    await close_db()
+
+    print(f"Updates:      {len(latencies)} from {args.users} users in {elapsed:.2f} s "
+          f"({len(latencies) / elapsed:.1f} updates/s)")
+    print(f"Handled:      {len(costs['handlers'])} (the rest throttled)")
+    print(f"LLM calls:    {llm.calls}")
+    print(f"Bot API:      {dict(session.calls)}  merged replies {outbox.merged}")
+    print(f"feed_update   {percentiles(latencies)}")
+    print(f"loop lag      {percentiles(lag)}")
+    print("\nOwn time per middleware:")
+    for name, samples in costs.items():
+        print(f"  {name:26} n={len(samples):6}  {percentiles(samples)}")
+
+
+if __name__ == "__main__":
+    asyncio.run(run())
@@ -0,0 +1,84 @@
+"""
+Report on the query log: most frequent questions and slowest SQL shapes
+
+    python -m scripts.query_log_report --days 7 --limit 20
+    python -m scripts.query_log_report --prune
+"""
+import argparse
+import asyncio
+from pathlib import Path
+import sys
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import asyncpg
+from core.config import config
+from services.query_log import PRUNE_SQL
+
+TOP_QUESTIONS_SQL = """
+    SELECT lower(btrim(question)) AS question,
+           COUNT(*) AS asked,
+           COUNT(*) FILTER (WHERE error IS NOT NULL) AS failed,
+           percentile_cont(0.5) WITHIN GROUP (ORDER BY total_ms) AS p50_ms
+    FROM query_log
+    WHERE created_at >= NOW() - make_interval(days => $1)
+    GROUP BY 1
+    ORDER BY asked DESC
+    LIMIT $2
+"""
+
+SLOWEST_SHAPES_SQL = """
+    SELECT shape,
+           COUNT(*) AS runs,
+           percentile_cont(0.5) WITHIN GROUP (ORDER BY db_ms) AS p50_ms,
+           percentile_cont(0.95) WITHIN GROUP (ORDER BY db_ms) AS p95_ms,
+           SUM(db_ms) AS total_ms
+    FROM query_log
+    WHERE created_at >= NOW() - make_interval(days => $1) AND shape IS NOT NULL AND db_ms IS NOT NULL
+    GROUP BY shape
+    ORDER BY p95_ms DESC
+    LIMIT $2
+"""
+
+
+async def report(days: int, limit: int):
+    conn = await asyncpg.connect(dsn=config.asyncpg_dsn)
+
+    try:
+        total = await conn.fetchval(
+            "SELECT COUNT(*) FROM query_log WHERE created_at >= NOW() - make_interval(days => $1)", days
+        )
+        print(f"Questions in the last {days} days: {total}\n")
+
+        print("Top questions:")
+        for row in await conn.fetch(TOP_QUESTIONS_SQL, days, limit):
+            print(f"   {row['asked']:6}x  failed {row['failed']:4}  p50 {row['p50_ms'] or 0:8.1f} ms  {row['question'][:100]}")
+
+        print("\nSlowest SQL shapes (db time):")
+        for row in await conn.fetch(SLOWEST_SHAPES_SQL, days, limit):
+            print(
+                f"   p95 {row['p95_ms']:8.1f} ms  p50 {row['p50_ms']:8.1f} ms  "
+                f"runs {row['runs']:5}  total {row['total_ms'] / 1000:7.1f} s  {row['shape'][:120]}"
+            )
+    finally:
+        await conn.close()
+
+
+async def prune():
+    conn = await asyncpg.connect(dsn=config.asyncpg_dsn)
+
+    try:
+        status = await conn.execute(PRUNE_SQL, config.query_log_retention_days)
+        print(f"Retention {config.query_log_retention_days} days: {status}")
+    finally:
+        await conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Query log report")
+    parser.add_argument("--days", type=int, default=7)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--prune", action="store_true", help="delete entries older than QUERY_LOG_RETENTION_DAYS")
+    args = parser.parse_args()
+
+    asyncio.run(prune() if args.prune else report(args.days, args.limit))
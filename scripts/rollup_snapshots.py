@@ -0,0 +1,63 @@
+"""
+Roll hourly snapshots older than SNAPSHOT_HOURLY_DAYS into daily rows
+
+    python -m scripts.rollup_snapshots --dry-run
+    python -m scripts.rollup_snapshots --days 14
+
+Needs the daily tier (`alembic upgrade head` or an import with --compact);
+not available in sharded mode.
+Safe to run from cron: days already rolled up are merged, not duplicated.
+"""
+import argparse
+import asyncio
+from pathlib import Path
+import sys
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import asyncpg
+from core.config import config
+from services.retention import NoDailyTier, pending_days, retention_cutoff, rollup_snapshots
+from services.shard_router import shard_router
+
+
+async def run(days: int, dry_run: bool):
+    if shard_router.enabled:
+        print("Cannot roll up: with DB_SHARD_URLS the snapshots live on the shards, retention only handles DATABASE_URL")
+        sys.exit(1)
+
+    conn = await asyncpg.connect(dsn=config.asyncpg_dsn)
+
+    try:
+        cutoff = retention_cutoff(days)
+        print(f"Keeping hourly snapshots from {cutoff} (UTC)")
+
+        if dry_run:
+            rows = await pending_days(conn, cutoff)
+            for row in rows:
+                print(f"   {row['day']}  {row['hourly_rows']:8} hourly rows")
+            print(f"{len(rows)} days, {sum(row['hourly_rows'] for row in rows)} hourly rows to roll up")
+            return
+
+        rolled = await rollup_snapshots(conn, cutoff)
+        for day in rolled:
+            print(f"   {day.day}  {day.hourly_rows:8} hourly -> {day.daily_rows:6} daily rows")
+
+        hourly = sum(day.hourly_rows for day in rolled)
+        daily = sum(day.daily_rows for day in rolled)
+        print(f"Rolled up {len(rolled)} days: {hourly} hourly rows -> {daily} daily rows")
+    except NoDailyTier as e:
+        print(f"Cannot roll up: {e}")
+        sys.exit(1)
+    finally:
+        await conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Downsample old hourly snapshots")
+    parser.add_argument("--days", type=int, default=config.snapshot_hourly_days,
+                        help="days of hourly snapshots to keep")
+    parser.add_argument("--dry-run", action="store_true", help="only show what would be rolled up")
+    args = parser.parse_args()
+
+    asyncio.run(run(args.days, args.dry_run))
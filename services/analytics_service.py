@@ -1,31 +1,152 @@
-from typing import Optional, Tuple
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Any, List, Optional, Tuple
 import asyncpg
 
 from core.config import config
-from services.gemini_service import gemini_service
+from core.logging import span
+from database.session import DatabasePool
+from services.answer_cache import answer_cache
+from services.chart_service import chart_service, ChartImage
+from services.circuit_breaker import CircuitOpenError, db_breaker
+from services.data_version import data_version_service, versioned_read
+from services.gemini_service import gemini_service, CHART_INSTRUCTIONS, TABLE_INSTRUCTIONS
+from services.query_ir import compile_query, parse_query_ir
+from services.query_log import query_log
+from services.question_templates import match_template
+from services.shard_router import shard_router
+from services.sketch_store import sketch_store
+from services.snapshot_store import snapshot_store
+from services.sql_shapes import AggregateQuery
+from services.table_export import open_writer
+from services.video_store import video_store
+
+
+@dataclass
+class TableResult:
+    columns: List[str]
+    rows: List[Tuple[Any, ...]] = field(default_factory=list)
+    path: Optional[str] = None
+    row_count: int = 0
+    truncated: bool = False
 
 
 class AnalyticsService:
     
-    async def process_question(self, question: str) -> Tuple[Optional[int], Optional[str]]:
+    async def process_question(self, question: str, version: Optional[int] = None) -> Tuple[Optional[int], Optional[str]]:
+        started = time.perf_counter()
+        sql, result, error = None, None, None
+        if version is None and shard_router.enabled:
+            version = await self._data_version()
         try:
-            sql = await gemini_service.generate_sql(question)
+            query = match_template(question)
+            if query is None and config.query_ir:
+                with span("llm"):
+                    query = parse_query_ir(await gemini_service.generate_query_ir(question))
             
-            if not sql:
-                return None, "Не удалось сгенерировать SQL запрос"
-
-            if "idk man" in sql.lower():
-                return None, "Этот запрос нельзя корректно посчитать по текущим данным. Уточните, по какому полю сортировать и какую метрику использовать."
+            if query is not None:
+                with span("db"):
+                    result, sql, read_version = await self._execute_aggregate(query)
+                answer_cache.put(question, result, version if read_version is None else read_version)
+                return result, None
+            
+            with span("llm"):
+                sql = await gemini_service.generate_sql(question)
+            
+            error = self._validate_sql(sql)
+            if error:
+                return None, error
+            
+            with span("db"):
+                result, read_version = await self._execute_query(sql)
+            
+            answer_cache.put(question, result, version if read_version is None else read_version)
+            return result, None
             
+        except CircuitOpenError as e:
+            result, error = self._fallback(question, e)
+            return result, error
+        except asyncpg.PostgresError as e:
+            error = f"Ошибка базы данных: {str(e)}"
+            return None, error
+        except Exception as e:
+            error = f"Ошибка: {str(e)}"
+            return None, error
+        except asyncio.CancelledError:
+            error = "cancelled"
+            raise
+        finally:
+            query_log.record("question", question, sql, result, error, (time.perf_counter() - started) * 1000)
+    
+    async def process_inline(self, question: str, debounce: float) -> Tuple[Optional[int], Optional[str]]:
+        """Answer for inline mode: a fresh cached answer at once, otherwise after `debounce` quiet
+        seconds the template fast path, and the LLM only for questions ending with "?"
 
-            if not self._is_safe_query(sql):
-                return None, "Запрос содержит недопустимые операции"
+        (None, None) means the question is not complete enough to spend an LLM call on.
+        """
+        version = await self._data_version()
+        if version is not None:
+            cached = answer_cache.fresh(question, version)
+            if cached is not None:
+                return cached, None
         
-            if not self._returns_single_value(sql):
-                return None, "Этот запрос нельзя корректно посчитать по текущим данным"
-
+        await asyncio.sleep(debounce)
+        
+        if match_template(question) is None and not question.rstrip().endswith("?"):
+            return None, None
+        return await self.process_question(question, version)
+    
+    async def process_batch(self, questions: List[str]) -> List[Tuple[Optional[int], Optional[str]]]:
+        """Generate SQL for all questions in one LLM call and run them concurrently"""
+        started = time.perf_counter()
+        try:
+            with span("llm"):
+                sqls = await gemini_service.generate_sql_batch(questions)
+        except CircuitOpenError as e:
+            return [self._fallback(question, e) for question in questions]
+        except Exception as e:
+            return [(None, f"Ошибка: {str(e)}")] * len(questions)
+        
+        semaphore = asyncio.Semaphore(config.batch_concurrency)
+        version = await self._data_version() if shard_router.enabled else None
+        
+        async def answer(question: str, sql: Optional[str]) -> Tuple[Optional[int], Optional[str]]:
+            result, error = await run(question, sql)
+            query_log.record("batch", question, sql, result, error, (time.perf_counter() - started) * 1000)
+            return result, error
+        
+        async def run(question: str, sql: Optional[str]) -> Tuple[Optional[int], Optional[str]]:
+            error = self._validate_sql(sql)
+            if error:
+                return None, error
+            
+            try:
+                async with semaphore:
+                    result, read_version = await self._execute_query(sql)
+                answer_cache.put(question, result, version if read_version is None else read_version)
+                return result, None
+            except CircuitOpenError as e:
+                return self._fallback(question, e)
+            except asyncpg.PostgresError as e:
+                return None, f"Ошибка базы данных: {str(e)}"
+            except Exception as e:
+                return None, f"Ошибка: {str(e)}"
+        
+        with span("db"):
+            return list(await asyncio.gather(*(answer(q, sql) for q, sql in zip(questions, sqls))))
+    
+    async def process_table(self, question: str, file_format: str = "csv") -> Tuple[Optional[TableResult], Optional[str]]:
+        try:
+            with span("llm"):
+                sql = await gemini_service.generate_sql(question, TABLE_INSTRUCTIONS)
             
-            result = await self._execute_query(sql)
+            error = self._validate_sql(sql, single_value=False)
+            if error:
+                return None, error
+            
+            with span("db"):
+                result = await self._stream_table(sql, file_format)
             
             return result, None
             
@@ -34,6 +155,83 @@ class AnalyticsService:
         except Exception as e:
             return None, f"Ошибка: {str(e)}"
     
+    async def process_chart(self, question: str) -> Tuple[Optional[ChartImage], Optional[str]]:
+        try:
+            version = await data_version_service.get()
+            image = chart_service.for_question(question, version)
+            if image is not None:
+                return image, None
+            
+            with span("llm"):
+                sql = await gemini_service.generate_sql(question, CHART_INSTRUCTIONS)
+            
+            error = self._validate_sql(sql, single_value=False)
+            if error:
+                return None, error
+            
+            key = (chart_service.fingerprint(sql), version)
+            image = chart_service.get(key)
+            if image is not None:
+                chart_service.remember_question(question, version, key)
+                return image, None
+            
+            chart_sql = f"SELECT * FROM ({sql.rstrip().rstrip(';')}) AS chart LIMIT {config.chart_max_points}"
+            with span("db"):
+                if shard_router.enabled:
+                    async with db_breaker.guard(), self._acquire(sql) as conn:
+                        rows = await conn.fetch(chart_sql)
+                else:
+                    # Cached under the version of the replica snapshot actually read
+                    async with db_breaker.guard(), versioned_read() as (conn, version):
+                        rows = await conn.fetch(chart_sql)
+                    key = (key[0], version)
+            
+            if not rows:
+                return None, "Нет данных для графика"
+            
+            if len(rows[0]) < 2:
+                return None, "Этот запрос нельзя показать на графике"
+            
+            with span("render"):
+                image = await chart_service.render(key, rows)
+            chart_service.remember_question(question, version, key)
+            
+            return image, None
+            
+        except asyncpg.PostgresError as e:
+            return None, f"Ошибка базы данных: {str(e)}"
+        except Exception as e:
+            return None, f"Ошибка: {str(e)}"
+    
+    async def _data_version(self) -> Optional[int]:
+        """Version the answers are cached under; None keeps them out of inline mode"""
+        try:
+            return await data_version_service.get()
+        except Exception:
+            return None
+    
+    def _fallback(self, question: str, error: CircuitOpenError) -> Tuple[Optional[int], Optional[str]]:
+        """Last answer to the same question while a breaker is open, marked as possibly stale"""
+        cached = answer_cache.get(question)
+        if cached is None:
+            return None, str(error)
+        return cached, None
+    
+    def _validate_sql(self, sql: Optional[str], single_value: bool = True) -> Optional[str]:
+        if not sql:
+            return "Не удалось сгенерировать SQL запрос"
+
+        if "idk man" in sql.lower():
+            return "Этот запрос нельзя корректно посчитать по текущим данным. Уточните, по какому полю сортировать и какую метрику использовать."
+
+        if not self._is_safe_query(sql):
+            return "Запрос содержит недопустимые операции"
+    
+        if single_value and not self._returns_single_value(sql):
+            return "Этот запрос нельзя корректно посчитать по текущим данным"
+        
+        return None
+    
     def _is_safe_query(self, sql: str) -> bool:
         sql_upper = sql.upper().strip()
 
@@ -56,21 +254,88 @@ class AnalyticsService:
         return True
 
     
-    async def _execute_query(self, sql: str) -> Optional[int]:
-        conn = await asyncpg.connect(dsn=config.asyncpg_dsn)
+    def _acquire(self, sql: str):
+        """Connection for a multi-row statement; in sharded mode only the creator's shard can answer"""
+        if shard_router.enabled:
+            return DatabasePool.acquire_shard(shard_router.plan(sql, single_value=False).shards[0])
+        return DatabasePool.acquire(readonly=True)
+    
+    async def _execute_query(self, sql: str) -> Tuple[int, Optional[int]]:
+        """Result and the data version it was read at
+
+        The version comes from the store or the replica that answered; None in
+        sharded mode, where the caller's earlier read of the primary applies.
+        """
+        if shard_router.enabled:
+            async with db_breaker.guard():
+                return int(await shard_router.fetchval(sql) or 0), None
         
-        try:
+        for store in (sketch_store, video_store, snapshot_store):
+            result = await store.try_answer(sql)
+            if result is not None:
+                return result, store.version
+        
+        async with db_breaker.guard(), versioned_read() as (conn, version):
             result = await conn.fetchval(sql)
             
             if result is None:
-                return 0
+                return 0, version
             
-            return int(result)
-            
-        finally:
-            await conn.close()
+            return int(result), version
 
+    
+    async def _execute_aggregate(self, query: AggregateQuery) -> Tuple[int, str, Optional[int]]:
+        """Run a structured query compiled once; returns the result, that SQL and
+        the data version as `_execute_query` does"""
+        if shard_router.enabled:
+            async with db_breaker.guard():
+                return (*await shard_router.fetch_aggregate(query), None)
+        
+        sql, params = compile_query(query)
+        for store in (sketch_store, video_store, snapshot_store):
+            result = await store.answer(query)
+            if result is not None:
+                return result, sql, store.version
+        
+        async with db_breaker.guard(), versioned_read() as (conn, version):
+            result = await conn.fetchval(sql, *params)
+        
+        return int(result or 0), sql, version
 
+
+    async def _stream_table(self, sql: str, file_format: str) -> TableResult:
+        """Small results stay inline, larger ones are written to a file chunk by chunk"""
+        async with db_breaker.guard(timed=False), self._acquire(sql) as conn:
+            async with conn.transaction(readonly=True):
+                statement = await conn.prepare(sql)
+                columns = [attribute.name for attribute in statement.get_attributes()]
+                cursor = await statement.cursor()
+                
+                rows = await cursor.fetch(config.table_inline_rows + 1)
+                if len(rows) <= config.table_inline_rows:
+                    return TableResult(columns, [tuple(row) for row in rows], row_count=len(rows))
+                
+                writer = open_writer(file_format, columns)
+                try:
+                    truncated = False
+                    requested = len(rows)
+                    while rows:
+                        await writer.write(rows)
+                        remaining = config.table_max_rows - writer.rows_written
+                        if remaining <= 0:
+                            truncated = bool(await cursor.fetch(1))
+                            break
+                        if len(rows) < requested:
+                            break
+                        requested = min(config.table_chunk_rows, remaining)
+                        rows = await cursor.fetch(requested)
+                    path = await writer.close()
+                except BaseException:
+                    writer.discard()
+                    raise
+        
+        return TableResult(columns, path=path, row_count=writer.rows_written, truncated=truncated)
+    
     def _returns_single_value(self, sql: str) -> bool:
         sql_upper = sql.upper()
         return "COUNT(" in sql_upper or "SUM(" in sql_upper
@@ -0,0 +1,63 @@
+"""
+Last known answer per question
+
+Served, marked stale, when a circuit breaker is open; inline mode uses it
+as is while the data version it was computed at is still current.
+"""
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Optional, Tuple
+
+from core.config import config
+from services.question_templates import normalize
+
+
+class Stale(int):
+    """Cached answer from `cached_at`; keeps the estimate error of the original if any"""
+
+    def __new__(cls, value: int, cached_at: datetime):
+        result = super().__new__(cls, value)
+        result.cached_at = cached_at
+        relative_error = getattr(value, "relative_error", None)
+        if relative_error is not None:
+            result.relative_error = relative_error
+        return result
+
+
+class AnswerCache:
+
+    def __init__(self, capacity: int = 10000):
+        self.capacity = capacity
+        self._answers: OrderedDict[str, Tuple[int, datetime, Optional[int]]] = OrderedDict()
+        self.served = 0
+
+    def put(self, question: str, value: int, version: Optional[int] = None) -> None:
+        if self.capacity <= 0:
+            return
+        key = normalize(question)
+        self._answers[key] = (value, datetime.now(timezone.utc), version)
+        self._answers.move_to_end(key)
+        while len(self._answers) > self.capacity:
+            self._answers.popitem(last=False)
+
+    def get(self, question: str) -> Optional[Stale]:
+        entry = self._answers.get(normalize(question))
+        if entry is None:
+            return None
+        self.served += 1
+        return Stale(entry[0], entry[1])
+
+    def fresh(self, question: str, version: int) -> Optional[int]:
+        """Cached answer computed at data version `version`"""
+        key = normalize(question)
+        entry = self._answers.get(key)
+        if entry is None or entry[2] != version:
+            return None
+        self._answers.move_to_end(key)
+        return entry[0]
+
+    def __len__(self) -> int:
+        return len(self._answers)
+
+
+answer_cache = AnswerCache(config.answer_cache_size)
@@ -0,0 +1,112 @@
+import asyncio
+import hashlib
+import multiprocessing
+import re
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from datetime import date, datetime
+from typing import Any, List, Optional, Tuple
+
+from core.config import config
+from services.question_templates import normalize
+from utils.charts import render_line_chart
+
+
+CacheKey = Tuple[str, int]
+
+
+@dataclass
+class ChartImage:
+    key: CacheKey
+    png: bytes
+    points: int
+    file_id: Optional[str] = None
+
+
+class ChartService:
+    """Renders charts in a process pool and caches them by (SQL fingerprint, data version)
+
+    Questions seen before map straight to their chart, so a repeat skips the LLM too.
+    """
+
+    def __init__(self, max_workers: int = 2, cache_size: int = 128):
+        self.max_workers = max_workers
+        self.cache_size = cache_size
+        self._cache: OrderedDict[CacheKey, ChartImage] = OrderedDict()
+        self._questions: OrderedDict[CacheKey, CacheKey] = OrderedDict()
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def fingerprint(sql: str) -> str:
+        normalized = re.sub(r"\s+", " ", sql).strip().rstrip(";").strip()
+        return hashlib.sha256(normalized.encode()).hexdigest()[:16]
+
+    def get(self, key: CacheKey) -> Optional[ChartImage]:
+        image = self._cache.get(key)
+        if image is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._cache.move_to_end(key)
+        return image
+
+    def for_question(self, question: str, version: int) -> Optional[ChartImage]:
+        key = self._questions.get((normalize(question), version))
+        return self.get(key) if key is not None else None
+
+    def remember_question(self, question: str, version: int, key: CacheKey) -> None:
+        question_key = (normalize(question), version)
+        self._questions[question_key] = key
+        self._questions.move_to_end(question_key)
+        while len(self._questions) > self.cache_size * 4:
+            self._questions.popitem(last=False)
+
+    async def render(self, key: CacheKey, rows: List[Tuple[Any, Any]]) -> ChartImage:
+        labels = [self._label(row[0]) for row in rows]
+        values = [float(row[1] or 0) for row in rows]
+
+        loop = asyncio.get_running_loop()
+        png = await loop.run_in_executor(self._get_executor(), render_line_chart, labels, values)
+
+        image = ChartImage(key, png, len(rows))
+        self._cache[key] = image
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return image
+
+    def remember_file_id(self, key: CacheKey, file_id: str) -> None:
+        """Store Telegram's file_id so repeat requests resend without uploading"""
+        image = self._cache.get(key)
+        if image is not None:
+            image.file_id = file_id
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn: forking a process that runs the logging thread can deadlock
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._executor
+
+    @staticmethod
+    def _label(value: Any) -> str:
+        if isinstance(value, datetime):
+            return value.strftime("%Y-%m-%d %H:%M") if (value.hour or value.minute) else value.strftime("%Y-%m-%d")
+        if isinstance(value, date):
+            return value.isoformat()
+        return str(value)
+
+
+chart_service = ChartService(
+    max_workers=config.chart_workers,
+    cache_size=config.chart_cache_size,
+)
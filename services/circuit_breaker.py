@@ -0,0 +1,165 @@
+"""
+Circuit breakers for the LLM and database stages
+
+A breaker keeps the outcomes of the last `window` calls; a call fails if it
+raises one of `failures` or takes longer than `slow_call` seconds. Once at
+least `min_calls` are recorded and the failed share reaches `failure_rate`
+the breaker opens and rejects calls with CircuitOpenError for
+`open_seconds`. It then lets `half_open_calls` probes through: a good probe
+closes it, a bad one opens it again. Only the probes decide: calls admitted
+before the breaker opened that finish later are ignored.
+"""
+import asyncio
+import math
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Deque, Optional, Tuple, Type
+
+import aiohttp
+import asyncpg
+from sqlalchemy.exc import SQLAlchemyError
+
+from core.config import config
+from services.llm_providers import ProviderError
+
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# Errors of the service itself, not of the question: bad generated SQL does not count
+DB_FAILURES = (
+    OSError,
+    SQLAlchemyError,
+    asyncpg.InterfaceError,
+    asyncpg.PostgresConnectionError,
+    asyncpg.TooManyConnectionsError,
+    asyncpg.CannotConnectNowError,
+    asyncpg.QueryCanceledError,
+)
+LLM_FAILURES = (ProviderError, aiohttp.ClientError, asyncio.TimeoutError)
+
+
+class CircuitOpenError(Exception):
+    def __init__(self, label: str, retry_in: float):
+        self.retry_in = retry_in
+        super().__init__(f"{label} временно недоступна, попробуйте через {max(math.ceil(retry_in), 1)} с")
+
+
+class CircuitBreaker:
+
+    def __init__(self, name: str, label: str, failures: Tuple[Type[BaseException], ...],
+                 window: int = 20, failure_rate: float = 0.5, min_calls: int = 5,
+                 slow_call: float = 10.0, open_seconds: float = 30.0, half_open_calls: int = 1):
+        self.name = name
+        self.label = label
+        self.failures = failures
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.slow_call = slow_call
+        self.open_seconds = open_seconds
+        self.half_open_calls = half_open_calls
+        self.state = CLOSED
+        self._outcomes: Deque[bool] = deque(maxlen=window)  # True = failed or slow
+        self._opened_at = 0.0
+        self._probes = 0
+        self._half_open_round = 0
+        self.trips = 0
+        self.rejected = 0
+
+    @asynccontextmanager
+    async def guard(self, timed: bool = True) -> AsyncIterator[None]:
+        """`timed=False` for calls whose duration depends on the result size, like exports"""
+        probe = self._admit()
+        started = time.perf_counter()
+        try:
+            yield
+        except asyncio.CancelledError:
+            self._release(probe)
+            raise
+        except self.failures:
+            self._record(True, probe)
+            raise
+        except BaseException:
+            self._record(timed and time.perf_counter() - started > self.slow_call, probe)
+            raise
+        else:
+            self._record(timed and time.perf_counter() - started > self.slow_call, probe)
+
+    def snapshot(self) -> dict:
+        return {
+            "state": self.state,
+            "failure_rate": round(sum(self._outcomes) / len(self._outcomes), 3) if self._outcomes else 0.0,
+            "calls": len(self._outcomes),
+            "trips": self.trips,
+            "rejected": self.rejected,
+        }
+
+    def _admit(self) -> Optional[int]:
+        """Half-open round the call probes for, None for an ordinary call"""
+        if self.state == OPEN:
+            remaining = self._opened_at + self.open_seconds - time.monotonic()
+            if remaining > 0:
+                self.rejected += 1
+                raise CircuitOpenError(self.label, remaining)
+            self.state = HALF_OPEN
+            self._probes = 0
+            self._half_open_round += 1
+
+        if self.state == HALF_OPEN:
+            if self._probes >= self.half_open_calls:
+                self.rejected += 1
+                raise CircuitOpenError(self.label, 1)
+            self._probes += 1
+            return self._half_open_round
+        return None
+
+    def _current_probe(self, probe: Optional[int]) -> bool:
+        return probe is not None and probe == self._half_open_round and self.state == HALF_OPEN
+
+    def _release(self, probe: Optional[int]) -> None:
+        if self._current_probe(probe):
+            self._probes -= 1
+
+    def _record(self, failed: bool, probe: Optional[int] = None) -> None:
+        if probe is not None:
+            if self._current_probe(probe):
+                self._probes -= 1
+                if failed:
+                    self._trip()
+                else:
+                    self.state = CLOSED
+                    self._outcomes.clear()
+            return
+
+        if self.state != CLOSED:
+            return
+
+        self._outcomes.append(failed)
+        if len(self._outcomes) >= self.min_calls and sum(self._outcomes) >= self.failure_rate * len(self._outcomes):
+            self._trip()
+
+    def _trip(self) -> None:
+        self.state = OPEN
+        self._opened_at = time.monotonic()
+        self._outcomes.clear()
+        self.trips += 1
+
+
+llm_breaker = CircuitBreaker(
+    "llm", "Языковая модель", LLM_FAILURES,
+    window=config.breaker_window,
+    failure_rate=config.breaker_failure_rate,
+    min_calls=config.breaker_min_calls,
+    slow_call=config.llm_slow_call_seconds,
+    open_seconds=config.breaker_open_seconds,
+)
+db_breaker = CircuitBreaker(
+    "db", "База данных", DB_FAILURES,
+    window=config.breaker_window,
+    failure_rate=config.breaker_failure_rate,
+    min_calls=config.breaker_min_calls,
+    slow_call=config.db_slow_call_seconds,
+    open_seconds=config.breaker_open_seconds,
+)
@@ -0,0 +1,79 @@
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional, Tuple
+
+import asyncpg
+
+from database.session import DatabasePool
+
+
+CREATE_SQL = """
+    CREATE TABLE IF NOT EXISTS data_version (
+        id INTEGER PRIMARY KEY,
+        version BIGINT NOT NULL DEFAULT 0,
+        updated_at TIMESTAMPTZ DEFAULT NOW()
+    )
+"""
+
+BUMP_SQL = """
+    INSERT INTO data_version (id, version, updated_at) VALUES (1, 1, NOW())
+    ON CONFLICT (id) DO UPDATE SET version = data_version.version + 1, updated_at = NOW()
+    RETURNING version
+"""
+
+
+async def bump_data_version(conn: asyncpg.Connection) -> int:
+    """Mark analytics data as changed; used by importers after writing"""
+    await conn.execute(CREATE_SQL)
+    return await conn.fetchval(BUMP_SQL)
+
+
+async def fetch_data_version(conn: asyncpg.Connection) -> int:
+    has_table = await conn.fetchval("SELECT to_regclass('data_version') IS NOT NULL")
+    if not has_table:
+        return 0
+    return await conn.fetchval("SELECT version FROM data_version WHERE id = 1") or 0
+
+
+@asynccontextmanager
+async def versioned_read() -> AsyncIterator[Tuple[asyncpg.Connection, int]]:
+    """Read connection and the data version of the snapshot it reads
+
+    Replicas may lag the primary `DataVersionService` reads from, so the
+    version is taken in the same repeatable-read transaction as the data.
+    """
+    async with DatabasePool.acquire(readonly=True) as conn:
+        async with conn.transaction(isolation="repeatable_read", readonly=True):
+            yield conn, await fetch_data_version(conn)
+
+
+class DataVersionService:
+    """Cached read of the data version, refreshed at most every `ttl` seconds"""
+
+    def __init__(self, ttl: float = 5.0):
+        self.ttl = ttl
+        self._version: Optional[int] = None
+        self._checked_at = 0.0
+
+    async def get(self) -> int:
+        if self._version is None or time.monotonic() - self._checked_at >= self.ttl:
+            self._version = await self._fetch()
+            self._checked_at = time.monotonic()
+        return self._version
+
+    def invalidate(self) -> None:
+        self._version = None
+
+    def outdated(self, loaded: Optional[int], loaded_at: float, version: int) -> bool:
+        """Whether data loaded at version `loaded` needs a reload; a replica that
+        was still behind is asked again once per `ttl`"""
+        if loaded is None:
+            return True
+        return loaded != version and time.monotonic() - loaded_at >= self.ttl
+
+    async def _fetch(self) -> int:
+        async with DatabasePool.acquire() as conn:
+            return await fetch_data_version(conn)
+
+
+data_version_service = DataVersionService()
@@ -1,10 +1,15 @@
 import aiohttp
 import asyncio
-from typing import Optional
+import json
+import logging
+from typing import List, Optional
 
-from core.config import config
+from services.circuit_breaker import llm_breaker
+from services.llm_providers import RateLimitError, build_backend
 
 
+logger = logging.getLogger(__name__)
+
 SYSTEM_PROMPT = """You are a precise SQL query generator for a PostgreSQL video analytics database.
 
 DATABASE SCHEMA:
@@ -31,7 +36,7 @@ Table: video_snapshots (hourly measurements)
 - delta_likes_count: INTEGER - Likes gained since last snapshot
 - delta_comments_count: INTEGER - Comments gained since last snapshot
 - delta_reports_count: INTEGER - Reports gained since last snapshot
-- created_at: TIMESTAMPTZ - Snapshot timestamp (hourly)
+- created_at: TIMESTAMPTZ - Snapshot timestamp (hourly; older history is one end-of-day row per video per day)
 - updated_at: TIMESTAMPTZ - Record updated
 
 CRITICAL RULES:
@@ -104,53 +109,119 @@ A: SELECT COUNT(*) FROM video_snapshots WHERE delta_views_count < 0
 
 Generate SQL for this question:"""
 
+BATCH_INSTRUCTIONS = """You will get several numbered questions instead of one.
+Answer with ONLY a JSON array of strings, one SQL query per question, in the same order.
+Each query follows all the rules above and is written on a single line.
+If a question cannot be answered, put "idk man" in its place.
+
+Questions:"""
+
+BATCH_TOKENS_PER_QUESTION = 120
+
+TABLE_INSTRUCTIONS = """For this question the answer is a table, so rule 5 is relaxed:
+- The query MAY return many rows and several columns
+- Give every column a short readable alias
+- Always add ORDER BY so the output is deterministic
+- Still return a single SELECT statement on ONE line, no markdown
+
+Question:"""
+
+CHART_INSTRUCTIONS = """For this question the answer is a time-series chart, so rule 5 is relaxed:
+- Return exactly two columns: the x value aliased as label (a date, or an hour) and the numeric y value aliased as value
+- For growth over time use video_snapshots with SUM(delta_*) grouped by created_at::date, joining videos for creator filters
+- ORDER BY label ascending
+- Still return a single SELECT statement on ONE line, no markdown
+
+Example:
+Q: Как росли просмотры видео креатора abc123 в ноябре 2025?
+A: SELECT s.created_at::date AS label, COALESCE(SUM(s.delta_views_count), 0) AS value FROM video_snapshots s JOIN videos v ON v.id = s.video_id WHERE v.creator_id = 'abc123' AND s.created_at::date BETWEEN '2025-11-01' AND '2025-11-30' GROUP BY label ORDER BY label
+
+Question:"""
+
+IR_INSTRUCTIONS = """Instead of SQL, describe the query as ONE JSON object with these keys:
+- "table": "videos" or "video_snapshots"
+- "aggregation": "count", "sum" or "count_distinct"
+- "metric": column to SUM, "creator_id"/"video_id" for count_distinct, null for count
+- "filters": list of {"column": ..., "op": "=", ">", "<", ">=" or "<=", "value": ...}; integer values for *_count columns, "=" with a string for creator_id/video_id
+- "date_range": {"from": "YYYY-MM-DD", "to": "YYYY-MM-DD"} (inclusive, either may be null) on video_created_at for videos or created_at for video_snapshots, or null
+If the question does not fit this form, answer {"unsupported": true}.
+Return ONLY the JSON object, no markdown.
+
+Example:
+Q: Сколько видео у креатора с id abc123 вышло с 1 ноября 2025 по 5 ноября 2025 включительно?
+A: {"table": "videos", "aggregation": "count", "metric": null, "filters": [{"column": "creator_id", "op": "=", "value": "abc123"}], "date_range": {"from": "2025-11-01", "to": "2025-11-05"}}
+
+Question:"""
+
 
 class GeminiService:
     
-    def __init__(self):
-        self.api_key = config.gemini_api_key
-        self.model = "gemini-2.5-flash"
-        self.base_url = "https://generativelanguage.googleapis.com/v1beta/models"
+    def __init__(self, backend=None):
+        self.backend = backend or build_backend()
         self.max_retries = 3
         self.retry_delay = 2.0
     
-    async def generate_sql(self, user_question: str) -> Optional[str]:
-        url = f"{self.base_url}/{self.model}:generateContent?key={self.api_key}"
-        
-        payload = {
-            "contents": [
-                {
-                    "parts": [
-                        {"text": f"{SYSTEM_PROMPT}\n\n{user_question}"}
-                    ]
-                }
-            ],
-            "generationConfig": {
-                "temperature": 0,
-                "maxOutputTokens": 200,
-            }
-        }
+    async def generate_sql(self, user_question: str, instructions: Optional[str] = None) -> Optional[str]:
+        prompt = f"{SYSTEM_PROMPT}\n\n{user_question}"
+        if instructions:
+            prompt = f"{SYSTEM_PROMPT}\n\n{instructions}\n\n{user_question}"
+        
+        sql = await self._complete(prompt, stop_when=self._is_complete_statement)
+        if sql is None:
+            return None
+        
+        sql = self._clean_sql(sql)
+        # The workload read by scripts/index_advisor.py
+        logger.info("Generated SQL: %s", sql, extra={"sql": sql})
+        return sql
+    
+    async def generate_query_ir(self, user_question: str) -> Optional[dict]:
+        prompt = f"{SYSTEM_PROMPT}\n\n{IR_INSTRUCTIONS}\n\n{user_question}"
+        
+        text = await self._complete(prompt)
+        if text is None:
+            return None
+        
+        start, end = text.find("{"), text.rfind("}")
+        if start == -1 or end < start:
+            return None
+        
+        try:
+            data = json.loads(text[start:end + 1])
+        except json.JSONDecodeError:
+            return None
+        
+        return data if isinstance(data, dict) else None
+    
+    async def generate_sql_batch(self, questions: List[str]) -> List[Optional[str]]:
+        numbered = "\n".join(f"{i}. {question}" for i, question in enumerate(questions, 1))
+        prompt = f"{SYSTEM_PROMPT}\n\n{BATCH_INSTRUCTIONS}\n\n{numbered}"
+        
+        text = await self._complete(prompt, max_tokens=BATCH_TOKENS_PER_QUESTION * len(questions))
+        if text is None:
+            return [None] * len(questions)
+        
+        items = self._parse_json_array(text)
+        sqls: List[Optional[str]] = [None] * len(questions)
         
+        for position, item in enumerate(items[:len(questions)]):
+            if isinstance(item, str) and item.strip():
+                sqls[position] = self._clean_sql(item)
+                logger.info("Generated SQL: %s", sqls[position], extra={"sql": sqls[position]})
+        
+        return sqls
+    
+    async def _complete(self, prompt: str, stop_when=None, max_tokens: Optional[int] = None) -> Optional[str]:
         for attempt in range(self.max_retries):
             try:
-                async with aiohttp.ClientSession() as session:
-                    async with session.post(url, json=payload) as response:
-                        if response.status == 429:
-                            if attempt < self.max_retries - 1:
-                                await asyncio.sleep(self.retry_delay * (attempt + 1))
-                                continue
-                            else:
-                                raise Exception("Rate limit exceeded, please try again")
-                        
-                        if response.status != 200:
-                            error_text = await response.text()
-                            raise Exception(f"Gemini API error: {response.status} - {error_text}")
-                        
-                        data = await response.json()
-                
-                sql = data["candidates"][0]["content"]["parts"][0]["text"]
-                sql = self._clean_sql(sql)
-                return sql
+                async with llm_breaker.guard():
+                    return await self.backend.complete(prompt, stop_when=stop_when, max_tokens=max_tokens)
+            
+            except RateLimitError:
+                if attempt < self.max_retries - 1:
+                    await asyncio.sleep(self.retry_delay * (attempt + 1))
+                    continue
+                raise Exception("Rate limit exceeded, please try again")
                 
             except aiohttp.ClientError as e:
                 if attempt < self.max_retries - 1:
@@ -160,6 +231,36 @@ class GeminiService:
         
         return None
     
+    async def close(self) -> None:
+        await self.backend.close()
+    
+    def health(self) -> dict:
+        providers = getattr(self.backend, "providers", [self.backend])
+        return {provider.name: provider.health.snapshot() for provider in providers}
+    
+    def _is_complete_statement(self, text: str) -> bool:
+        body = text.lstrip()
+        
+        if body.startswith("```"):
+            fence_end = body.find("\n")
+            if fence_end == -1:
+                return False
+            body = body[fence_end + 1:].lstrip()
+        
+        return ";" in body or "\n" in body
+    
+    def _parse_json_array(self, text: str) -> list:
+        start, end = text.find("["), text.rfind("]")
+        if start == -1 or end < start:
+            return []
+        
+        try:
+            items = json.loads(text[start:end + 1])
+        except json.JSONDecodeError:
+            return []
+        
+        return items if isinstance(items, list) else []
+    
     def _clean_sql(self, sql: str) -> str:
         sql = sql.strip()
         
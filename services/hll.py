@@ -0,0 +1,90 @@
+"""
+HyperLogLog over 64-bit hashes, vectorized with NumPy
+
+A sketch is `2 ** precision` uint8 registers; merging sketches is an
+element-wise maximum, so per-day sketches combine into any date range. The
+relative standard error is 1.04 / sqrt(2 ** precision) (0.8% at 14).
+"""
+import math
+
+import numpy as np
+
+
+def relative_error(precision: int) -> float:
+    return 1.04 / math.sqrt(1 << precision)
+
+
+def empty(precision: int) -> np.ndarray:
+    return np.zeros(1 << precision, dtype=np.uint8)
+
+
+def mix64(hashes: np.ndarray) -> np.ndarray:
+    """splitmix64 finalizer, so weak input hashes still spread over all bits"""
+    z = hashes ^ (hashes >> np.uint64(30))
+    z = z * np.uint64(0xBF58476D1CE4E5B9)
+    z = z ^ (z >> np.uint64(27))
+    z = z * np.uint64(0x94D049BB133111EB)
+    return z ^ (z >> np.uint64(31))
+
+
+def registers(hashes: np.ndarray, precision: int) -> np.ndarray:
+    """Sketch of a uint64 hash array"""
+    sketch = empty(precision)
+    if not len(hashes):
+        return sketch
+
+    hashes = mix64(hashes.astype(np.uint64, copy=False))
+    width = 64 - precision
+    index = (hashes >> np.uint64(width)).astype(np.intp)
+    rest = hashes & np.uint64((1 << width) - 1)
+
+    # rest < 2 ** 53 for precision >= 11, so the float conversion is exact
+    _, bit_length = np.frexp(rest.astype(np.float64))
+    rank = (width + 1 - bit_length).astype(np.uint8)
+
+    np.maximum.at(sketch, index, rank)
+    return sketch
+
+
+def merge(sketches: np.ndarray) -> np.ndarray:
+    """Union of a (n, m) stack of sketches"""
+    return sketches.max(axis=0) if len(sketches) else sketches
+
+
+def estimate(sketch: np.ndarray) -> int:
+    """Ertl's improved estimator: unbiased across small and mid ranges without empirical tables"""
+    m = len(sketch)
+    q = 64 - (m.bit_length() - 1)
+    counts = np.bincount(sketch, minlength=q + 2)
+
+    z = m * _tau(1 - counts[q + 1] / m)
+    for k in range(q, 0, -1):
+        z = 0.5 * (z + counts[k])
+    z += m * _sigma(counts[0] / m)
+
+    return round(m * m / (2 * math.log(2)) / z)
+
+
+def _sigma(x: float) -> float:
+    if x == 1:
+        return math.inf
+    y, z = 1.0, x
+    while True:
+        x *= x
+        previous, z = z, z + x * y
+        y += y
+        if z == previous:
+            return z
+
+
+def _tau(x: float) -> float:
+    if x == 0 or x == 1:
+        return 0.0
+    y, z = 1.0, 1 - x
+    while True:
+        x = math.sqrt(x)
+        previous = z
+        y *= 0.5
+        z -= (1 - x) ** 2 * y
+        if z == previous:
+            return z / 3
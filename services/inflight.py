@@ -0,0 +1,62 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Dict, Optional
+
+
+logger = logging.getLogger(__name__)
+
+
+class SupersededError(Exception):
+    """The user sent a newer question before this one finished"""
+
+
+class InFlightRegistry:
+    """One running question per user; a newer one cancels the previous
+
+    Cancelling the task aborts its aiohttp request and makes asyncpg send a
+    cancel for the running query, so the pool connection is freed early.
+    """
+
+    def __init__(self):
+        self._tasks: Dict[int, asyncio.Task] = {}
+        self.superseded = 0
+        self.timed_out = 0
+
+    async def run(self, user_id: int, work: Awaitable[Any], timeout: Optional[float] = None) -> Any:
+        previous = self._tasks.get(user_id)
+        if previous is not None and not previous.done():
+            previous.cancel()
+            self.superseded += 1
+            logger.info("Cancelled superseded work for user %s", user_id)
+
+        task = asyncio.ensure_future(work)
+        self._tasks[user_id] = task
+        try:
+            done, _ = await asyncio.wait({task}, timeout=timeout)
+        except asyncio.CancelledError:
+            task.cancel()
+            raise
+        finally:
+            if self._tasks.get(user_id) is task:
+                del self._tasks[user_id]
+
+        if not done:
+            task.cancel()
+            self.timed_out += 1
+            raise asyncio.TimeoutError
+
+        if task.cancelled():
+            raise SupersededError
+        return task.result()
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": sum(not task.done() for task in self._tasks.values()),
+            "superseded": self.superseded,
+            "timed_out": self.timed_out,
+            "cancelled": self.superseded + self.timed_out,
+        }
+
+
+inflight_registry = InFlightRegistry()
+inline_registry = InFlightRegistry()
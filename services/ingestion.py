@@ -0,0 +1,393 @@
+"""
+Live ingestion of hourly snapshots
+
+Producers hand over parsed snapshot rows with `submit`; a single flusher
+collects them into micro-batches, COPYs each batch into a temp staging
+table and turns it into `video_snapshots` rows in one transaction:
+
+- delta_* are computed server-side from the previous snapshot of the same
+  video (earlier rows of the batch first, then the latest stored snapshot)
+- final counters on `videos` move forward to each video's newest snapshot
+- the distinct-count sketches of the touched days are marked for rebuilding
+- the data version is bumped so caches and column stores refresh, at most
+  once per `version_interval` seconds: a bump drops every cached answer and
+  chart and reloads the column stores, so answers may trail ingestion by
+  that long
+
+The text-keyed tables and the compact layout (database.compact_schema),
+with or without the daily tier, are supported; sharded mode is not.
+"""
+import asyncio
+import logging
+import time
+import uuid
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, List, Optional, Tuple
+
+from core.config import config
+from database.session import DatabasePool
+from services.data_version import bump_data_version, data_version_service
+from services.shard_router import shard_router
+from services.sketch_store import mark_dirty
+from services.sql_shapes import COUNT_COLUMNS
+
+
+logger = logging.getLogger(__name__)
+
+STAGING_COLUMNS = ["id", "video_id", *COUNT_COLUMNS, "created_at", "updated_at"]
+
+STAGING_SQL = """
+    CREATE TEMP TABLE IF NOT EXISTS ingest_staging (
+        id TEXT NOT NULL,
+        video_id TEXT NOT NULL,
+        views_count INTEGER NOT NULL,
+        likes_count INTEGER NOT NULL,
+        comments_count INTEGER NOT NULL,
+        reports_count INTEGER NOT NULL,
+        created_at TIMESTAMPTZ NOT NULL,
+        updated_at TIMESTAMPTZ NOT NULL
+    ) ON COMMIT DELETE ROWS
+"""
+
+_RANKED = f"""
+    WITH ranked AS (
+        SELECT s.*,
+               row_number() OVER w AS rn,
+               {", ".join(f"LAG(s.{c}) OVER w AS prev_{c}" for c in COUNT_COLUMNS)}
+        FROM ingest_staging s
+        WINDOW w AS (PARTITION BY s.video_id ORDER BY s.created_at)
+    )
+"""
+_COUNTS = ", ".join(f"r.{c}" for c in COUNT_COLUMNS)
+_DELTAS = ", ".join(f"r.{c} - COALESCE(r.prev_{c}, p.{c}, 0)" for c in COUNT_COLUMNS)
+_DELTA_COLUMNS = ", ".join(f"delta_{c}" for c in COUNT_COLUMNS)
+_LATEST = "(SELECT DISTINCT ON (video_id) * FROM ingest_staging ORDER BY video_id, created_at DESC) l"
+_SET_COUNTS = ", ".join(f"{c} = l.{c}" for c in COUNT_COLUMNS)
+
+# The lateral lookup only runs for the first row of each video (one-time filter on rn)
+INSERT_SQL = {
+    "text": _RANKED + f"""
+        INSERT INTO video_snapshots (id, video_id, {", ".join(COUNT_COLUMNS)}, {_DELTA_COLUMNS}, created_at, updated_at)
+        SELECT r.id, r.video_id, {_COUNTS}, {_DELTAS}, r.created_at, r.updated_at
+        FROM ranked r
+        JOIN videos v ON v.id = r.video_id
+        LEFT JOIN LATERAL (
+            SELECT {", ".join(COUNT_COLUMNS)} FROM video_snapshots p
+            WHERE r.rn = 1 AND p.video_id = r.video_id AND p.created_at < r.created_at
+            ORDER BY p.created_at DESC LIMIT 1
+        ) p ON true
+        ON CONFLICT (id) DO NOTHING
+        RETURNING id
+    """,
+    "compact": _RANKED + f"""
+        INSERT INTO snapshot_rows (id, created_at, updated_at, video_idx, {", ".join(COUNT_COLUMNS)}, {_DELTA_COLUMNS})
+        SELECT r.id::uuid, r.created_at, r.updated_at, v.idx, {_COUNTS}, {_DELTAS}
+        FROM ranked r
+        JOIN video_rows v ON v.id = r.video_id::uuid
+        LEFT JOIN LATERAL (
+            SELECT {", ".join(COUNT_COLUMNS)} FROM snapshot_rows p
+            WHERE r.rn = 1 AND p.video_idx = v.idx AND p.created_at < r.created_at
+            ORDER BY p.created_at DESC LIMIT 1
+        ) p ON true
+        ON CONFLICT (id) DO NOTHING
+        RETURNING id
+    """,
+    # Previous snapshot may already be in the daily tier; days rolled up are closed
+    "tiered": _RANKED + f"""
+        INSERT INTO snapshot_rows (id, created_at, updated_at, video_idx, {", ".join(COUNT_COLUMNS)}, {_DELTA_COLUMNS})
+        SELECT r.id::uuid, r.created_at, r.updated_at, v.idx, {_COUNTS}, {_DELTAS}
+        FROM ranked r
+        JOIN video_rows v ON v.id = r.video_id::uuid
+        LEFT JOIN LATERAL (
+            SELECT * FROM (
+                (SELECT {", ".join(COUNT_COLUMNS)}, p.created_at FROM snapshot_rows p
+                 WHERE r.rn = 1 AND p.video_idx = v.idx AND p.created_at < r.created_at
+                 ORDER BY p.created_at DESC LIMIT 1)
+                UNION ALL
+                (SELECT {", ".join(COUNT_COLUMNS)}, p.created_at FROM daily_snapshot_rows p
+                 WHERE r.rn = 1 AND p.video_idx = v.idx AND p.created_at < r.created_at
+                 ORDER BY p.day DESC LIMIT 1)
+            ) previous
+            ORDER BY created_at DESC LIMIT 1
+        ) p ON true
+        WHERE NOT EXISTS (
+            SELECT 1 FROM daily_snapshot_rows d
+            WHERE d.video_idx = v.idx AND d.day = (r.created_at AT TIME ZONE 'UTC')::date
+        )
+        ON CONFLICT (id) DO NOTHING
+        RETURNING id
+    """,
+}
+
+UPDATE_VIDEOS_SQL = {
+    "text": f"""
+        UPDATE videos v SET {_SET_COUNTS}, updated_at = l.created_at
+        FROM {_LATEST}
+        WHERE v.id = l.video_id AND (v.updated_at IS NULL OR v.updated_at < l.created_at)
+    """,
+    "compact": f"""
+        UPDATE video_rows v SET {_SET_COUNTS}, updated_at = l.created_at
+        FROM {_LATEST}
+        WHERE v.id = l.video_id::uuid AND (v.updated_at IS NULL OR v.updated_at < l.created_at)
+    """,
+}
+# The daily tier only adds snapshot rows; videos are stored as in the compact layout
+UPDATE_VIDEOS_SQL["tiered"] = UPDATE_VIDEOS_SQL["compact"]
+
+LAYOUT_SQL = """
+    SELECT CASE
+        WHEN to_regclass('daily_snapshot_rows') IS NOT NULL THEN 'tiered'
+        WHEN to_regclass('snapshot_rows') IS NOT NULL THEN 'compact'
+        ELSE 'text'
+    END
+"""
+
+
+class InvalidSnapshot(ValueError):
+    pass
+
+
+class IngestorClosed(RuntimeError):
+    def __init__(self):
+        super().__init__("ingestor is shutting down")
+
+
+def parse_snapshot(item: Any) -> Tuple:
+    """Staging row from one NDJSON object; delta_* fields in the input are ignored"""
+    if not isinstance(item, dict):
+        raise InvalidSnapshot("snapshot must be an object")
+    try:
+        created_at = _aware(datetime.fromisoformat(item["created_at"]))
+        updated_at = _aware(datetime.fromisoformat(item["updated_at"])) if item.get("updated_at") else created_at
+        return (
+            str(item["id"]),
+            str(item["video_id"]),
+            *(int(item.get(column) or 0) for column in COUNT_COLUMNS),
+            created_at,
+            updated_at,
+        )
+    except (KeyError, TypeError, ValueError) as e:
+        raise InvalidSnapshot(f"bad snapshot: {e}") from e
+
+
+@dataclass
+class Batch:
+    rows: List[Tuple]
+    done: asyncio.Future = field(default_factory=lambda: asyncio.get_running_loop().create_future())
+
+
+class SnapshotIngestor:
+    """Micro-batches submitted rows into COPY + set-based insert transactions"""
+
+    def __init__(self, batch_rows: int = 20000, flush_interval: float = 0.5, max_pending_rows: int = 200000,
+                 version_interval: float = 30.0):
+        self.batch_rows = batch_rows
+        self.flush_interval = flush_interval
+        self.max_pending_rows = max_pending_rows
+        self.version_interval = version_interval
+        self._pending: List[Batch] = []
+        self._pending_rows = 0
+        self._wakeup = asyncio.Event()
+        self._drained = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._closed = False
+        self._bumped_at: Optional[float] = None
+        self._unpublished = False
+        self._layout: Optional[str] = None
+        self._sketches: Optional[bool] = None
+        self.inserted = 0
+        self.skipped = 0
+        self.batches = 0
+        self.bumps = 0
+
+    async def submit(self, rows: List[Tuple]) -> Tuple[int, int]:
+        """Queue rows and wait until the micro-batch holding them is committed
+
+        Returns how many of these rows were inserted and how many were skipped
+        (already stored, unknown video, non-uuid id in the compact layout, or a
+        day already rolled up).
+        """
+        while self._pending_rows >= self.max_pending_rows and not self._closed:
+            self._drained.clear()
+            await self._drained.wait()
+        if self._closed:
+            raise IngestorClosed()
+
+        batch = Batch(rows)
+        self._pending.append(batch)
+        self._pending_rows += len(rows)
+        if self._pending_rows >= self.batch_rows:
+            self._wakeup.set()
+        return await batch.done
+
+    def start(self) -> None:
+        if shard_router.enabled:
+            raise RuntimeError(
+                "live ingestion writes to DATABASE_URL, but with DB_SHARD_URLS the videos live on the shards"
+            )
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self, timeout: float = 30.0) -> None:
+        """Stop taking rows, let the flush in progress finish and drain the queue
+
+        Whatever is still queued after `timeout` seconds fails with IngestorClosed.
+        """
+        self._closed = True
+        self._wakeup.set()
+        self._drained.set()
+
+        if self._task is None:
+            self._task = asyncio.create_task(self._drain())
+        try:
+            await asyncio.wait_for(asyncio.shield(self._task), timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Ingest queue not drained in %.0f s, failing %d rows", timeout, self._pending_rows)
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+        self._fail(self._pending, IngestorClosed())
+        self._pending.clear()
+        self._pending_rows = 0
+        if self._unpublished:
+            await self._publish()
+
+    async def _run(self) -> None:
+        while not self._closed:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self._drain()
+            if self._unpublished and self._version_due():
+                await self._publish()
+
+    async def _drain(self) -> None:
+        while self._pending:
+            await self._flush()
+
+    async def _flush(self) -> None:
+        batches, rows = [], 0
+        while self._pending and (not batches or rows + len(self._pending[0].rows) <= self.batch_rows):
+            batch = self._pending.pop(0)
+            batches.append(batch)
+            rows += len(batch.rows)
+        self._pending_rows -= rows
+        self._drained.set()
+
+        started = time.perf_counter()
+        bump = self._version_due()
+        try:
+            inserted_ids = await self._write([row for batch in batches for row in batch.rows], bump)
+        except asyncio.CancelledError:
+            self._fail(batches, IngestorClosed())
+            raise
+        except Exception as e:
+            logger.exception("Ingest batch of %d rows failed", rows)
+            self._fail(batches, e)
+            return
+
+        inserted = len(inserted_ids)
+        self.inserted += inserted
+        self.skipped += rows - inserted
+        self.batches += 1
+        if bump:
+            self._published()
+        else:
+            self._unpublished = True
+        remaining = Counter(inserted_ids)
+        for batch in batches:
+            count = 0
+            for row in batch.rows:
+                key = _canonical_id(row[0])
+                if remaining[key]:
+                    remaining[key] -= 1
+                    count += 1
+            if not batch.done.done():
+                batch.done.set_result((count, len(batch.rows) - count))
+
+        elapsed = time.perf_counter() - started
+        logger.info(
+            "Ingested %d/%d snapshots in %.1f ms (%.0f rows/s)",
+            inserted, rows, elapsed * 1000, rows / elapsed if elapsed else 0,
+        )
+
+    def _version_due(self) -> bool:
+        return self._bumped_at is None or time.monotonic() - self._bumped_at >= self.version_interval
+
+    async def _publish(self) -> None:
+        """Bump the data version for batches committed without one"""
+        try:
+            async with DatabasePool.acquire() as conn:
+                await bump_data_version(conn)
+        except Exception:
+            logger.exception("Data version bump failed, retrying after the next flush")
+            return
+        self._published()
+
+    def _published(self) -> None:
+        self._bumped_at = time.monotonic()
+        self._unpublished = False
+        self.bumps += 1
+        data_version_service.invalidate()
+
+    @staticmethod
+    def _fail(batches: List[Batch], error: Exception) -> None:
+        for batch in batches:
+            if not batch.done.done():
+                batch.done.set_exception(error)
+
+    async def _write(self, records: List[Tuple], bump: bool) -> List[str]:
+        """One transaction for the whole micro-batch; returns the ids inserted, canonical"""
+        async with DatabasePool.acquire() as conn:
+            if self._layout is None:
+                self._layout = await conn.fetchval(LAYOUT_SQL)
+                self._sketches = await conn.fetchval("SELECT to_regclass('snapshot_sketches') IS NOT NULL")
+
+            if self._layout != "text":
+                records = [row for row in records if _is_uuid(row[0]) and _is_uuid(row[1])]
+
+            async with conn.transaction():
+                await conn.execute(STAGING_SQL)
+                await conn.copy_records_to_table("ingest_staging", records=records, columns=STAGING_COLUMNS)
+                inserted = await conn.fetch(INSERT_SQL[self._layout])
+                await conn.execute(UPDATE_VIDEOS_SQL[self._layout])
+                if self._sketches:
+                    await mark_dirty(conn, sorted({row[6].astimezone(timezone.utc).date() for row in records}))
+                if bump:
+                    await bump_data_version(conn)
+
+        return [_canonical_id(str(row["id"])) for row in inserted]
+
+
+def _aware(value: datetime) -> datetime:
+    """Naive timestamps in the export are UTC"""
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+def _canonical_id(value: str) -> str:
+    """Snapshot ids as stored in either layout compare equal: uuids as 32 hex digits"""
+    try:
+        return uuid.UUID(value).hex
+    except ValueError:
+        return value
+
+
+def _is_uuid(value: str) -> bool:
+    try:
+        uuid.UUID(value)
+    except ValueError:
+        return False
+    return True
+
+
+snapshot_ingestor = SnapshotIngestor(
+    batch_rows=config.ingest_batch_rows,
+    flush_interval=config.ingest_flush_interval,
+    max_pending_rows=config.ingest_max_pending_rows,
+    version_interval=config.ingest_version_interval,
+)
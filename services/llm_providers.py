@@ -0,0 +1,306 @@
+import aiohttp
+import asyncio
+import json
+import logging
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from typing import Callable, Optional
+
+from core.config import config
+
+
+logger = logging.getLogger(__name__)
+
+StopCondition = Callable[[str], bool]
+
+
+class ProviderError(Exception):
+    pass
+
+
+class RateLimitError(ProviderError):
+    pass
+
+
+class ProviderHealth:
+    """Rolling latency window and failure tracking for one provider"""
+
+    def __init__(self, window: int = 200, failure_threshold: int = 3, cooldown: float = 30.0):
+        self.latencies: deque[float] = deque(maxlen=window)
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.requests = 0
+        self.failures = 0
+        self.cancelled = 0
+        self.consecutive_failures = 0
+        self._opened_at = 0.0
+
+    @property
+    def healthy(self) -> bool:
+        if self.consecutive_failures < self.failure_threshold:
+            return True
+        return time.monotonic() - self._opened_at >= self.cooldown
+
+    def quantile(self, q: float) -> Optional[float]:
+        if len(self.latencies) < 10:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def record_success(self, latency: float) -> None:
+        self.requests += 1
+        self.consecutive_failures = 0
+        self.latencies.append(latency)
+
+    def record_failure(self) -> None:
+        self.requests += 1
+        self.failures += 1
+        self.consecutive_failures += 1
+        if self.consecutive_failures >= self.failure_threshold:
+            self._opened_at = time.monotonic()
+
+    def record_cancel(self) -> None:
+        self.cancelled += 1
+
+    def snapshot(self) -> dict:
+        return {
+            "healthy": self.healthy,
+            "requests": self.requests,
+            "failures": self.failures,
+            "cancelled": self.cancelled,
+            "p50": self.quantile(0.5),
+            "p90": self.quantile(0.9),
+        }
+
+
+class LLMProvider(ABC):
+    """Base class for a text completion endpoint"""
+
+    def __init__(self, name: str, base_url: str, model: str, api_key: str,
+                 stream: bool = True, max_tokens: int = 200):
+        self.name = name
+        self.base_url = base_url.rstrip("/")
+        self.model = model
+        self.api_key = api_key
+        self.stream = stream
+        self.max_tokens = max_tokens
+        self.health = ProviderHealth()
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    async def complete(self, prompt: str, stop_when: Optional[StopCondition] = None,
+                       max_tokens: Optional[int] = None) -> str:
+        started = time.perf_counter()
+        try:
+            text = await self._request(prompt, stop_when, max_tokens or self.max_tokens)
+        except asyncio.CancelledError:
+            self.health.record_cancel()
+            raise
+        except Exception:
+            self.health.record_failure()
+            raise
+        self.health.record_success(time.perf_counter() - started)
+        return text
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession()
+        return self._session
+
+    async def _post(self, url: str, payload: dict, headers: Optional[dict] = None,
+                    stop_when: Optional[StopCondition] = None) -> str:
+        async with self._get_session().post(url, json=payload, headers=headers) as response:
+            if response.status == 429:
+                raise RateLimitError(f"{self.name} rate limit exceeded")
+
+            if response.status != 200:
+                error_text = await response.text()
+                raise ProviderError(f"{self.name} API error: {response.status} - {error_text}")
+
+            if self.stream:
+                return await self._read_stream(response, stop_when)
+            return self._extract_text(await response.json())
+
+    async def _read_stream(self, response: aiohttp.ClientResponse,
+                           stop_when: Optional[StopCondition]) -> str:
+        """Accumulate SSE chunks, closing the stream once `stop_when` is satisfied"""
+        text = ""
+
+        async for line in response.content:
+            line = line.strip()
+            if not line.startswith(b"data:"):
+                continue
+
+            data = line[5:].strip()
+            if data == b"[DONE]":
+                break
+
+            text += self._extract_delta(json.loads(data))
+
+            if stop_when is not None and stop_when(text):
+                logger.debug("Closing %s stream early after %d chars", self.name, len(text))
+                response.close()
+                break
+
+        return text
+
+    @abstractmethod
+    async def _request(self, prompt: str, stop_when: Optional[StopCondition], max_tokens: int) -> str:
+        """Completion text of one request"""
+
+    @abstractmethod
+    def _extract_text(self, data: dict) -> str:
+        """Text of a whole JSON response"""
+
+    @abstractmethod
+    def _extract_delta(self, chunk: dict) -> str:
+        """Text added by one streamed chunk"""
+
+
+class GeminiProvider(LLMProvider):
+
+    async def _request(self, prompt: str, stop_when: Optional[StopCondition], max_tokens: int) -> str:
+        if self.stream:
+            url = f"{self.base_url}/{self.model}:streamGenerateContent?alt=sse&key={self.api_key}"
+        else:
+            url = f"{self.base_url}/{self.model}:generateContent?key={self.api_key}"
+
+        payload = {
+            "contents": [{"parts": [{"text": prompt}]}],
+            "generationConfig": {
+                "temperature": 0,
+                "maxOutputTokens": max_tokens,
+            }
+        }
+        return await self._post(url, payload, stop_when=stop_when)
+
+    def _extract_text(self, data: dict) -> str:
+        return data["candidates"][0]["content"]["parts"][0]["text"]
+
+    def _extract_delta(self, chunk: dict) -> str:
+        text = ""
+        for candidate in chunk.get("candidates", [])[:1]:
+            for part in candidate.get("content", {}).get("parts", []):
+                text += part.get("text", "")
+        return text
+
+
+class OpenAICompatibleProvider(LLMProvider):
+
+    async def _request(self, prompt: str, stop_when: Optional[StopCondition], max_tokens: int) -> str:
+        payload = {
+            "model": self.model,
+            "messages": [{"role": "user", "content": prompt}],
+            "temperature": 0,
+            "max_tokens": max_tokens,
+            "stream": self.stream,
+        }
+        headers = {"Authorization": f"Bearer {self.api_key}"}
+        return await self._post(f"{self.base_url}/chat/completions", payload, headers, stop_when)
+
+    def _extract_text(self, data: dict) -> str:
+        return data["choices"][0]["message"]["content"]
+
+    def _extract_delta(self, chunk: dict) -> str:
+        choices = chunk.get("choices") or [{}]
+        return choices[0].get("delta", {}).get("content") or ""
+
+
+class HedgedBackend:
+    """Send to the primary, hedge to the secondary once the primary's p90 passes
+
+    Whichever provider answers first wins and the other request is cancelled.
+    An unhealthy primary is skipped in favour of the secondary.
+    """
+
+    def __init__(self, primary: LLMProvider, secondary: LLMProvider,
+                 quantile: float = 0.9, default_delay: float = 1.0):
+        self.primary = primary
+        self.secondary = secondary
+        self.quantile = quantile
+        self.default_delay = default_delay
+        self.hedged = 0
+        self.hedge_wins = 0
+
+    @property
+    def providers(self) -> list[LLMProvider]:
+        return [self.primary, self.secondary]
+
+    async def complete(self, prompt: str, stop_when: Optional[StopCondition] = None,
+                       max_tokens: Optional[int] = None) -> str:
+        first, second = self.primary, self.secondary
+        if not first.health.healthy and second.health.healthy:
+            first, second = second, first
+
+        first_task = asyncio.create_task(first.complete(prompt, stop_when, max_tokens))
+        delay = first.health.quantile(self.quantile) or self.default_delay
+
+        try:
+            done, _ = await asyncio.wait({first_task}, timeout=delay)
+        except asyncio.CancelledError:
+            first_task.cancel()
+            raise
+
+        if done and _error(first_task) is None:
+            return first_task.result()
+
+        self.hedged += 1
+        second_task = asyncio.create_task(second.complete(prompt, stop_when, max_tokens))
+        pending = {second_task} if done else {first_task, second_task}
+        error: Optional[BaseException] = _error(first_task) if done else None
+
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    error = _error(task)
+                    if error is None:
+                        if task is second_task:
+                            self.hedge_wins += 1
+                        return task.result()
+        finally:
+            for task in pending:
+                task.cancel()
+
+        raise error
+
+    async def close(self) -> None:
+        await asyncio.gather(*(provider.close() for provider in self.providers))
+
+
+def _error(task: asyncio.Task) -> Optional[BaseException]:
+    """Why a finished request failed; a request cancelled from inside counts as a provider error"""
+    if task.cancelled():
+        return ProviderError("request cancelled")
+    return task.exception()
+
+
+def build_provider(name: str) -> LLMProvider:
+    if name == "gemini":
+        return GeminiProvider(
+            "gemini", config.gemini_base_url, config.gemini_model,
+            config.gemini_api_key, stream=config.gemini_stream,
+        )
+    if name == "openai":
+        return OpenAICompatibleProvider(
+            "openai", config.openai_base_url, config.openai_model,
+            config.openai_api_key, stream=config.openai_stream,
+        )
+    raise ValueError(f"Unknown LLM provider: {name}")
+
+
+def build_backend():
+    """Primary provider alone, or hedged with the secondary when one is configured"""
+    primary = build_provider(config.llm_provider)
+    if not config.llm_secondary_provider:
+        return primary
+    return HedgedBackend(
+        primary,
+        build_provider(config.llm_secondary_provider),
+        default_delay=config.llm_hedge_delay,
+    )
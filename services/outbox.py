@@ -0,0 +1,233 @@
+"""
+Outbound Telegram send queue
+
+Handlers hand over an unsent method (`message.answer(...)` without await)
+to `outbox.send` and return. A scheduler task sends at most `rate` methods
+per second overall and `chat_rate` / `group_rate` per chat, one in flight
+per chat, serving chats round-robin. `TelegramRetryAfter` puts the method
+back at the head of its chat queue and pauses that chat for `retry_after`
+seconds; queued text replies to the same chat are merged into one message.
+"""
+import asyncio
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, List, Optional
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import SendMessage, TelegramMethod
+
+from core.config import config
+
+
+logger = logging.getLogger(__name__)
+
+MESSAGE_LIMIT = 4096
+IDLE_CHAT_TTL = 300.0
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def delay(self, now: float) -> float:
+        """Seconds until a token is available"""
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self) -> None:
+        self.tokens -= 1
+
+
+@dataclass
+class Pending:
+    method: TelegramMethod
+    future: asyncio.Future
+
+
+@dataclass
+class ChatQueue:
+    bucket: TokenBucket
+    pending: Deque[Pending] = field(default_factory=deque)
+    blocked_until: float = 0.0
+    busy: bool = False
+    used_at: float = 0.0
+
+
+class Outbox:
+    """Rate-limited, per-chat ordered delivery of Bot API methods"""
+
+    def __init__(self, rate: float = 30.0, chat_rate: float = 1.0, group_rate: float = 0.33,
+                 chat_burst: int = 3, max_in_flight: int = 8):
+        self.chat_rate = chat_rate
+        self.group_rate = group_rate
+        self.chat_burst = chat_burst
+        self.max_in_flight = max_in_flight
+        self._global = TokenBucket(rate, rate)
+        self._chats: Dict[Any, ChatQueue] = {}
+        self._bot: Optional[Bot] = None
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._in_flight = 0
+        self.sent = 0
+        self.merged = 0
+        self.retried = 0
+        self.failed = 0
+
+    @property
+    def queued(self) -> int:
+        return sum(len(chat.pending) for chat in self._chats.values())
+
+    def send(self, method: TelegramMethod) -> asyncio.Future:
+        """Queue `method`; the future resolves to the API result, or None if sending failed"""
+        future = asyncio.get_running_loop().create_future()
+        chat_id = getattr(method, "chat_id", None)
+
+        chat = self._chats.get(chat_id)
+        if chat is None:
+            group = isinstance(chat_id, str) or (chat_id or 0) < 0
+            rate = self.group_rate if group else self.chat_rate
+            chat = self._chats[chat_id] = ChatQueue(TokenBucket(rate, self.chat_burst))
+
+        chat.pending.append(Pending(method, future))
+        self._wakeup.set()
+        return future
+
+    def start(self, bot: Bot) -> None:
+        self._bot = bot
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self, timeout: float = 5.0) -> None:
+        """Give queued replies up to `timeout` seconds to go out, then stop"""
+        deadline = time.monotonic() + timeout
+        while (self.queued or self._in_flight) and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+        for chat_id, chat in self._chats.items():
+            if chat.pending:
+                logger.warning("Dropped %d unsent replies to chat %s", len(chat.pending), chat_id)
+                self.failed += len(chat.pending)
+            for pending in chat.pending:
+                if not pending.future.done():
+                    pending.future.set_result(None)
+            chat.pending.clear()
+
+    async def _run(self) -> None:
+        while True:
+            self._wakeup.clear()
+            try:
+                delay = self._dispatch()
+            except Exception:
+                # The scheduler must outlive any one bad method, or every reply stalls
+                logger.exception("Outbox dispatch failed")
+                delay = 1.0
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+
+    def _dispatch(self) -> Optional[float]:
+        """Start every send allowed right now; returns seconds until the next one may be"""
+        now = time.monotonic()
+        delay: Optional[float] = None
+
+        for chat_id, chat in list(self._chats.items()):
+            if chat.busy:
+                continue
+            if not chat.pending:
+                if now - chat.used_at > IDLE_CHAT_TTL:
+                    del self._chats[chat_id]
+                continue
+            if self._in_flight >= self.max_in_flight:
+                break
+
+            wait = max(chat.blocked_until - now, chat.bucket.delay(now), self._global.delay(now))
+            if wait > 0:
+                delay = wait if delay is None else min(delay, wait)
+                continue
+
+            batch = self._take(chat)
+            chat.bucket.take()
+            self._global.take()
+            chat.busy = True
+            chat.used_at = now
+            self._in_flight += 1
+
+            # Served chats move to the end, so a busy chat cannot starve the rest
+            self._chats[chat_id] = self._chats.pop(chat_id)
+            asyncio.create_task(self._deliver(chat, batch))
+
+        return delay
+
+    def _take(self, chat: ChatQueue) -> List[Pending]:
+        """Head of the queue plus following text replies that fit into the same message"""
+        batch = [chat.pending.popleft()]
+        if not isinstance(batch[0].method, SendMessage):
+            return batch
+
+        size = len(batch[0].method.text)
+        while chat.pending and mergeable(batch[0].method, chat.pending[0].method):
+            size += 2 + len(chat.pending[0].method.text)
+            if size > MESSAGE_LIMIT:
+                break
+            batch.append(chat.pending.popleft())
+        return batch
+
+    async def _deliver(self, chat: ChatQueue, batch: List[Pending]) -> None:
+        method = batch[0].method
+        if len(batch) > 1:
+            method = method.model_copy(update={"text": "\n\n".join(p.method.text for p in batch)})
+
+        try:
+            result = await self._bot(method)
+        except TelegramRetryAfter as e:
+            logger.warning("Flood control for chat %s, retrying in %s s", method.chat_id, e.retry_after)
+            chat.blocked_until = time.monotonic() + e.retry_after
+            chat.pending.extendleft(reversed(batch))
+            self.retried += 1
+            return
+        except Exception:
+            logger.exception("Failed to send %s to chat %s", type(method).__name__, getattr(method, "chat_id", None))
+            result = None
+            self.failed += len(batch)
+        else:
+            self.sent += 1
+            self.merged += len(batch) - 1
+        finally:
+            chat.busy = False
+            self._in_flight -= 1
+            self._wakeup.set()
+
+        for pending in batch:
+            if not pending.future.done():
+                pending.future.set_result(result)
+
+
+def mergeable(first: TelegramMethod, second: TelegramMethod) -> bool:
+    """Plain follow-up text with the same chat, formatting and no keyboard"""
+    return (
+        isinstance(second, SendMessage)
+        and first.reply_markup is None
+        and second.reply_markup is None
+        and first.model_dump(exclude={"text"}) == second.model_dump(exclude={"text"})
+    )
+
+
+outbox = Outbox(
+    rate=config.outbox_rate,
+    chat_rate=config.outbox_chat_rate,
+    group_rate=config.outbox_group_rate,
+    chat_burst=config.outbox_chat_burst,
+    max_in_flight=config.outbox_max_in_flight,
+)
@@ -0,0 +1,187 @@
+"""
+On-demand profiling of the running bot
+
+Nothing is installed until `Profiler.run` is called; for its duration it
+enables cProfile on the event loop thread, samples the loop thread's stack
+from a background thread, measures event-loop lag, turns on asyncio debug
+mode to catch slow callbacks and diffs tracemalloc snapshots.
+"""
+import asyncio
+import cProfile
+import io
+import logging
+import marshal
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import List
+
+from core.config import config
+from services.circuit_breaker import db_breaker, llm_breaker
+from services.inflight import inflight_registry
+from services.outbox import outbox
+
+
+TOP_FUNCTIONS = 60
+TOP_STACKS = 30
+TOP_ALLOCATIONS = 25
+STACK_DEPTH = 12
+
+
+class ProfilerBusy(Exception):
+    def __init__(self):
+        super().__init__("профилирование уже запущено")
+
+
+@dataclass
+class ProfileReport:
+    text: str
+    pstats: bytes
+
+
+class _LogCollector(logging.Handler):
+    def __init__(self):
+        super().__init__(logging.WARNING)
+        self.messages: List[str] = []
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self.messages.append(record.getMessage())
+
+
+class StackSampler(threading.Thread):
+    """Counts the event loop thread's stacks every `interval` seconds"""
+
+    def __init__(self, thread_id: int, interval: float = 0.005):
+        super().__init__(daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._done = threading.Event()
+
+    def run(self) -> None:
+        while not self._done.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None and len(stack) < STACK_DEPTH:
+                code = frame.f_code
+                stack.append(f"{code.co_filename.rsplit('/', 1)[-1]}:{frame.f_lineno}({code.co_name})")
+                frame = frame.f_back
+            self.stacks[" <- ".join(stack)] += 1
+            self.samples += 1
+
+    def stop(self) -> None:
+        self._done.set()
+        self.join()
+
+
+class Profiler:
+
+    def __init__(self, slow_callback: float = 0.1):
+        self.slow_callback = slow_callback
+        self._lock = asyncio.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._lock.locked()
+
+    async def run(self, seconds: float) -> ProfileReport:
+        if self.running:
+            raise ProfilerBusy()
+
+        async with self._lock:
+            loop = asyncio.get_running_loop()
+            debug, slow_callback = loop.get_debug(), loop.slow_callback_duration
+            collector = _LogCollector()
+            asyncio_logger = logging.getLogger("asyncio")
+
+            tracing = tracemalloc.is_tracing()
+            if not tracing:
+                tracemalloc.start()
+            before = tracemalloc.take_snapshot()
+
+            lag: List[float] = []
+            stop = asyncio.Event()
+            monitor = asyncio.create_task(measure_lag(lag, stop))
+            sampler = StackSampler(threading.get_ident())
+            profile = cProfile.Profile()
+
+            asyncio_logger.addHandler(collector)
+            loop.set_debug(True)
+            loop.slow_callback_duration = self.slow_callback
+            sampler.start()
+            profile.enable()
+            started = time.perf_counter()
+            try:
+                await asyncio.sleep(seconds)
+            finally:
+                profile.disable()
+                elapsed = time.perf_counter() - started
+                sampler.stop()
+                loop.set_debug(debug)
+                loop.slow_callback_duration = slow_callback
+                asyncio_logger.removeHandler(collector)
+                stop.set()
+                await monitor
+
+                after = tracemalloc.take_snapshot()
+                if not tracing:
+                    tracemalloc.stop()
+
+        return ProfileReport(
+            render(elapsed, profile, sampler, lag, self.slow_callback, collector.messages,
+                   after.compare_to(before, "lineno")),
+            dump(profile),
+        )
+
+
+async def measure_lag(samples: List[float], stop: asyncio.Event, period: float = 0.01) -> None:
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(period)
+        samples.append(time.perf_counter() - started - period)
+
+
+def dump(profile: cProfile.Profile) -> bytes:
+    """Binary pstats for snakeviz / pstats.Stats"""
+    profile.create_stats()
+    return marshal.dumps(profile.stats)
+
+
+def render(elapsed: float, profile: cProfile.Profile, sampler: StackSampler, lag: List[float],
+           slow_callback: float, slow_callbacks: List[str], allocations: list) -> str:
+    out = io.StringIO()
+    out.write(f"Profile of {elapsed:.1f} s, {datetime.now(timezone.utc):%Y-%m-%d %H:%M:%S} UTC\n")
+    out.write(f"In flight: {inflight_registry.stats()}\n")
+    out.write(f"Outbox: queued {outbox.queued}, sent {outbox.sent}, retried {outbox.retried}, failed {outbox.failed}\n")
+    out.write(f"Breakers: llm {llm_breaker.snapshot()}, db {db_breaker.snapshot()}\n")
+
+    ordered = sorted(lag)
+    if ordered:
+        p50, p90, p99 = (ordered[min(int(q * len(ordered)), len(ordered) - 1)] * 1000 for q in (0.5, 0.9, 0.99))
+        out.write(f"\n== Event loop lag ({len(ordered)} samples)\n")
+        out.write(f"p50 {p50:.2f} ms  p90 {p90:.2f} ms  p99 {p99:.2f} ms  max {ordered[-1] * 1000:.2f} ms\n")
+
+    out.write(f"\n== Slow callbacks (> {slow_callback * 1000:.0f} ms): {len(slow_callbacks)}\n")
+    for message in slow_callbacks[:50]:
+        out.write(f"{message}\n")
+
+    out.write(f"\n== Sampled loop-thread stacks ({sampler.samples} samples, innermost first)\n")
+    for stack, count in sampler.stacks.most_common(TOP_STACKS):
+        out.write(f"{count / max(sampler.samples, 1):6.1%}  {stack}\n")
+
+    out.write(f"\n== Allocations, top {TOP_ALLOCATIONS} by growth\n")
+    for stat in allocations[:TOP_ALLOCATIONS]:
+        out.write(f"{stat}\n")
+
+    out.write(f"\n== cProfile, top {TOP_FUNCTIONS} by cumulative time\n")
+    pstats.Stats(profile, stream=out).sort_stats("cumulative").print_stats(TOP_FUNCTIONS)
+    return out.getvalue()
+
+
+profiler = Profiler(slow_callback=config.profile_slow_callback)
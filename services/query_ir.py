@@ -0,0 +1,126 @@
+"""
+Structured query descriptions from the LLM
+
+Instead of SQL text the LLM may answer with a small JSON object:
+
+    {"table": "videos", "aggregation": "count", "metric": null,
+     "filters": [{"column": "creator_id", "op": "=", "value": "abc"}],
+     "date_range": {"from": "2025-11-01", "to": "2025-11-05"}}
+
+`parse_query_ir` validates it against the same whitelists the column stores
+use and returns an `AggregateQuery`; `compile_query` turns that into one of a
+fixed set of SQL shapes with every value passed as a parameter. Questions
+that differ only by date or creator produce identical SQL text, so asyncpg's
+per-connection statement cache and Postgres' plan cache are reused.
+"""
+from datetime import timedelta
+from typing import Any, List, Optional, Tuple
+
+from services.sql_shapes import (
+    DAY,
+    EPOCH,
+    ID_COLUMNS,
+    NUMERIC_COLUMNS,
+    TIMESTAMP_COLUMNS,
+    AggregateQuery,
+    Condition,
+    day_start,
+)
+
+AGGREGATIONS = ("count", "count_distinct", "sum")
+OPERATORS = ("=", ">", "<", ">=", "<=")
+
+
+def parse_query_ir(data: Any) -> Optional[AggregateQuery]:
+    """Validate an IR object; None when it is malformed or out of grammar"""
+    if not isinstance(data, dict):
+        return None
+
+    table = data.get("table")
+    aggregation = data.get("aggregation")
+    metric = data.get("metric")
+    if table not in TIMESTAMP_COLUMNS or aggregation not in AGGREGATIONS:
+        return None
+
+    if aggregation == "count":
+        metric = None
+    elif aggregation == "count_distinct" and metric != ID_COLUMNS[table]:
+        return None
+    elif aggregation == "sum" and metric not in NUMERIC_COLUMNS[table]:
+        return None
+
+    conditions = _parse_filters(table, data.get("filters") or [])
+    date_range = _parse_date_range(table, data.get("date_range"))
+    if conditions is None or date_range is None:
+        return None
+
+    return AggregateQuery(table, aggregation, metric, conditions + date_range)
+
+
+def compile_query(query: AggregateQuery) -> Tuple[str, List[Any]]:
+    """Parameterized SQL for a validated query
+
+    Column names and operators come from fixed whitelists; conditions are
+    sorted so the text depends only on the query's shape.
+    """
+    if query.function == "count":
+        select = "COUNT(*)"
+    elif query.function == "count_distinct":
+        select = f"COUNT(DISTINCT {query.column})"
+    else:
+        select = f"COALESCE(SUM({query.column}), 0)"
+
+    clauses, params = [], []
+    for condition in sorted(query.conditions, key=lambda c: (c.column, c.operator)):
+        value = condition.value
+        if condition.column == TIMESTAMP_COLUMNS[query.table]:
+            value = EPOCH + timedelta(microseconds=value)
+        params.append(value)
+        clauses.append(f"{condition.column} {condition.operator} ${len(params)}")
+
+    sql = f"SELECT {select} FROM {query.table}"
+    if clauses:
+        sql += " WHERE " + " AND ".join(clauses)
+    return sql, params
+
+
+def _parse_filters(table: str, filters: Any) -> Optional[List[Condition]]:
+    if not isinstance(filters, list):
+        return None
+
+    conditions = []
+    for item in filters:
+        if not isinstance(item, dict):
+            return None
+        column, operator, value = item.get("column"), item.get("op"), item.get("value")
+
+        if column == ID_COLUMNS[table]:
+            if operator != "=" or not isinstance(value, str) or not value:
+                return None
+        elif column in NUMERIC_COLUMNS[table]:
+            if operator not in OPERATORS or isinstance(value, bool) or not isinstance(value, int):
+                return None
+        else:
+            return None
+
+        conditions.append(Condition(column, operator, value))
+    return conditions
+
+
+def _parse_date_range(table: str, date_range: Any) -> Optional[List[Condition]]:
+    """Inclusive calendar dates become a half-open UTC range"""
+    if date_range is None:
+        return []
+    if not isinstance(date_range, dict):
+        return None
+
+    column = TIMESTAMP_COLUMNS[table]
+    conditions = []
+    try:
+        if date_range.get("from"):
+            conditions.append(Condition(column, ">=", day_start(date_range["from"])))
+        if date_range.get("to"):
+            conditions.append(Condition(column, "<", day_start(date_range["to"]) + DAY))
+    except (TypeError, ValueError):
+        return None
+    return conditions
@@ -0,0 +1,138 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import Deque, Optional, Tuple
+
+from core.config import config
+from core.logging import request_id_var, spans_var
+from database.session import DatabasePool
+from services.sql_shapes import sql_shape
+
+
+logger = logging.getLogger(__name__)
+
+COLUMNS = [
+    "created_at", "request_id", "kind", "question", "sql", "shape",
+    "result", "error", "llm_ms", "db_ms", "total_ms",
+]
+
+PRUNE_SQL = "DELETE FROM query_log WHERE created_at < NOW() - make_interval(days => $1)"
+PRUNE_INTERVAL = 3600.0
+
+
+class QueryLogWriter:
+    """Ring buffer of question outcomes flushed to `query_log` with COPY
+
+    `record` only appends to the buffer; a background task writes every
+    `flush_interval` seconds or as soon as `batch_rows` entries are waiting.
+    When the database falls behind the oldest entries are dropped.
+    """
+
+    def __init__(self, enabled: bool = True, capacity: int = 10000, batch_rows: int = 500,
+                 flush_interval: float = 5.0, retention_days: int = 30):
+        self.enabled = enabled
+        self.batch_rows = batch_rows
+        self.flush_interval = flush_interval
+        self.retention_days = retention_days
+        self._buffer: Deque[Tuple] = deque(maxlen=capacity)
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._closed = False
+        self._pruned_at = 0.0
+        self.written = 0
+        self.dropped = 0
+
+    def record(self, kind: str, question: str, sql: Optional[str], result: Optional[int],
+               error: Optional[str], total_ms: Optional[float] = None) -> None:
+        if not self.enabled:
+            return
+
+        if len(self._buffer) == self._buffer.maxlen:
+            self.dropped += 1
+
+        spans = spans_var.get() or {}
+        self._buffer.append((
+            datetime.now(timezone.utc),
+            request_id_var.get(),
+            kind,
+            question,
+            sql,
+            sql_shape(sql) if sql else None,
+            result,
+            error,
+            spans.get("llm"),
+            spans.get("db"),
+            total_ms,
+        ))
+
+        if len(self._buffer) >= self.batch_rows:
+            self._wakeup.set()
+
+    def start(self) -> None:
+        if self.enabled and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self, timeout: float = 10.0) -> None:
+        """Let a flush in progress finish, then write what is left"""
+        self._closed = True
+        self._wakeup.set()
+        if self._task is not None:
+            try:
+                await asyncio.wait_for(asyncio.shield(self._task), timeout)
+            except asyncio.TimeoutError:
+                logger.warning("Query log flush still running after %.0f s, cancelling", timeout)
+                self._task.cancel()
+                await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.flush()
+
+    async def flush(self) -> int:
+        if not self._buffer:
+            return 0
+
+        rows = [self._buffer.popleft() for _ in range(len(self._buffer))]
+        try:
+            async with DatabasePool.acquire() as conn:
+                await conn.copy_records_to_table("query_log", records=rows, columns=COLUMNS)
+        except asyncio.CancelledError:
+            self.dropped += len(rows)
+            raise
+        except Exception:
+            logger.exception("Query log flush failed, dropping %d entries", len(rows))
+            self.dropped += len(rows)
+            return 0
+
+        self.written += len(rows)
+        return len(rows)
+
+    async def prune(self) -> str:
+        async with DatabasePool.acquire() as conn:
+            return await conn.execute(PRUNE_SQL, self.retention_days)
+
+    async def _run(self) -> None:
+        while not self._closed:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+            await self.flush()
+
+            if not self._closed and time.monotonic() - self._pruned_at >= PRUNE_INTERVAL:
+                self._pruned_at = time.monotonic()
+                try:
+                    await self.prune()
+                except Exception:
+                    logger.exception("Query log retention cleanup failed")
+
+
+query_log = QueryLogWriter(
+    enabled=config.query_log_enabled,
+    capacity=config.query_log_buffer,
+    batch_rows=config.query_log_batch_rows,
+    flush_interval=config.query_log_flush_interval,
+    retention_days=config.query_log_retention_days,
+)
@@ -0,0 +1,64 @@
+"""
+Fast path for the most common question wordings
+
+`match_template` recognizes a handful of fixed Russian phrasings, e.g.
+
+    сколько всего видео
+    сколько видео у креатора abc123 набрало больше 100 000 просмотров
+    сколько всего лайков
+
+and turns them into an `AggregateQuery` without asking the LLM. The whole
+question must match; anything else returns None.
+"""
+import re
+from typing import Optional
+
+from services.sql_shapes import AggregateQuery, Condition
+
+METRICS = {
+    "просмотр": "views_count",
+    "лайк": "likes_count",
+    "комментари": "comments_count",
+    "жалоб": "reports_count",
+}
+OPERATORS = {"больше": ">", "более": ">", "меньше": "<", "менее": "<"}
+
+_METRIC = r"(?P<metric>просмотр|лайк|комментари|жалоб)\w*"
+# Ids contain a digit, so a half-typed "у креатора с" does not match
+_CREATOR = r"(?: у (?:креатора|автора)(?: с id)? (?P<creator>(?=[\w-]*\d)[\w-]{3,}))?"
+
+_COUNT = re.compile(
+    rf"сколько (?:всего )?видео(?: (?:в системе|в базе|всего))?{_CREATOR}"
+    rf"(?: (?:набрало|набрали|имеет|имеют|получило|получили) (?P<op>больше|более|меньше|менее) "
+    rf"(?P<number>\d[\d ]*) {_METRIC})?"
+)
+_SUM = re.compile(rf"сколько (?:всего )?{_METRIC}(?: (?:у всех видео|у видео|набрали видео))?{_CREATOR}")
+
+
+def normalize(question: str) -> str:
+    """The one spelling of a question that templates, the answer cache and charts key on"""
+    text = question.lower().replace("ё", "е")
+    return re.sub(r"\s+", " ", text).strip().rstrip("?!. ")
+
+
+def match_template(question: str) -> Optional[AggregateQuery]:
+    text = normalize(question)
+
+    match = _COUNT.fullmatch(text)
+    if match is not None:
+        query = AggregateQuery("videos", "count")
+        if match.group("op"):
+            query.conditions.append(Condition(
+                METRICS[match.group("metric")],
+                OPERATORS[match.group("op")],
+                int(match.group("number").replace(" ", "")),
+            ))
+    else:
+        match = _SUM.fullmatch(text)
+        if match is None:
+            return None
+        query = AggregateQuery("videos", "sum", METRICS[match.group("metric")])
+
+    if match.group("creator"):
+        query.conditions.append(Condition("creator_id", "=", match.group("creator")))
+    return query
@@ -0,0 +1,126 @@
+"""
+Tiered retention for snapshots
+
+Hourly rows in `snapshot_rows` older than the retention age are rolled into
+`daily_snapshot_rows`, one UTC day per statement: the day's last snapshot
+provides id, created_at and the totals, delta_* are summed. The hourly rows
+are deleted by the same statement and only those are rolled up, so a row the
+live ingestor commits meanwhile stays hourly for the next run, and
+`video_snapshots` (a union of both tiers) never shows a day twice. SUM(delta_*) by day and end-of-day totals
+are unchanged; hour-level filters on rolled-up days are not.
+"""
+import logging
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta, timezone
+from typing import List
+
+import asyncpg
+
+from services.data_version import bump_data_version
+from services.sql_shapes import COUNT_COLUMNS
+
+
+logger = logging.getLogger(__name__)
+
+_DAY_RANGE = (
+    "s.created_at >= $1::date::timestamp AT TIME ZONE 'UTC' "
+    "AND s.created_at < ($1::date + 1)::timestamp AT TIME ZONE 'UTC'"
+)
+
+_LAST = "(array_agg(s.{column} ORDER BY s.created_at DESC))[1]"
+_LATER = "CASE WHEN EXCLUDED.created_at > d.created_at THEN EXCLUDED.{column} ELSE d.{column} END"
+
+MOVE_SQL = f"""
+    WITH moved AS (
+        DELETE FROM snapshot_rows s
+        WHERE {_DAY_RANGE}
+        RETURNING s.*
+    ), rolled AS (
+        INSERT INTO daily_snapshot_rows AS d (
+            video_idx, day, id, created_at, updated_at,
+            {", ".join(COUNT_COLUMNS)},
+            {", ".join(f"delta_{c}" for c in COUNT_COLUMNS)},
+            hourly_rows
+        )
+        SELECT s.video_idx, $1::date, {_LAST.format(column="id")}, MAX(s.created_at), MAX(s.updated_at),
+               {", ".join(_LAST.format(column=c) for c in COUNT_COLUMNS)},
+               {", ".join(f"SUM(s.delta_{c})" for c in COUNT_COLUMNS)},
+               COUNT(*)
+        FROM moved s
+        GROUP BY s.video_idx
+        ON CONFLICT (video_idx, day) DO UPDATE SET
+            {", ".join(f"{c} = {_LATER.format(column=c)}" for c in ["id", *COUNT_COLUMNS])},
+            {", ".join(f"delta_{c} = d.delta_{c} + EXCLUDED.delta_{c}" for c in COUNT_COLUMNS)},
+            created_at = GREATEST(d.created_at, EXCLUDED.created_at),
+            updated_at = GREATEST(d.updated_at, EXCLUDED.updated_at),
+            hourly_rows = d.hourly_rows + EXCLUDED.hourly_rows
+        RETURNING 1
+    )
+    SELECT (SELECT COUNT(*) FROM moved) AS hourly_rows, (SELECT COUNT(*) FROM rolled) AS daily_rows
+"""
+
+OLDEST_DAY_SQL = "SELECT (MIN(created_at) AT TIME ZONE 'UTC')::date FROM snapshot_rows"
+
+PENDING_SQL = """
+    SELECT (created_at AT TIME ZONE 'UTC')::date AS day, COUNT(*) AS hourly_rows
+    FROM snapshot_rows
+    WHERE created_at < $1::date::timestamp AT TIME ZONE 'UTC'
+    GROUP BY 1
+    ORDER BY 1
+"""
+
+
+@dataclass
+class RolledDay:
+    day: date
+    daily_rows: int
+    hourly_rows: int
+
+
+def retention_cutoff(hourly_days: int) -> date:
+    """First UTC day whose hourly rows are kept"""
+    return datetime.now(timezone.utc).date() - timedelta(days=hourly_days)
+
+
+class NoDailyTier(RuntimeError):
+    pass
+
+
+async def require_daily_tier(conn: asyncpg.Connection) -> None:
+    tiers = await conn.fetchrow(
+        "SELECT to_regclass('snapshot_rows') IS NOT NULL AS compact, "
+        "to_regclass('daily_snapshot_rows') IS NOT NULL AS daily"
+    )
+    if not tiers["compact"]:
+        raise NoDailyTier(
+            "snapshots are in the text layout (video_snapshots table); retention needs the compact "
+            "storage with the daily tier: run `alembic upgrade head` first"
+        )
+    if not tiers["daily"]:
+        raise NoDailyTier("daily_snapshot_rows not found: run `alembic upgrade head` first")
+
+
+async def pending_days(conn: asyncpg.Connection, cutoff: date) -> List[asyncpg.Record]:
+    await require_daily_tier(conn)
+    return await conn.fetch(PENDING_SQL, cutoff)
+
+
+async def rollup_snapshots(conn: asyncpg.Connection, cutoff: date) -> List[RolledDay]:
+    """Roll every hourly day before `cutoff` into the daily tier"""
+    await require_daily_tier(conn)
+    day = await conn.fetchval(OLDEST_DAY_SQL)
+    rolled = []
+
+    while day is not None and day < cutoff:
+        moved = await conn.fetchrow(MOVE_SQL, day)
+        if moved["hourly_rows"]:
+            rolled.append(RolledDay(day, moved["daily_rows"], moved["hourly_rows"]))
+            logger.info("Rolled up %s: %s hourly -> %s daily rows", day, rolled[-1].hourly_rows, rolled[-1].daily_rows)
+        day += timedelta(days=1)
+
+    if rolled:
+        await bump_data_version(conn)
+        await conn.execute("VACUUM (ANALYZE) snapshot_rows")
+        await conn.execute("ANALYZE daily_snapshot_rows")
+
+    return rolled
@@ -0,0 +1,120 @@
+"""
+Query routing for sharded mode (DB_SHARD_URLS)
+
+Statements filtered on a single creator_id go to that creator's shard
+unchanged. Other statements whose result is one COUNT/SUM/MIN/MAX are sent
+to every shard concurrently and the partial results merged. COUNT(DISTINCT)
+can only be merged on keys that live on one shard (id, video_id,
+creator_id). `IN (SELECT id ...)` semijoins are shard-local as well; any
+other subquery, OR, GROUP BY, LIMIT or window could mix shards and is
+rejected with NotShardable.
+"""
+import asyncio
+import re
+from dataclasses import dataclass
+from typing import Any, List, Optional, Tuple
+
+from core.config import config
+from database.session import DatabasePool
+from database.sharding import normalize_creator_id, shard_for
+from services.query_ir import compile_query
+from services.sql_shapes import AggregateQuery, sql_shape
+
+
+_CREATOR = re.compile(r"\b(?:\w+\.)?creator_id\s*=\s*'([0-9a-fA-F-]+)'", re.IGNORECASE)
+_SELECT = re.compile(r"\bSELECT\b", re.IGNORECASE)
+_SEMIJOIN = re.compile(
+    r"\bIN\s*\(\s*SELECT\s+(?:DISTINCT\s+)?(?:\w+\.)?(?:id|video_id|creator_id)\s+FROM\b", re.IGNORECASE
+)
+_OR = re.compile(r"\bOR\b", re.IGNORECASE)
+_OUTER_AGGREGATE = re.compile(
+    r"^SELECT\s+(?:COALESCE\(\s*)?(?P<function>COUNT|SUM|MIN|MAX)\s*\(\s*(?P<distinct>DISTINCT\s+)?"
+    r"(?P<argument>\*|[\w.]+)\s*\)(?:\s*,\s*\?\s*\))?(?:\s+AS\s+\w+)?\s+FROM\b",
+    re.IGNORECASE,
+)
+_NOT_MERGEABLE = re.compile(
+    r"\b(?:GROUP\s+BY|HAVING|LIMIT|OFFSET|OVER|UNION|INTERSECT|EXCEPT|WITH)\b", re.IGNORECASE
+)
+
+SHARD_LOCAL_KEYS = {"id", "video_id", "creator_id"}
+
+
+class NotShardable(ValueError):
+    def __init__(self):
+        super().__init__("в шардированном режиме такой запрос нельзя выполнить, уточните автора или упростите вопрос")
+
+
+@dataclass
+class ShardPlan:
+    shards: List[int]
+    merge: str  # single | sum | min | max
+
+
+class ShardRouter:
+    def __init__(self, shards: int):
+        self.shards = shards
+
+    @property
+    def enabled(self) -> bool:
+        return self.shards > 0
+
+    def plan(self, sql: str, single_value: bool = True) -> ShardPlan:
+        shape = sql_shape(sql)
+        local = len(_SELECT.findall(shape)) == 1 + len(_SEMIJOIN.findall(shape))
+
+        creators = {normalize_creator_id(creator) for creator in _CREATOR.findall(sql)}
+        if local and len(creators) == 1 and not _OR.search(shape):
+            return ShardPlan([shard_for(creators.pop(), self.shards)], "single")
+
+        if not (single_value and local) or _OR.search(shape) or _NOT_MERGEABLE.search(shape):
+            raise NotShardable()
+
+        match = _OUTER_AGGREGATE.match(shape)
+        if match is None:
+            raise NotShardable()
+
+        function = match.group("function").lower()
+        if match.group("distinct"):
+            if function != "count" or match.group("argument").split(".")[-1].lower() not in SHARD_LOCAL_KEYS:
+                raise NotShardable()
+        return ShardPlan(list(range(self.shards)), "sum" if function in ("count", "sum") else function)
+
+    async def fetchval(self, sql: str) -> Any:
+        return await self._gather(self.plan(sql), sql)
+
+    async def fetch_aggregate(self, query: AggregateQuery) -> Tuple[int, str]:
+        """Structured queries only merge by sum; a creator filter pins one shard"""
+        for condition in query.conditions:
+            if condition.column == "creator_id":
+                condition.value = normalize_creator_id(condition.value)
+        sql, params = compile_query(query)
+        creators = {c.value for c in query.conditions if c.column == "creator_id"}
+        if len(creators) == 1:
+            plan = ShardPlan([shard_for(creators.pop(), self.shards)], "single")
+        else:
+            plan = ShardPlan(list(range(self.shards)), "sum")
+        return int(await self._gather(plan, sql, *params) or 0), sql
+
+    async def _gather(self, plan: ShardPlan, sql: str, *params) -> Any:
+        async def fetch(index: int) -> Any:
+            async with DatabasePool.acquire_shard(index) as conn:
+                return await conn.fetchval(sql, *params)
+
+        results = await asyncio.gather(*(fetch(index) for index in plan.shards))
+        return merge(plan.merge, results)
+
+
+def merge(how: str, results: List[Any]) -> Optional[Any]:
+    values = [value for value in results if value is not None]
+    if not values:
+        return None
+    if how == "single":
+        return values[0]
+    if how == "min":
+        return min(values)
+    if how == "max":
+        return max(values)
+    return sum(values)
+
+
+shard_router = ShardRouter(len(config.db_shard_urls))
@@ -0,0 +1,252 @@
+"""
+Per-day HyperLogLog sketches for COUNT(DISTINCT video_id) on video_snapshots
+
+`build_days` stores, for every UTC day, a sketch of the videos with a
+snapshot that day ("all") and one per delta column of the videos whose
+delta was positive. `SketchStore` answers
+
+    SELECT COUNT(DISTINCT video_id) FROM video_snapshots
+    WHERE created_at::date BETWEEN '...' AND '...' AND delta_views_count > 0
+
+by merging the day sketches of the range. Ingestion marks the days it
+touches dirty (NULL registers); a range with a dirty day goes to SQL until
+`scripts/build_sketches.py` rebuilds it.
+"""
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Dict, List, Optional
+
+import asyncpg
+import numpy as np
+
+from core.config import config
+from services.data_version import bump_data_version, data_version_service, versioned_read
+from services.hll import estimate, merge, registers, relative_error
+from services.sql_shapes import DAY, DELTA_COLUMNS, AggregateQuery, parse_aggregate_query
+
+
+logger = logging.getLogger(__name__)
+
+ALL = "all"
+METRICS = (ALL, *DELTA_COLUMNS)
+EPOCH_DAY = date(1970, 1, 1)
+
+# Same as the Alembic migration, for databases set up by scripts/import_data.py
+CREATE_SQL = """
+    CREATE TABLE IF NOT EXISTS snapshot_sketches (
+        day DATE NOT NULL,
+        metric VARCHAR(32) NOT NULL,
+        precision SMALLINT NOT NULL,
+        registers BYTEA,
+        updated_at TIMESTAMPTZ,
+        PRIMARY KEY (day, metric)
+    )
+"""
+
+DAY_SQL = f"""
+    SELECT hashtextextended(s.video_id, 0),
+           {", ".join(f"bool_or(s.{column} > 0)" for column in DELTA_COLUMNS)}
+    FROM video_snapshots s
+    WHERE s.created_at >= $1::date::timestamp AT TIME ZONE 'UTC'
+      AND s.created_at < ($1::date + 1)::timestamp AT TIME ZONE 'UTC'
+    GROUP BY s.video_id
+"""
+
+RANGE_SQL = """
+    SELECT (MIN(created_at) AT TIME ZONE 'UTC')::date, (MAX(created_at) AT TIME ZONE 'UTC')::date
+    FROM video_snapshots
+"""
+
+UPSERT_SQL = """
+    INSERT INTO snapshot_sketches (day, metric, precision, registers, updated_at)
+    VALUES ($1, $2, $3, $4, NOW())
+    ON CONFLICT (day, metric) DO UPDATE
+    SET precision = EXCLUDED.precision, registers = EXCLUDED.registers, updated_at = NOW()
+"""
+
+MARK_DIRTY_SQL = """
+    INSERT INTO snapshot_sketches (day, metric, precision, registers, updated_at)
+    SELECT d.day, m.metric, 0, NULL, NOW()
+    FROM unnest($1::date[]) AS d(day), unnest($2::text[]) AS m(metric)
+    ON CONFLICT (day, metric) DO UPDATE SET registers = NULL, updated_at = NOW()
+"""
+
+DIRTY_SQL = "SELECT DISTINCT day FROM snapshot_sketches WHERE registers IS NULL OR precision <> $1 ORDER BY day"
+
+LOAD_SQL = "SELECT day, metric, precision, registers FROM snapshot_sketches"
+
+
+def day_sketches(rows: List[asyncpg.Record], precision: int) -> Dict[str, np.ndarray]:
+    hashes = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows)).view(np.uint64)
+    flags = np.array([tuple(row)[1:] for row in rows], dtype=bool).reshape(len(rows), len(DELTA_COLUMNS))
+
+    sketches = {ALL: registers(hashes, precision)}
+    for index, column in enumerate(DELTA_COLUMNS):
+        sketches[column] = registers(hashes[flags[:, index]], precision)
+    return sketches
+
+
+async def build_days(conn: asyncpg.Connection, days: List[date], precision: int) -> int:
+    """Rebuild the sketches of `days` in one snapshot-consistent transaction"""
+    await conn.execute(CREATE_SQL)
+    async with conn.transaction(isolation="repeatable_read"):
+        for day in days:
+            sketches = day_sketches(await conn.fetch(DAY_SQL, day), precision)
+            await conn.executemany(UPSERT_SQL, [
+                (day, metric, precision, sketch.tobytes()) for metric, sketch in sketches.items()
+            ])
+
+    if days:
+        await bump_data_version(conn)
+    return len(days)
+
+
+async def build_sketches(conn: asyncpg.Connection, precision: int) -> int:
+    """Sketch every day between the first and last snapshot, empty days included"""
+    first, last = await conn.fetchrow(RANGE_SQL)
+    if first is None:
+        return 0
+    return await build_days(conn, [first + timedelta(days=n) for n in range((last - first).days + 1)], precision)
+
+
+async def rebuild_dirty(conn: asyncpg.Connection, precision: int) -> int:
+    days = [row["day"] for row in await conn.fetch(DIRTY_SQL, precision)]
+    return await build_days(conn, days, precision)
+
+
+async def mark_dirty(conn: asyncpg.Connection, days: List[date]) -> None:
+    await conn.execute(MARK_DIRTY_SQL, days, list(METRICS))
+
+
+class Estimate(int):
+    """Approximate count; `relative_error` is the sketch's relative standard error"""
+
+    def __new__(cls, value: int, relative_error: float):
+        result = super().__new__(cls, value)
+        result.relative_error = relative_error
+        return result
+
+
+@dataclass
+class DaySketches:
+    version: int
+    first_day: int  # days since epoch
+    valid: Dict[str, np.ndarray]
+    registers: Dict[str, np.ndarray]  # (days, 2 ** precision) uint8 per metric
+
+    @property
+    def days(self) -> int:
+        return len(self.valid[ALL])
+
+
+class SketchStore:
+    """Answers distinct-video counts over whole days from merged sketches"""
+
+    def __init__(self, enabled: bool = False, precision: int = 14):
+        self.enabled = enabled
+        self.precision = precision
+        self._sketches: Optional[DaySketches] = None
+        self._loaded_at = 0.0
+        self._lock = asyncio.Lock()
+        self.hits = 0
+        self.fallbacks = 0
+
+    async def refresh(self) -> bool:
+        try:
+            version = await data_version_service.get()
+            if data_version_service.outdated(self.version, self._loaded_at, version):
+                async with self._lock:
+                    if data_version_service.outdated(self.version, self._loaded_at, version):
+                        await self._load()
+        except Exception:
+            logger.exception("Sketch refresh failed, falling back to SQL")
+            return False
+        return self._sketches.days > 0
+
+    @property
+    def version(self) -> Optional[int]:
+        """Data version the loaded sketches were read at"""
+        return None if self._sketches is None else self._sketches.version
+
+    async def try_answer(self, sql: str) -> Optional[int]:
+        if not self.enabled:
+            return None
+        return await self.answer(parse_aggregate_query(sql))
+
+    async def answer(self, query: Optional[AggregateQuery]) -> Optional[int]:
+        if not self.enabled or query is None or self.metric(query) is None:
+            return None
+
+        if not await self.refresh():
+            self.fallbacks += 1
+            return None
+
+        result = self.evaluate(query, self._sketches)
+        if result is None:
+            self.fallbacks += 1
+        else:
+            self.hits += 1
+        return result
+
+    def evaluate(self, query: AggregateQuery, sketches: DaySketches) -> Optional[Estimate]:
+        low, high = query.time_range()
+        if (low is not None and low % DAY) or (high is not None and high % DAY):
+            return None
+
+        start = 0 if low is None else max(low // DAY - sketches.first_day, 0)
+        stop = sketches.days if high is None else min(high // DAY - sketches.first_day, sketches.days)
+        error = relative_error(self.precision)
+        if start >= stop:
+            return Estimate(0, error)
+
+        metric = self.metric(query)
+        if not sketches.valid[metric][start:stop].all():
+            return None
+        return Estimate(estimate(merge(sketches.registers[metric][start:stop])), error)
+
+    @staticmethod
+    def metric(query: AggregateQuery) -> Optional[str]:
+        """Sketch answering the query: all snapshots, or one `delta_* > 0` filter"""
+        if query.table != "video_snapshots" or query.function != "count_distinct" or query.column != "video_id":
+            return None
+
+        others = query.other_conditions()
+        if not others:
+            return ALL
+        if len(others) == 1 and others[0].column in DELTA_COLUMNS and (
+            (others[0].operator, others[0].value) in ((">", 0), (">=", 1))
+        ):
+            return others[0].column
+        return None
+
+    async def _load(self) -> None:
+        started = time.perf_counter()
+
+        async with versioned_read() as (conn, version):
+            has_table = await conn.fetchval("SELECT to_regclass('snapshot_sketches') IS NOT NULL")
+            rows = await conn.fetch(LOAD_SQL) if has_table else []
+
+        day_numbers = [(row["day"] - EPOCH_DAY).days for row in rows]
+        first_day = min(day_numbers, default=0)
+        days = max(day_numbers, default=first_day - 1) - first_day + 1
+        width = 1 << self.precision
+
+        valid = {metric: np.zeros(days, dtype=bool) for metric in METRICS}
+        stacks = {metric: np.zeros((days, width), dtype=np.uint8) for metric in METRICS}
+        for row, number in zip(rows, day_numbers):
+            if row["metric"] in valid and row["registers"] is not None and row["precision"] == self.precision:
+                valid[row["metric"]][number - first_day] = True
+                stacks[row["metric"]][number - first_day] = np.frombuffer(row["registers"], dtype=np.uint8)
+
+        self._sketches = DaySketches(version, first_day, valid, stacks)
+        self._loaded_at = time.monotonic()
+        logger.info(
+            "Loaded %d day sketches (version %s) in %.1f ms",
+            days, version, (time.perf_counter() - started) * 1000,
+        )
+
+
+sketch_store = SketchStore(enabled=config.distinct_estimates, precision=config.hll_precision)
@@ -0,0 +1,262 @@
+import json
+import logging
+import os
+import shutil
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import asyncpg
+import numpy as np
+
+from core.config import config
+from services.data_version import data_version_service
+from services.sql_shapes import DAY, DELTA_COLUMNS, AggregateQuery, parse_aggregate_query
+from services.video_store import OPERATORS
+
+
+logger = logging.getLogger(__name__)
+
+# Column files written next to each other, sorted by created_at
+COLUMN_DTYPES = {
+    "created_at": np.int64,
+    "video_idx": np.int32,
+    **{column: np.int32 for column in DELTA_COLUMNS},
+}
+# NULL deltas are stored as 0 plus a mask, kept only for columns that have any
+NULL_DTYPES = {f"{column}_null": np.bool_ for column in DELTA_COLUMNS}
+
+EXPORT_SQL = f"""
+    SELECT (EXTRACT(EPOCH FROM s.created_at) * 1000000)::bigint,
+           v.idx,
+           {", ".join(f"COALESCE(s.{column}, 0)" for column in DELTA_COLUMNS)},
+           {", ".join(f"s.{column} IS NULL" for column in DELTA_COLUMNS)}
+    FROM video_snapshots s
+    JOIN (SELECT id, (row_number() OVER (ORDER BY id) - 1)::int AS idx FROM videos) v
+      ON v.id = s.video_id
+    ORDER BY s.created_at
+"""
+
+
+async def export_snapshot_columns(conn: asyncpg.Connection, directory: str, version: int,
+                                  chunk_size: int = 200_000) -> Path:
+    """Write video_snapshots as .npy column files plus a day-offset index
+
+    Files go to `<directory>/v<version>` and `<directory>/current` is swapped
+    to point at them atomically, so running bots pick them up on refresh.
+    """
+    root = Path(directory)
+    target = root / f"v{version}"
+    staging = root / f"v{version}.tmp"
+    shutil.rmtree(staging, ignore_errors=True)
+    staging.mkdir(parents=True)
+
+    async with conn.transaction(isolation="repeatable_read", readonly=True):
+        video_ids = [row["id"] for row in await conn.fetch("SELECT id FROM videos ORDER BY id")]
+        rows = await conn.fetchval("SELECT COUNT(*) FROM video_snapshots")
+
+        columns = {
+            name: np.lib.format.open_memmap(staging / f"{name}.npy", mode="w+", dtype=dtype, shape=(rows,))
+            for name, dtype in {**COLUMN_DTYPES, **NULL_DTYPES}.items()
+        }
+
+        position = 0
+        cursor = await conn.cursor(EXPORT_SQL)
+        while True:
+            chunk = await cursor.fetch(chunk_size)
+            if not chunk:
+                break
+            block = np.array(chunk, dtype=np.int64)
+            for index, name in enumerate(columns):
+                columns[name][position:position + len(chunk)] = block[:, index]
+            position += len(chunk)
+
+    created_at = columns["created_at"][:position]
+    first_day, days, day_offsets = day_index(created_at)
+    np.save(staging / "day_offsets.npy", day_offsets)
+
+    nulls = [column for column in DELTA_COLUMNS if columns[f"{column}_null"][:position].any()]
+    for column in columns.values():
+        column.flush()
+    del columns, created_at
+    for column in DELTA_COLUMNS:
+        if column not in nulls:
+            (staging / f"{column}_null.npy").unlink()
+
+    (staging / "video_ids.json").write_text(json.dumps(video_ids))
+    (staging / "meta.json").write_text(json.dumps({
+        "version": version,
+        "rows": position,
+        "first_day": first_day,
+        "days": days,
+        "nulls": nulls,
+    }))
+
+    shutil.rmtree(target, ignore_errors=True)
+    staging.rename(target)
+
+    link = root / "current.tmp"
+    if link.is_symlink():
+        link.unlink()
+    link.symlink_to(target.name)
+    os.replace(link, root / "current")
+
+    for old in root.glob("v*"):
+        if old.is_dir() and old != target and not old.name.endswith(".tmp"):
+            shutil.rmtree(old, ignore_errors=True)
+
+    return target
+
+
+def day_index(created_at: np.ndarray) -> Tuple[int, int, np.ndarray]:
+    """First UTC day, day count and the row offset where each day starts, for sorted `created_at`"""
+    if not len(created_at):
+        return 0, 0, np.zeros(1, dtype=np.int64)
+    first_day = int(created_at[0] // DAY * DAY)
+    days = int((created_at[-1] - first_day) // DAY + 1)
+    offsets = np.searchsorted(created_at, first_day + np.arange(days + 1, dtype=np.int64) * DAY)
+    return first_day, days, offsets.astype(np.int64)
+
+
+@dataclass
+class SnapshotColumns:
+    path: Path
+    version: int
+    rows: int
+    first_day: int
+    days: int
+    created_at: np.ndarray
+    video_idx: np.ndarray
+    deltas: Dict[str, np.ndarray]
+    nulls: Dict[str, np.ndarray]
+    day_offsets: np.ndarray
+    video_lookup: Dict[str, int]
+
+    @classmethod
+    def open(cls, path: Path) -> "SnapshotColumns":
+        meta = json.loads((path / "meta.json").read_text())
+        # Slicing a memmap is zero-copy; files may be longer than the exported rows
+        load = lambda name: np.load(path / f"{name}.npy", mmap_mode="r")[:meta["rows"]]
+        video_ids: List[str] = json.loads((path / "video_ids.json").read_text())
+        return cls(
+            path=path,
+            version=meta["version"],
+            rows=meta["rows"],
+            first_day=meta["first_day"],
+            days=meta["days"],
+            created_at=load("created_at"),
+            video_idx=load("video_idx"),
+            deltas={column: load(column) for column in DELTA_COLUMNS},
+            nulls={column: load(f"{column}_null") for column in meta.get("nulls", [])},
+            day_offsets=np.load(path / "day_offsets.npy"),
+            video_lookup={video_id: index for index, video_id in enumerate(video_ids)},
+        )
+
+    def position(self, bound: Optional[int], default: int) -> int:
+        """Index of the first row with created_at >= bound"""
+        if bound is None:
+            return default
+        offset = bound - self.first_day
+        if offset % DAY == 0 and 0 <= offset // DAY <= self.days:
+            return int(self.day_offsets[offset // DAY])
+        return int(np.searchsorted(self.created_at, bound, side="left"))
+
+
+class SnapshotColumnStore:
+    """Answers date-range delta aggregates from memory-mapped column files
+
+    The files are produced by `scripts/import_data.py --export-columns` and
+    shared through the page cache by every bot process that maps them. They
+    are only used while their data version matches the database's: the first
+    bump after the export, including the live ingestor's periodic ones, turns
+    them off until the next export, so rows ingested later are never missed.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = Path(directory) if directory else None
+        self._columns: Optional[SnapshotColumns] = None
+        self.hits = 0
+        self.fallbacks = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.directory is not None
+
+    async def refresh(self) -> bool:
+        try:
+            current = (self.directory / "current").resolve()
+            if not (current / "meta.json").exists():
+                return False
+            if self._columns is None or self._columns.path != current:
+                self._columns = SnapshotColumns.open(current)
+                logger.info("Mapped %d snapshot rows from %s", self._columns.rows, current)
+            return self._columns.version == await data_version_service.get()
+        except Exception:
+            logger.exception("Snapshot column files unavailable, falling back to SQL")
+            return False
+
+    @property
+    def version(self) -> Optional[int]:
+        """Data version the mapped files were exported at"""
+        return None if self._columns is None else self._columns.version
+
+    async def try_answer(self, sql: str) -> Optional[int]:
+        if not self.enabled:
+            return None
+        return await self.answer(parse_aggregate_query(sql))
+
+    async def answer(self, query: Optional[AggregateQuery]) -> Optional[int]:
+        if not self.enabled:
+            return None
+
+        if query is None or query.table != "video_snapshots" or not self._supported(query):
+            self.fallbacks += 1
+            return None
+
+        if not await self.refresh():
+            self.fallbacks += 1
+            return None
+
+        self.hits += 1
+        return self.evaluate(query, self._columns)
+
+    def evaluate(self, query: AggregateQuery, columns: SnapshotColumns) -> int:
+        low, high = query.time_range()
+        start = columns.position(low, 0)
+        stop = max(start, columns.position(high, columns.rows))
+
+        mask = None
+        for condition in query.other_conditions():
+            if condition.column == "video_id":
+                index = columns.video_lookup.get(condition.value, -1)
+                part = columns.video_idx[start:stop] == index
+            else:
+                part = OPERATORS[condition.operator](columns.deltas[condition.column][start:stop], condition.value)
+                nulls = columns.nulls.get(condition.column)
+                if nulls is not None:
+                    part &= ~nulls[start:stop]
+            mask = part if mask is None else mask & part
+
+        if query.function == "count":
+            return stop - start if mask is None else int(np.count_nonzero(mask))
+
+        if query.function == "sum":
+            values = columns.deltas[query.column][start:stop]
+            return int(values.sum(dtype=np.int64) if mask is None else values[mask].sum(dtype=np.int64))
+
+        videos = columns.video_idx[start:stop]
+        seen = np.zeros(len(columns.video_lookup), dtype=bool)
+        seen[videos if mask is None else videos[mask]] = True
+        return int(np.count_nonzero(seen))
+
+    @staticmethod
+    def _supported(query: AggregateQuery) -> bool:
+        if query.function == "sum" and query.column not in DELTA_COLUMNS:
+            return False
+        return all(
+            condition.column in DELTA_COLUMNS or condition.column == "video_id"
+            for condition in query.other_conditions()
+        )
+
+
+snapshot_store = SnapshotColumnStore(config.snapshot_columns_dir)
@@ -0,0 +1,202 @@
+"""
+Recognition of the simple aggregate SQL shapes the LLM produces
+
+`parse_aggregate_query` turns statements such as
+
+    SELECT COUNT(*) FROM videos WHERE creator_id = 'abc' AND video_created_at::date BETWEEN '2025-11-01' AND '2025-11-05'
+
+into an `AggregateQuery` that in-process engines can evaluate. Date filters
+are normalised to half-open ranges over epoch microseconds using UTC day
+boundaries, which matches the database's default TimeZone. Anything outside
+the supported grammar returns None.
+"""
+import re
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta, timezone
+from typing import List, Optional, Union
+
+DAY = 86400 * 1_000_000
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+TIMESTAMP_COLUMNS = {"videos": "video_created_at", "video_snapshots": "created_at"}
+ID_COLUMNS = {"videos": "creator_id", "video_snapshots": "video_id"}
+COUNT_COLUMNS = ("views_count", "likes_count", "comments_count", "reports_count")
+DELTA_COLUMNS = tuple(f"delta_{column}" for column in COUNT_COLUMNS)
+NUMERIC_COLUMNS = {
+    "videos": COUNT_COLUMNS,
+    "video_snapshots": COUNT_COLUMNS + DELTA_COLUMNS,
+}
+
+_SELECT = re.compile(
+    r"^SELECT\s+(?P<agg>.+?)\s+FROM\s+(?P<table>videos|video_snapshots)(?:\s+WHERE\s+(?P<where>.+))?$",
+    re.IGNORECASE,
+)
+_COUNT = re.compile(r"^COUNT\(\s*(\*|id)\s*\)$", re.IGNORECASE)
+_COUNT_DISTINCT = re.compile(r"^COUNT\(\s*DISTINCT\s+(?P<column>\w+)\s*\)$", re.IGNORECASE)
+_SUM = re.compile(r"^(?:COALESCE\(\s*)?SUM\(\s*(?P<column>\w+)\s*\)(?:\s*,\s*0\s*\))?$", re.IGNORECASE)
+
+_DATE = r"'(\d{4}-\d{2}-\d{2})'"
+_ID_EQUALS = re.compile(r"^(\w+)\s*=\s*'([0-9a-fA-F-]+)'", re.IGNORECASE)
+_BETWEEN = re.compile(rf"^(\w+)(::date)?\s+BETWEEN\s+{_DATE}\s+AND\s+{_DATE}", re.IGNORECASE)
+_DATE_COMPARE = re.compile(rf"^(\w+)(::date)?\s*(>=|<=|=|>|<)\s*{_DATE}", re.IGNORECASE)
+_NUMBER_COMPARE = re.compile(r"^(\w+)\s*(>=|<=|=|>|<)\s*(-?\d+)(?![\w.])", re.IGNORECASE)
+_AND = re.compile(r"^\s+AND\s+", re.IGNORECASE)
+_LITERAL = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+
+
+@dataclass
+class Condition:
+    column: str
+    operator: str
+    value: Union[int, str]
+
+
+@dataclass
+class AggregateQuery:
+    table: str
+    function: str  # count | count_distinct | sum
+    column: Optional[str] = None
+    conditions: List[Condition] = field(default_factory=list)
+
+    def time_range(self) -> tuple[Optional[int], Optional[int]]:
+        """Tightest [low, high) bounds on the timestamp column, in epoch micros"""
+        low, high = None, None
+        for condition in self.conditions:
+            if condition.column != TIMESTAMP_COLUMNS[self.table]:
+                continue
+            if condition.operator == ">=":
+                low = condition.value if low is None else max(low, condition.value)
+            elif condition.operator == ">":
+                low = condition.value + 1 if low is None else max(low, condition.value + 1)
+            elif condition.operator == "<":
+                high = condition.value if high is None else min(high, condition.value)
+            elif condition.operator == "<=":
+                high = condition.value + 1 if high is None else min(high, condition.value + 1)
+            elif condition.operator == "=":
+                low = condition.value if low is None else max(low, condition.value)
+                high = condition.value + 1 if high is None else min(high, condition.value + 1)
+        return low, high
+
+    def other_conditions(self) -> List[Condition]:
+        return [c for c in self.conditions if c.column != TIMESTAMP_COLUMNS[self.table]]
+
+
+def epoch_micros(value: datetime) -> int:
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return (value - EPOCH) // timedelta(microseconds=1)
+
+
+def day_start(value: str) -> int:
+    day = date.fromisoformat(value)
+    return epoch_micros(datetime(day.year, day.month, day.day, tzinfo=timezone.utc))
+
+
+def sql_shape(sql: str) -> str:
+    """Statement text with literals replaced by `?`, for grouping similar queries"""
+    return _LITERAL.sub("?", re.sub(r"\s+", " ", sql).strip().rstrip(";").strip())
+
+
+def parse_aggregate_query(sql: str) -> Optional[AggregateQuery]:
+    match = _SELECT.match(re.sub(r"\s+", " ", sql).strip().rstrip(";").strip())
+    if match is None:
+        return None
+
+    table = match.group("table").lower()
+    query = _parse_aggregate(table, match.group("agg").strip())
+    if query is None:
+        return None
+
+    conditions = _parse_where(table, match.group("where") or "")
+    if conditions is None:
+        return None
+
+    query.conditions = conditions
+    return query
+
+
+def _parse_aggregate(table: str, text: str) -> Optional[AggregateQuery]:
+    if _COUNT.match(text):
+        return AggregateQuery(table, "count")
+
+    match = _COUNT_DISTINCT.match(text)
+    if match is not None:
+        column = match.group("column").lower()
+        return AggregateQuery(table, "count_distinct", column) if column == ID_COLUMNS[table] else None
+
+    match = _SUM.match(text)
+    if match is not None:
+        column = match.group("column").lower()
+        return AggregateQuery(table, "sum", column) if column in NUMERIC_COLUMNS[table] else None
+
+    return None
+
+
+def _parse_where(table: str, text: str) -> Optional[List[Condition]]:
+    conditions: List[Condition] = []
+    remaining = text.strip()
+
+    while remaining:
+        parsed = _parse_condition(table, remaining)
+        if parsed is None:
+            return None
+
+        new_conditions, consumed = parsed
+        conditions += new_conditions
+
+        remaining = remaining[consumed:]
+        if not remaining.strip():
+            break
+        separator = _AND.match(remaining)
+        if separator is None:
+            return None
+        remaining = remaining[separator.end():]
+
+    return conditions
+
+
+def _parse_condition(table: str, text: str) -> Optional[tuple[List[Condition], int]]:
+    timestamp = TIMESTAMP_COLUMNS[table]
+
+    match = _BETWEEN.match(text)
+    if match is not None:
+        column, _, start, end = match.groups()
+        if column.lower() != timestamp:
+            return None
+        return [
+            Condition(timestamp, ">=", day_start(start)),
+            Condition(timestamp, "<", day_start(end) + DAY),
+        ], match.end()
+
+    match = _DATE_COMPARE.match(text)
+    if match is not None:
+        column, as_date, operator, value = match.groups()
+        if column.lower() != timestamp:
+            return None
+        start = day_start(value)
+        if not as_date:
+            return [Condition(timestamp, operator, start)], match.end()
+        bounds = {
+            "=": [(">=", start), ("<", start + DAY)],
+            ">=": [(">=", start)],
+            ">": [(">=", start + DAY)],
+            "<": [("<", start)],
+            "<=": [("<", start + DAY)],
+        }[operator]
+        return [Condition(timestamp, op, bound) for op, bound in bounds], match.end()
+
+    match = _ID_EQUALS.match(text)
+    if match is not None:
+        column, value = match.groups()
+        if column.lower() != ID_COLUMNS[table]:
+            return None
+        return [Condition(column.lower(), "=", value)], match.end()
+
+    match = _NUMBER_COMPARE.match(text)
+    if match is not None:
+        column, operator, value = match.groups()
+        if column.lower() not in NUMERIC_COLUMNS[table]:
+            return None
+        return [Condition(column.lower(), operator, int(value))], match.end()
+
+    return None
@@ -0,0 +1,101 @@
+import asyncio
+import csv
+import os
+import tempfile
+from abc import ABC, abstractmethod
+from datetime import date, datetime, timezone
+from decimal import Decimal
+from typing import Any, List, Sequence
+
+
+class TableWriter(ABC):
+    """Incrementally writes result rows to a temporary file off the event loop"""
+
+    suffix = ""
+
+    def __init__(self, columns: List[str]):
+        self.columns = columns
+        self.rows_written = 0
+        fd, self.path = tempfile.mkstemp(suffix=self.suffix, prefix="result_")
+        os.close(fd)
+
+    async def write(self, rows: Sequence[Sequence[Any]]) -> None:
+        await asyncio.to_thread(self._write, rows)
+        self.rows_written += len(rows)
+
+    async def close(self) -> str:
+        await asyncio.to_thread(self._close)
+        return self.path
+
+    def discard(self) -> None:
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    @abstractmethod
+    def _write(self, rows: Sequence[Sequence[Any]]) -> None:
+        """Append rows to the file; runs in a worker thread"""
+
+    @abstractmethod
+    def _close(self) -> None:
+        """Finish the file; runs in a worker thread"""
+
+
+class CSVTableWriter(TableWriter):
+
+    suffix = ".csv"
+
+    def __init__(self, columns: List[str]):
+        super().__init__(columns)
+        # utf-8-sig so Excel opens Cyrillic text correctly
+        self._file = open(self.path, "w", newline="", encoding="utf-8-sig")
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(columns)
+
+    def _write(self, rows: Sequence[Sequence[Any]]) -> None:
+        self._writer.writerows(rows)
+
+    def _close(self) -> None:
+        self._file.close()
+
+    def discard(self) -> None:
+        self._file.close()
+        super().discard()
+
+
+class XLSXTableWriter(TableWriter):
+
+    suffix = ".xlsx"
+
+    def __init__(self, columns: List[str]):
+        from openpyxl import Workbook
+
+        super().__init__(columns)
+        self._workbook = Workbook(write_only=True)
+        self._sheet = self._workbook.create_sheet("result")
+        self._sheet.append(columns)
+
+    def _write(self, rows: Sequence[Sequence[Any]]) -> None:
+        for row in rows:
+            self._sheet.append([self._cell(value) for value in row])
+
+    def _close(self) -> None:
+        self._workbook.save(self.path)
+
+    @staticmethod
+    def _cell(value: Any) -> Any:
+        # openpyxl rejects tz-aware datetimes and unknown types
+        if isinstance(value, datetime) and value.tzinfo is not None:
+            return value.astimezone(timezone.utc).replace(tzinfo=None)
+        if isinstance(value, (int, float, Decimal, date, str)) or value is None:
+            return value
+        return str(value)
+
+
+WRITERS = {
+    "csv": CSVTableWriter,
+    "xlsx": XLSXTableWriter,
+}
+
+
+def open_writer(file_format: str, columns: List[str]) -> TableWriter:
+    return WRITERS[file_format](columns)
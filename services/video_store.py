@@ -0,0 +1,156 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, Mapping, Optional, Sequence
+
+import numpy as np
+
+from core.config import config
+from services.data_version import data_version_service, versioned_read
+from services.sql_shapes import AggregateQuery, COUNT_COLUMNS, epoch_micros, parse_aggregate_query
+
+
+logger = logging.getLogger(__name__)
+
+OPERATORS: Dict[str, Callable] = {
+    "=": np.equal,
+    ">": np.greater,
+    "<": np.less,
+    ">=": np.greater_equal,
+    "<=": np.less_equal,
+}
+
+
+@dataclass
+class VideoColumns:
+    creator_codes: np.ndarray
+    creator_lookup: Dict[str, int]
+    video_created_at: np.ndarray
+    counts: Dict[str, np.ndarray]
+    nulls: Dict[str, np.ndarray]
+    version: int
+
+    @property
+    def size(self) -> int:
+        return len(self.video_created_at)
+
+    @classmethod
+    def from_rows(cls, rows: Sequence[Mapping], version: int) -> "VideoColumns":
+        creators, codes = np.unique(
+            np.array([row["creator_id"] for row in rows], dtype=object).astype(str),
+            return_inverse=True,
+        )
+        counts, nulls = {}, {}
+        for column in COUNT_COLUMNS:
+            raw = [row[column] for row in rows]
+            missing = np.array([value is None for value in raw], dtype=bool)
+            counts[column] = np.array([value or 0 for value in raw], dtype=np.int64)
+            if missing.any():
+                nulls[column] = missing
+
+        return cls(
+            creator_codes=codes.astype(np.int32),
+            creator_lookup={creator: code for code, creator in enumerate(creators.tolist())},
+            video_created_at=np.array(
+                [epoch_micros(row["video_created_at"]) for row in rows], dtype=np.int64
+            ),
+            counts=counts,
+            nulls=nulls,
+            version=version,
+        )
+
+
+class VideoColumnStore:
+    """In-memory columnar copy of `videos` for simple filtered COUNT/SUM queries
+
+    Anything `parse_aggregate_query` does not recognise returns None so the
+    caller falls back to Postgres.
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._columns: Optional[VideoColumns] = None
+        self._loaded_at = 0.0
+        self._lock = asyncio.Lock()
+        self.hits = 0
+        self.fallbacks = 0
+
+    async def refresh(self) -> bool:
+        """Reload if the data version changed; False when the store is unusable"""
+        try:
+            version = await data_version_service.get()
+            if data_version_service.outdated(self.version, self._loaded_at, version):
+                async with self._lock:
+                    if data_version_service.outdated(self.version, self._loaded_at, version):
+                        await self._load()
+        except Exception:
+            logger.exception("Column store refresh failed, falling back to SQL")
+            return False
+        return True
+
+    @property
+    def version(self) -> Optional[int]:
+        """Data version the loaded columns were read at"""
+        return None if self._columns is None else self._columns.version
+
+    async def try_answer(self, sql: str) -> Optional[int]:
+        if not self.enabled:
+            return None
+        return await self.answer(parse_aggregate_query(sql))
+
+    async def answer(self, query: Optional[AggregateQuery]) -> Optional[int]:
+        if not self.enabled:
+            return None
+
+        if query is None or query.table != "videos":
+            self.fallbacks += 1
+            return None
+
+        if not await self.refresh():
+            self.fallbacks += 1
+            return None
+
+        self.hits += 1
+        return self.evaluate(query, self._columns)
+
+    def evaluate(self, query: AggregateQuery, columns: VideoColumns) -> int:
+        mask = np.ones(columns.size, dtype=bool)
+
+        for condition in query.conditions:
+            compare = OPERATORS[condition.operator]
+            if condition.column == "creator_id":
+                mask &= columns.creator_codes == columns.creator_lookup.get(condition.value, -1)
+            elif condition.column == "video_created_at":
+                mask &= compare(columns.video_created_at, condition.value)
+            else:
+                mask &= compare(columns.counts[condition.column], condition.value)
+                nulls = columns.nulls.get(condition.column)
+                if nulls is not None:
+                    mask &= ~nulls
+
+        if query.function == "count":
+            return int(np.count_nonzero(mask))
+        if query.function == "count_distinct":
+            return int(np.unique(columns.creator_codes[mask]).size)
+        return int(columns.counts[query.column][mask].sum())
+
+    async def _load(self) -> None:
+        started = time.perf_counter()
+
+        async with versioned_read() as (conn, version):
+            rows = await conn.fetch(
+                "SELECT creator_id, video_created_at, views_count, likes_count, "
+                "comments_count, reports_count FROM videos"
+            )
+
+        self._columns = VideoColumns.from_rows(rows, version)
+        self._loaded_at = time.monotonic()
+        logger.info(
+            "Loaded %d videos into column store (version %s) in %.1f ms",
+            len(rows), version, (time.perf_counter() - started) * 1000,
+        )
+
+
+# Sharded mode reads videos from the shards, not the primary this store loads from
+video_store = VideoColumnStore(enabled=config.columnar_engine and not config.db_shard_urls)
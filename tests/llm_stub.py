@@ -0,0 +1,88 @@
+"""
+Local aiohttp server speaking just enough of the Gemini and OpenAI APIs
+
+Each scripted reply is a list of `(delay, line)` pairs written as SSE, or a
+dict answered as plain JSON, sent `delay` seconds after the request;
+`status` overrides the HTTP status.
+"""
+import asyncio
+import json
+import time
+from typing import List, Union
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from services.llm_providers import GeminiProvider, OpenAICompatibleProvider
+
+Script = Union[List[tuple], dict]
+
+
+def openai_chunk(text: str) -> bytes:
+    return b"data: " + json.dumps({"choices": [{"delta": {"content": text}}]}).encode()
+
+
+def gemini_chunk(text: str) -> bytes:
+    return b"data: " + json.dumps({"candidates": [{"content": {"parts": [{"text": text}]}}]}).encode()
+
+
+class StubLLMServer:
+
+    def __init__(self, script: Script, status: int = 200, delay: float = 0.0):
+        self.script = script
+        self.status = status
+        self.delay = delay
+        self.requests: List[dict] = []
+        self.disconnected = asyncio.Event()
+        app = web.Application()
+        app.router.add_post("/{path:.*}", self.handle)
+        self.server = TestServer(app)
+
+    @property
+    def url(self) -> str:
+        return str(self.server.make_url("")).rstrip("/")
+
+    async def __aenter__(self) -> "StubLLMServer":
+        await self.server.start_server()
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.server.close()
+
+    async def handle(self, request: web.Request) -> web.StreamResponse:
+        self.requests.append({"path": request.path_qs, "body": await request.json(), "at": time.perf_counter()})
+        await asyncio.sleep(self.delay)
+        if self.status != 200:
+            return web.Response(status=self.status, text="stub error")
+        if isinstance(self.script, dict):
+            return web.json_response(self.script)
+
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        try:
+            for delay, line in self.script:
+                await asyncio.sleep(delay)
+                await response.write(line + b"\n\n")
+        except (ConnectionResetError, asyncio.CancelledError):
+            self.disconnected.set()
+            raise
+        return response
+
+
+
+def openai_provider(stream: bool = True, name: str = "openai") -> OpenAICompatibleProvider:
+    """Pointed at a server with `provider.base_url = server.url` once it is started"""
+    return OpenAICompatibleProvider(name, "", "stub-model", "key", stream=stream)
+
+
+def gemini_provider(stream: bool = True, name: str = "gemini") -> GeminiProvider:
+    return GeminiProvider(name, "", "stub-model", "key", stream=stream)
+
+
+async def ask(server: StubLLMServer, provider, stop_when=None) -> str:
+    async with server:
+        provider.base_url = server.url
+        try:
+            return await provider.complete("question", stop_when)
+        finally:
+            await provider.close()
@@ -0,0 +1,124 @@
+import asyncio
+import sys
+from contextlib import asynccontextmanager
+from datetime import date
+
+import pytest
+
+import services.analytics_service
+from database.session import DatabasePool
+from services.chart_service import ChartService
+
+analytics = sys.modules["services.analytics_service"]
+chart_module = sys.modules["services.chart_service"]
+
+SQL = "SELECT created_at::date, SUM(delta_views_count) FROM video_snapshots GROUP BY 1 ORDER BY 1"
+
+
+class FakeConnection:
+    """Replica connection; `version` is the data version its snapshot shows"""
+
+    def __init__(self):
+        self.fetches = 0
+        self.version = 1
+
+    @asynccontextmanager
+    async def transaction(self, **kwargs):
+        yield
+
+    async def fetchval(self, sql):
+        return True if "to_regclass" in sql else self.version
+
+    async def fetch(self, sql):
+        self.fetches += 1
+        return [(date(2025, 11, 1), 10), (date(2025, 11, 2), 25)]
+
+
+@pytest.fixture
+def charts(monkeypatch):
+    service = ChartService(cache_size=4)
+    monkeypatch.setattr(service, "_get_executor", lambda: None)
+    monkeypatch.setattr(chart_module, "render_line_chart", lambda labels, values: b"png")
+    monkeypatch.setattr(analytics, "chart_service", service)
+
+    state = {"version": 1, "llm_calls": 0, "sql": SQL}
+    conn = FakeConnection()
+
+    async def version():
+        return state["version"]
+
+    def publish(version: int) -> None:
+        state["version"] = conn.version = version
+
+    async def generate_sql(question, instructions=None):
+        state["llm_calls"] += 1
+        return state["sql"]
+
+    @asynccontextmanager
+    async def acquire(readonly=False):
+        yield conn
+
+    monkeypatch.setattr(analytics.data_version_service, "get", version)
+    monkeypatch.setattr(analytics.gemini_service, "generate_sql", generate_sql)
+    monkeypatch.setattr(DatabasePool, "acquire", acquire)
+    state["conn"] = conn
+    state["publish"] = publish
+    return state
+
+
+def chart(question: str):
+    return asyncio.run(analytics.AnalyticsService().process_chart(question))
+
+
+def test_repeat_question_skips_the_llm(charts):
+    first, error = chart("Просмотры по дням?")
+    assert error is None and first.png == b"png" and first.points == 2
+
+    again, _ = chart("  просмотры  по дням ")
+    assert again is first
+    assert charts["llm_calls"] == 1
+    assert charts["conn"].fetches == 1
+
+
+def test_new_data_version_asks_again(charts):
+    first, _ = chart("Просмотры по дням")
+    charts["publish"](2)
+    second, _ = chart("Просмотры по дням")
+
+    assert charts["llm_calls"] == 2
+    assert charts["conn"].fetches == 2
+    assert second.key == (first.key[0], 2)
+
+
+def test_other_wording_of_the_same_sql_reuses_the_image(charts):
+    first, _ = chart("Просмотры по дням")
+    second, _ = chart("Покажи график просмотров по дням")
+
+    assert second is first
+    assert charts["llm_calls"] == 2
+    assert charts["conn"].fetches == 1
+    third, _ = chart("покажи график просмотров по дням")
+    assert third is first
+    assert charts["llm_calls"] == 2
+
+
+def test_failed_questions_are_not_remembered(charts):
+    charts["sql"] = "DELETE FROM videos"
+    assert chart("Удали всё")[0] is None
+    assert chart("Удали всё")[0] is None
+    assert charts["llm_calls"] == 2
+
+
+def test_lagging_replica_keys_the_chart_by_its_own_version(charts):
+    charts["version"] = 2
+    first, _ = chart("Просмотры по дням")
+    assert first.key[1] == 1
+
+    again, _ = chart("Просмотры по дням")
+    assert charts["conn"].fetches == 2
+
+    charts["conn"].version = 2
+    current, _ = chart("Просмотры по дням")
+    latest, _ = chart("Просмотры по дням")
+    assert current.key[1] == 2 and latest is current
+    assert charts["conn"].fetches == 3
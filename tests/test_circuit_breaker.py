@@ -0,0 +1,213 @@
+import asyncio
+import sys
+from datetime import datetime, timezone
+
+import pytest
+
+import services.analytics_service
+from services.answer_cache import AnswerCache, Stale
+from services.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError
+from utils.helpers import format_value
+
+# services re-exports the singleton under the module's name
+analytics = sys.modules["services.analytics_service"]
+
+
+class Down(Exception):
+    pass
+
+
+def breaker(**kwargs) -> CircuitBreaker:
+    options = {"window": 10, "failure_rate": 0.5, "min_calls": 4, "slow_call": 0.05,
+               "open_seconds": 0.05, "half_open_calls": 1, **kwargs}
+    return CircuitBreaker("test", "Сервис", (Down,), **options)
+
+
+async def call(breaker: CircuitBreaker, fail: bool = False, seconds: float = 0.0, error=Down) -> None:
+    async with breaker.guard():
+        if seconds:
+            await asyncio.sleep(seconds)
+        if fail:
+            raise error()
+
+
+async def outcome(breaker: CircuitBreaker, **kwargs) -> str:
+    try:
+        await call(breaker, **kwargs)
+    except CircuitOpenError:
+        return "rejected"
+    except Exception:
+        return "failed"
+    return "ok"
+
+
+async def trip(breaker: CircuitBreaker) -> None:
+    for _ in range(breaker.min_calls):
+        await outcome(breaker, fail=True)
+    assert breaker.state == OPEN
+
+
+def test_trips_at_the_failure_rate_after_min_calls():
+    async def go():
+        b = breaker()
+        for _ in range(3):
+            await outcome(b, fail=True)
+        assert b.state == CLOSED
+        await outcome(b)
+        return b
+
+    b = asyncio.run(go())
+    assert b.state == OPEN and b.trips == 1
+
+
+def test_slow_calls_count_and_question_errors_do_not():
+    async def go():
+        b = breaker(min_calls=2)
+        await outcome(b, fail=True, error=ValueError)
+        await outcome(b, fail=True, error=ValueError)
+        assert b.state == CLOSED
+        await outcome(b, seconds=0.06)
+        await outcome(b, seconds=0.06)
+        return b
+
+    assert asyncio.run(go()).state == OPEN
+
+
+def test_untimed_calls_are_never_slow():
+    async def go():
+        b = breaker(min_calls=2)
+        for _ in range(3):
+            async with b.guard(timed=False):
+                await asyncio.sleep(0.06)
+        return b
+
+    assert asyncio.run(go()).state == CLOSED
+
+
+def test_open_rejects_until_the_timeout():
+    async def go():
+        b = breaker(open_seconds=10)
+        await trip(b)
+        with pytest.raises(CircuitOpenError) as error:
+            await call(b)
+        return b, error.value
+
+    b, error = asyncio.run(go())
+    assert 9 < error.retry_in <= 10
+    assert "через 10 с" in str(error)
+    assert b.rejected == 1
+
+
+@pytest.mark.parametrize("probe_fails, state", [(False, CLOSED), (True, OPEN)])
+def test_one_probe_decides_after_the_timeout(probe_fails, state):
+    async def go():
+        b = breaker()
+        await trip(b)
+        await asyncio.sleep(0.06)
+        probe = asyncio.create_task(outcome(b, fail=probe_fails, seconds=0.01))
+        await asyncio.sleep(0)
+        assert b.state == HALF_OPEN
+        assert await outcome(b) == "rejected"
+        await probe
+        return b
+
+    b = asyncio.run(go())
+    assert b.state == state
+    assert b.trips == (2 if probe_fails else 1)
+
+
+def test_cancelled_probe_frees_its_slot():
+    async def go():
+        b = breaker()
+        await trip(b)
+        await asyncio.sleep(0.06)
+        probe = asyncio.create_task(call(b, seconds=1))
+        await asyncio.sleep(0)
+        probe.cancel()
+        await asyncio.gather(probe, return_exceptions=True)
+        assert b.state == HALF_OPEN
+        assert await outcome(b) == "ok"
+        return b
+
+    assert asyncio.run(go()).state == CLOSED
+
+
+def test_calls_from_before_the_trip_do_not_decide_half_open():
+    async def go():
+        b = breaker()
+        straggler = asyncio.create_task(outcome(b, seconds=0.1))
+        await asyncio.sleep(0)
+        await trip(b)
+        await asyncio.sleep(0.06)
+
+        probe = asyncio.create_task(outcome(b, fail=True, seconds=0.1))
+        await asyncio.sleep(0)
+        assert await straggler == "ok"
+        assert b.state == HALF_OPEN
+        await probe
+        return b
+
+    assert asyncio.run(go()).state == OPEN
+
+
+def test_probe_from_an_earlier_round_is_ignored():
+    async def go():
+        b = breaker(half_open_calls=2)
+        await trip(b)
+        await asyncio.sleep(0.06)
+        slow_probe = asyncio.create_task(outcome(b, seconds=0.15))
+        await asyncio.sleep(0)
+        assert await outcome(b, fail=True) == "failed"
+        assert b.state == OPEN
+        await asyncio.sleep(0.06)
+
+        probe = asyncio.create_task(outcome(b, fail=True, seconds=0.1))
+        await asyncio.sleep(0)
+        assert await slow_probe == "ok"
+        assert b.state == HALF_OPEN
+        await probe
+        return b
+
+    assert asyncio.run(go()).state == OPEN
+
+
+def test_stale_answer_keeps_age_and_error():
+    cache = AnswerCache(capacity=2)
+    estimate = Stale(5, datetime(2025, 11, 1, tzinfo=timezone.utc))
+    estimate.relative_error = 0.02
+    cache.put("Сколько   видео?", estimate, version=3)
+
+    cached = cache.get("сколько видео")
+    assert cached == 5 and cached.relative_error == 0.02
+    assert cached.cached_at.tzinfo is timezone.utc
+    assert format_value(cached).startswith("≈5 (±2.0%) (возможно устарело: ответ от ")
+    assert cache.fresh("сколько видео", 3) == 5
+    assert cache.fresh("сколько видео", 4) is None
+
+    cache.put("b", 1)
+    cache.put("c", 2)
+    assert cache.get("сколько видео") is None
+
+
+def test_open_breaker_falls_back_to_the_last_answer(monkeypatch):
+    cache = AnswerCache()
+    monkeypatch.setattr(analytics, "answer_cache", cache)
+
+    async def no_version(self):
+        return None
+
+    async def llm_down(question, instructions=None):
+        raise CircuitOpenError("Языковая модель", 12)
+
+    monkeypatch.setattr(analytics.AnalyticsService, "_data_version", no_version)
+    monkeypatch.setattr(analytics.gemini_service, "generate_sql", llm_down)
+    service = analytics.AnalyticsService()
+
+    result, error = asyncio.run(service.process_question("Топ видео за вчера?"))
+    assert result is None
+    assert error == "Языковая модель временно недоступна, попробуйте через 12 с"
+
+    cache.put("топ видео за вчера", 42)
+    result, error = asyncio.run(service.process_question("Топ видео за вчера?"))
+    assert (result, error) == (42, None)
+    assert isinstance(result, Stale)
@@ -0,0 +1,252 @@
+"""
+Column stores against fixed expected values, and against Postgres when
+TEST_DATABASE_URL points at a scratch database (temporary tables only)
+"""
+import asyncio
+import json
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from services.snapshot_store import (
+    COLUMN_DTYPES, SnapshotColumns, SnapshotColumnStore, day_index, export_snapshot_columns,
+)
+from services.sql_shapes import DELTA_COLUMNS, epoch_micros, parse_aggregate_query
+from services.video_store import VideoColumns, VideoColumnStore
+
+snapshot_module = sys.modules["services.snapshot_store"]
+
+UTC = timezone.utc
+MSK = timezone(timedelta(hours=3))
+
+A = "a1b2c3d4e5f60718293a4b5c6d7e8f90"
+B = "0f9e8d7c6b5a49382716f5e4d3c2b1a0"
+C = "c0ffee00c0ffee00c0ffee00c0ffee00"
+V1, V2, V3, V4, V5 = (f"00000000-0000-0000-0000-00000000000{n}" for n in range(1, 6))
+
+# id, creator_id, video_created_at, views, likes, comments, reports
+VIDEOS = [
+    (V1, A, datetime(2025, 11, 1, tzinfo=UTC), 100, 10, 1, 0),
+    (V2, A, datetime(2025, 11, 1, 23, 59, 59, 999999, tzinfo=UTC), 200000, None, 2, 1),
+    (V3, B, datetime(2025, 11, 2, tzinfo=UTC), 50, 5, None, 0),
+    (V4, B, datetime(2025, 11, 2, 1, tzinfo=MSK), 1000, 7, 0, 2),  # 2025-11-01 22:00 UTC
+    (V5, C, datetime(2025, 11, 5, 12, tzinfo=UTC), 300000, 20, 3, 0),
+]
+
+# id, video_id, created_at, delta views, likes, comments, reports
+SNAPSHOTS = [
+    ("s1", V1, datetime(2025, 11, 1, 10, tzinfo=UTC), 100, 1, 0, 0),
+    ("s2", V1, datetime(2025, 11, 1, 23, 59, 59, 999999, tzinfo=UTC), 50, None, 0, 0),
+    ("s3", V2, datetime(2025, 11, 2, tzinfo=UTC), 0, 2, 1, 0),
+    ("s4", V3, datetime(2025, 11, 2, 0, 30, tzinfo=MSK), 30, 0, 0, 1),  # 2025-11-01 21:30 UTC
+    ("s5", V2, datetime(2025, 11, 3, 8, tzinfo=UTC), 500, 5, 0, 0),
+    ("s6", V5, datetime(2025, 11, 5, tzinfo=UTC), -10, 0, 0, 0),
+]
+
+VIDEO_CASES = [
+    ("SELECT COUNT(*) FROM videos", 5),
+    ("SELECT COUNT(*) FROM videos WHERE views_count > 100000", 2),
+    ("SELECT COALESCE(SUM(likes_count), 0) FROM videos", 42),
+    # NULL likes never satisfy a comparison, even one that 0 would
+    ("SELECT COUNT(*) FROM videos WHERE likes_count >= 0", 4),
+    ("SELECT COUNT(*) FROM videos WHERE likes_count < 8", 2),
+    ("SELECT COALESCE(SUM(comments_count), 0) FROM videos WHERE reports_count >= 1", 2),
+    ("SELECT COUNT(DISTINCT creator_id) FROM videos", 3),
+    ("SELECT COUNT(DISTINCT creator_id) FROM videos WHERE views_count < 1000", 2),
+    (f"SELECT COUNT(*) FROM videos WHERE creator_id = '{A}'", 2),
+    ("SELECT COUNT(*) FROM videos WHERE creator_id = 'ffffffffffffffffffffffffffffffff'", 0),
+    ("SELECT COUNT(*) FROM videos WHERE video_created_at::date = '2025-11-01'", 3),
+    ("SELECT COUNT(*) FROM videos WHERE video_created_at::date = '2025-11-02'", 1),
+    ("SELECT COUNT(*) FROM videos WHERE video_created_at::date <= '2025-11-01'", 3),
+    ("SELECT COUNT(*) FROM videos WHERE video_created_at::date BETWEEN '2025-11-02' AND '2025-11-05'", 2),
+    ("SELECT COUNT(*) FROM videos WHERE video_created_at >= '2025-11-02'", 2),
+    (f"SELECT COUNT(*) FROM videos WHERE video_created_at::date > '2025-11-01' AND creator_id = '{B}'", 1),
+]
+
+SNAPSHOT_CASES = [
+    ("SELECT COUNT(*) FROM video_snapshots", 6),
+    ("SELECT COALESCE(SUM(delta_views_count), 0) FROM video_snapshots WHERE created_at::date = '2025-11-01'", 180),
+    ("SELECT COALESCE(SUM(delta_views_count), 0) FROM video_snapshots WHERE created_at::date = '2025-11-02'", 0),
+    ("SELECT COALESCE(SUM(delta_views_count), 0) FROM video_snapshots WHERE created_at::date = '2025-11-04'", 0),
+    ("SELECT COALESCE(SUM(delta_views_count), 0) FROM video_snapshots WHERE created_at::date >= '2025-11-03'", 490),
+    ("SELECT COALESCE(SUM(delta_likes_count), 0) FROM video_snapshots", 8),
+    ("SELECT COUNT(*) FROM video_snapshots WHERE delta_likes_count > 0", 3),
+    # s2's NULL likes are stored as 0 but must not match like a 0 would
+    ("SELECT COUNT(*) FROM video_snapshots WHERE delta_likes_count = 0", 2),
+    ("SELECT COUNT(*) FROM video_snapshots WHERE delta_likes_count >= 0", 5),
+    ("SELECT COUNT(*) FROM video_snapshots WHERE delta_likes_count <= 0", 2),
+    ("SELECT COALESCE(SUM(delta_views_count), 0) FROM video_snapshots WHERE delta_likes_count <= 0", 20),
+    (f"SELECT COUNT(*) FROM video_snapshots WHERE video_id = '{V2}'", 2),
+    ("SELECT COUNT(*) FROM video_snapshots WHERE created_at >= '2025-11-02'", 3),
+    ("SELECT COUNT(*) FROM video_snapshots WHERE created_at::date < '2025-11-01'", 0),
+    ("SELECT COUNT(*) FROM video_snapshots WHERE created_at::date > '2025-12-01'", 0),
+    (
+        "SELECT COUNT(DISTINCT video_id) FROM video_snapshots "
+        "WHERE created_at::date BETWEEN '2025-11-01' AND '2025-11-03' AND delta_views_count > 0",
+        3,
+    ),
+]
+
+
+def video_columns() -> VideoColumns:
+    keys = ("id", "creator_id", "video_created_at", "views_count", "likes_count", "comments_count", "reports_count")
+    return VideoColumns.from_rows([dict(zip(keys, video)) for video in VIDEOS], version=1)
+
+
+def snapshot_columns() -> SnapshotColumns:
+    """Same layout export_snapshot_columns writes: sorted by created_at, deltas with NULL as 0 plus a mask"""
+    video_lookup = {video_id: index for index, video_id in enumerate(sorted(video[0] for video in VIDEOS))}
+    rows = sorted(SNAPSHOTS, key=lambda snapshot: snapshot[2])
+    created_at = np.array([epoch_micros(row[2]) for row in rows], dtype=np.int64)
+    first_day, days, day_offsets = day_index(created_at)
+    return SnapshotColumns(
+        path=Path("."),
+        version=1,
+        rows=len(rows),
+        first_day=first_day,
+        days=days,
+        created_at=created_at,
+        video_idx=np.array([video_lookup[row[1]] for row in rows], dtype=np.int32),
+        deltas={
+            column: np.array([row[3 + index] or 0 for row in rows], dtype=np.int32)
+            for index, column in enumerate(DELTA_COLUMNS)
+        },
+        nulls={
+            column: np.array([row[3 + index] is None for row in rows], dtype=bool)
+            for index, column in enumerate(DELTA_COLUMNS)
+            if any(row[3 + index] is None for row in rows)
+        },
+        day_offsets=day_offsets,
+        video_lookup=video_lookup,
+    )
+
+
+def test_creator_ids_are_dictionary_encoded():
+    columns = video_columns()
+    assert columns.creator_codes.dtype == np.int32
+    assert sorted(columns.creator_lookup) == sorted({A, B, C})
+    assert [columns.creator_lookup[video[1]] for video in VIDEOS] == columns.creator_codes.tolist()
+    assert set(columns.nulls) == {"likes_count", "comments_count"}
+    assert columns.nulls["likes_count"].tolist() == [False, True, False, False, False]
+
+
+def test_day_index_starts_each_utc_day():
+    columns = snapshot_columns()
+    assert columns.days == 5
+    assert columns.day_offsets.tolist() == [0, 3, 4, 5, 5, 6]
+
+
+@pytest.mark.parametrize("sql, expected", VIDEO_CASES)
+def test_video_store(sql, expected):
+    assert VideoColumnStore().evaluate(parse_aggregate_query(sql), video_columns()) == expected
+
+
+@pytest.mark.parametrize("sql, expected", SNAPSHOT_CASES)
+def test_snapshot_store(sql, expected):
+    query = parse_aggregate_query(sql)
+    assert SnapshotColumnStore._supported(query)
+    assert SnapshotColumnStore("").evaluate(query, snapshot_columns()) == expected
+
+
+DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+requires_postgres = pytest.mark.skipif(not DATABASE_URL, reason="TEST_DATABASE_URL not set")
+
+
+async def scratch_database():
+    """Connection with temporary videos/video_snapshots tables shadowing the real ones"""
+    import asyncpg
+
+    conn = await asyncpg.connect(DATABASE_URL)
+    await conn.execute("SET TIME ZONE 'UTC'")
+    await conn.execute("""
+        CREATE TEMPORARY TABLE videos (
+            id VARCHAR(36) PRIMARY KEY, creator_id VARCHAR(32) NOT NULL,
+            video_created_at TIMESTAMPTZ NOT NULL, views_count INTEGER, likes_count INTEGER,
+            comments_count INTEGER, reports_count INTEGER
+        )
+    """)
+    await conn.execute("""
+        CREATE TEMPORARY TABLE video_snapshots (
+            id VARCHAR(32) PRIMARY KEY, video_id VARCHAR(36) NOT NULL, created_at TIMESTAMPTZ NOT NULL,
+            delta_views_count INTEGER, delta_likes_count INTEGER,
+            delta_comments_count INTEGER, delta_reports_count INTEGER
+        )
+    """)
+    await conn.executemany("INSERT INTO videos VALUES ($1, $2, $3, $4, $5, $6, $7)", VIDEOS)
+    await conn.executemany("INSERT INTO video_snapshots VALUES ($1, $2, $3, $4, $5, $6, $7)", SNAPSHOTS)
+    return conn
+
+
+@requires_postgres
+def test_video_store_matches_postgres():
+    async def run():
+        conn = await scratch_database()
+        try:
+            rows = await conn.fetch("SELECT * FROM videos")
+            columns = VideoColumns.from_rows(rows, version=1)
+            for sql, expected in VIDEO_CASES:
+                assert await conn.fetchval(sql) == expected, sql
+                assert VideoColumnStore().evaluate(parse_aggregate_query(sql), columns) == expected, sql
+        finally:
+            await conn.close()
+
+    asyncio.run(run())
+
+
+@requires_postgres
+def test_snapshot_store_matches_postgres(tmp_path):
+    async def run():
+        conn = await scratch_database()
+        try:
+            columns = SnapshotColumns.open(await export_snapshot_columns(conn, str(tmp_path), version=1))
+            assert set(COLUMN_DTYPES) <= {path.stem for path in columns.path.glob("*.npy")}
+            assert set(columns.nulls) == {"delta_likes_count"}
+            for sql, expected in SNAPSHOT_CASES:
+                assert await conn.fetchval(sql) == expected, sql
+                assert SnapshotColumnStore("").evaluate(parse_aggregate_query(sql), columns) == expected, sql
+        finally:
+            await conn.close()
+
+    asyncio.run(run())
+
+
+def write_snapshot_files(root: Path, columns: SnapshotColumns) -> None:
+    """The files export_snapshot_columns leaves behind, under `<root>/current`"""
+    target = root / f"v{columns.version}"
+    target.mkdir()
+    np.save(target / "created_at.npy", columns.created_at)
+    np.save(target / "video_idx.npy", columns.video_idx)
+    for column, values in columns.deltas.items():
+        np.save(target / f"{column}.npy", values)
+    for column, nulls in columns.nulls.items():
+        np.save(target / f"{column}_null.npy", nulls)
+    np.save(target / "day_offsets.npy", columns.day_offsets)
+    (target / "video_ids.json").write_text(json.dumps(sorted(columns.video_lookup, key=columns.video_lookup.get)))
+    (target / "meta.json").write_text(json.dumps({
+        "version": columns.version, "rows": columns.rows, "first_day": columns.first_day, "days": columns.days,
+        "nulls": list(columns.nulls),
+    }))
+    (root / "current").symlink_to(target.name)
+
+
+def test_snapshot_files_are_dropped_after_the_next_version_bump(tmp_path, monkeypatch):
+    """Rows ingested after the export bump the version; the files must not answer without them"""
+    write_snapshot_files(tmp_path, snapshot_columns())
+    store = SnapshotColumnStore(str(tmp_path))
+    state = {"version": 1}
+
+    async def version():
+        return state["version"]
+
+    monkeypatch.setattr(snapshot_module.data_version_service, "get", version)
+    query = parse_aggregate_query("SELECT COALESCE(SUM(delta_likes_count), 0) FROM video_snapshots")
+
+    assert asyncio.run(store.answer(query)) == 8
+    assert store._columns.nulls["delta_likes_count"].tolist() == [False, False, True, False, False, False]
+    state["version"] = 2
+    assert asyncio.run(store.answer(query)) is None
+    assert (store.hits, store.fallbacks) == (1, 1)
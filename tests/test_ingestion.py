@@ -0,0 +1,229 @@
+import asyncio
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+
+import pytest
+
+import services.ingestion as ingestion
+from services.ingestion import (
+    INSERT_SQL, UPDATE_VIDEOS_SQL, IngestorClosed, InvalidSnapshot, SnapshotIngestor, parse_snapshot,
+)
+
+
+def rows(count: int, start: int = 0) -> list:
+    created_at = datetime(2025, 11, 1, tzinfo=timezone.utc)
+    return [(f"s{n}", "v1", n, 0, 0, 0, created_at, created_at) for n in range(start, start + count)]
+
+
+def ingestor(monkeypatch, write_seconds: float, **kwargs) -> SnapshotIngestor:
+    """Ingestor whose transaction is a sleep; records the batch sizes it wrote,
+    whether each bumped the data version, and separate bumps"""
+    ingestor = SnapshotIngestor(**{"batch_rows": 10, "flush_interval": 0.01, **kwargs})
+    ingestor.writes = []
+    ingestor.versioned = []
+    ingestor.published = 0
+    ingestor.stored = set()
+
+    async def write(records, bump):
+        ingestor.writes.append(len(records))
+        ingestor.versioned.append(bump)
+        await asyncio.sleep(write_seconds)
+        inserted = []
+        for record in records:
+            if record[0] not in ingestor.stored:
+                ingestor.stored.add(record[0])
+                inserted.append(record[0])
+        return inserted
+
+    @asynccontextmanager
+    async def acquire():
+        yield None
+
+    async def bump_data_version(conn):
+        ingestor.published += 1
+
+    monkeypatch.setattr(ingestor, "_write", write)
+    monkeypatch.setattr(ingestion.DatabasePool, "acquire", acquire)
+    monkeypatch.setattr(ingestion, "bump_data_version", bump_data_version)
+    return ingestor
+
+
+def test_close_waits_for_the_flush_in_progress_and_drains(monkeypatch):
+    async def go():
+        writer = ingestor(monkeypatch, 0.2)
+        writer.start()
+        first = asyncio.create_task(writer.submit(rows(10)))
+        await asyncio.sleep(0.05)
+        assert writer.writes == [10]
+
+        queued = [asyncio.create_task(writer.submit(rows(10, 10 * n))) for n in range(1, 4)]
+        await asyncio.sleep(0)
+        await writer.close()
+        await asyncio.gather(first, *queued)
+        return writer
+
+    writer = asyncio.run(go())
+    assert writer.writes == [10, 10, 10, 10]
+    assert writer.inserted == 40
+    assert writer.stored == {f"s{n}" for n in range(40)}
+
+
+def test_submit_after_close_is_rejected(monkeypatch):
+    async def go():
+        writer = ingestor(monkeypatch, 0)
+        writer.start()
+        await writer.close()
+        await writer.submit(rows(1))
+
+    with pytest.raises(IngestorClosed):
+        asyncio.run(go())
+
+
+def test_backpressured_submit_is_released_on_close(monkeypatch):
+    async def go():
+        writer = ingestor(monkeypatch, 0.1, max_pending_rows=10)
+        writer.start()
+        first = asyncio.create_task(writer.submit(rows(10)))
+        blocked = asyncio.create_task(writer.submit(rows(1, 10)))
+        await asyncio.sleep(0)
+        await writer.close()
+        await first
+        return await asyncio.gather(blocked, return_exceptions=True)
+
+    assert isinstance(asyncio.run(go())[0], IngestorClosed)
+
+
+def test_close_fails_what_does_not_drain_in_time(monkeypatch):
+    async def go():
+        writer = ingestor(monkeypatch, 10)
+        writer.start()
+        submits = [asyncio.create_task(writer.submit(rows(10, 10 * n))) for n in range(3)]
+        await asyncio.sleep(0.05)
+        await writer.close(timeout=0.1)
+        return await asyncio.gather(*submits, return_exceptions=True)
+
+    results = asyncio.run(go())
+    assert len(results) == 3
+    assert all(isinstance(result, IngestorClosed) for result in results)
+
+
+def test_failed_write_fails_its_batches(monkeypatch):
+    async def go():
+        writer = SnapshotIngestor(batch_rows=10, flush_interval=0.01)
+
+        async def write(records, bump):
+            raise ConnectionError("database went away")
+
+        monkeypatch.setattr(writer, "_write", write)
+        writer.start()
+        try:
+            await writer.submit(rows(5))
+        finally:
+            await writer.close()
+
+    with pytest.raises(ConnectionError):
+        asyncio.run(go())
+
+
+def test_data_version_is_bumped_at_most_once_per_interval(monkeypatch):
+    async def go():
+        writer = ingestor(monkeypatch, 0, version_interval=60)
+        writer.start()
+        for n in range(3):
+            await writer.submit(rows(10, 10 * n))
+        published = writer.published
+        await writer.close()
+        return writer, published
+
+    writer, published = asyncio.run(go())
+    assert writer.versioned == [True, False, False]
+    assert published == 0
+    assert writer.published == 1
+    assert writer.bumps == 2
+
+
+def test_idle_ingestor_publishes_once_the_interval_passes(monkeypatch):
+    async def go():
+        writer = ingestor(monkeypatch, 0, version_interval=0.05)
+        writer.start()
+        await writer.submit(rows(10))
+        await writer.submit(rows(10, 10))
+        before = writer.published
+        await asyncio.sleep(0.15)
+        after = writer.published
+        await writer.close()
+        return writer, before, after
+
+    writer, before, after = asyncio.run(go())
+    assert writer.versioned == [True, False]
+    assert (before, after, writer.published) == (0, 1, 1)
+
+
+def test_each_submit_gets_its_own_counts(monkeypatch):
+    async def go():
+        writer = ingestor(monkeypatch, 0, batch_rows=100, flush_interval=0.05)
+        writer.stored = {"s1", "s3", "s12"}
+        writer.start()
+        try:
+            # One micro-batch; s2 is sent twice and only its first copy is inserted
+            return await asyncio.gather(
+                writer.submit(rows(5)),
+                writer.submit(rows(5, 10) + rows(1, 2)),
+            ), writer
+        finally:
+            await writer.close()
+
+    counts, writer = asyncio.run(go())
+    assert writer.writes == [11]
+    assert counts == [(3, 2), (4, 2)]
+    assert (writer.inserted, writer.skipped) == (7, 4)
+
+
+def test_sharded_mode_refuses_to_ingest(monkeypatch):
+    monkeypatch.setattr(ingestion.shard_router, "shards", 2)
+    with pytest.raises(RuntimeError, match="DB_SHARD_URLS"):
+        SnapshotIngestor().start()
+
+
+def test_parse_snapshot():
+    row = parse_snapshot({
+        "id": "s1", "video_id": "v1", "views_count": 5, "likes_count": None,
+        "created_at": "2025-11-01T10:00:00", "delta_views_count": 99,
+    })
+    created_at = datetime(2025, 11, 1, 10, tzinfo=timezone.utc)
+    assert row == ("s1", "v1", 5, 0, 0, 0, created_at, created_at)
+
+    with pytest.raises(InvalidSnapshot):
+        parse_snapshot({"id": "s1", "video_id": "v1", "created_at": "yesterday"})
+    with pytest.raises(InvalidSnapshot):
+        parse_snapshot(["s1"])
+
+
+def test_every_layout_has_its_statements():
+    assert set(INSERT_SQL) == set(UPDATE_VIDEOS_SQL) == {"text", "compact", "tiered"}
+    assert "UPDATE videos " in UPDATE_VIDEOS_SQL["text"]
+    assert "UPDATE video_rows " in UPDATE_VIDEOS_SQL["tiered"]
+
+
+def test_ingest_endpoint_reports_inserted_and_skipped(monkeypatch):
+    from aiohttp import web
+    from aiohttp.test_utils import TestClient, TestServer
+
+    from scripts import ingest_server
+
+    async def submit(rows):
+        return len(rows) - 1, 1
+
+    monkeypatch.setattr(ingest_server.snapshot_ingestor, "submit", submit)
+
+    async def go():
+        app = web.Application()
+        app.router.add_post("/snapshots", ingest_server.post_snapshots)
+        async with TestClient(TestServer(app)) as client:
+            body = "\n".join(
+                f'{{"id": "s{n}", "video_id": "v1", "created_at": "2025-11-01T10:00:00"}}' for n in range(3)
+            )
+            response = await client.post("/snapshots", data=body)
+            return response.status, await response.json()
+
+    assert asyncio.run(go()) == (200, {"received": 3, "inserted": 2, "skipped": 1})
@@ -0,0 +1,102 @@
+import asyncio
+import sys
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import pytest
+
+import bot.handlers.inline
+import services.analytics_service
+from services.answer_cache import AnswerCache, Stale
+from services.question_templates import match_template
+
+analytics = sys.modules["services.analytics_service"]
+inline = sys.modules["bot.handlers.inline"]
+
+CACHE_TIME = 300
+
+
+class FakeInlineQuery:
+    def __init__(self, query: str):
+        self.query = query
+        self.from_user = SimpleNamespace(id=1)
+        self.answers = []
+
+    async def answer(self, results, **kwargs):
+        self.answers.append((results, kwargs))
+
+
+@pytest.fixture
+def answer_with(monkeypatch):
+    monkeypatch.setattr(inline.config, "inline_cache_time", CACHE_TIME)
+
+    def run(question: str, result=None, error=None) -> tuple:
+        async def process_inline(question, debounce):
+            return result, error
+
+        monkeypatch.setattr(inline.analytics_service, "process_inline", process_inline)
+        query = FakeInlineQuery(question)
+        asyncio.run(inline.handle_inline(query))
+        assert len(query.answers) == 1
+        return query.answers[0]
+
+    return run
+
+
+@pytest.mark.parametrize("question, result, error", [
+    ("сколько", None, None),
+    ("сколько всего видео у", None, None),
+    ("сколько всего видео?", None, "Не удалось разобрать вопрос"),
+])
+def test_empty_answers_are_not_cached(answer_with, question, result, error):
+    results, kwargs = answer_with(question, result, error)
+    assert results == []
+    assert kwargs["cache_time"] == 0
+
+
+def test_answer_is_cached(answer_with):
+    results, kwargs = answer_with("сколько всего видео?", 42)
+    assert [article.title for article in results] == ["42"]
+    assert kwargs["cache_time"] == CACHE_TIME
+
+
+def test_stale_answer_is_not_cached(answer_with):
+    results, kwargs = answer_with("сколько всего видео?", Stale(42, datetime.now(timezone.utc)))
+    assert len(results) == 1
+    assert kwargs["cache_time"] == 0
+
+
+def test_inline_question_reads_the_data_version_once(monkeypatch):
+    cache = AnswerCache()
+    reads = []
+
+    async def version():
+        reads.append(1)
+        return 7
+
+    async def answer(query):
+        return 42
+
+    monkeypatch.setattr(analytics, "answer_cache", cache)
+    monkeypatch.setattr(analytics.data_version_service, "get", version)
+    monkeypatch.setattr(analytics.sketch_store, "answer", answer)
+    monkeypatch.setattr(analytics.query_log, "record", lambda *args: None)
+    service = analytics.AnalyticsService()
+
+    assert asyncio.run(service.process_inline("Сколько всего видео", 0)) == (42, None)
+    assert len(reads) == 1
+    assert cache.fresh("сколько всего видео", 7) == 42
+
+
+@pytest.mark.parametrize("spelling", ["Сколько всего видео?", "  сколько  ВСЕГО видео ?", "сколько всего видео!"])
+def test_templates_and_the_answer_cache_agree_on_the_spelling(spelling):
+    cache = AnswerCache()
+    cache.put("сколько всего видео", 42, 7)
+    assert cache.fresh(spelling, 7) == 42
+    assert match_template(spelling) is not None
+
+
+def test_answer_cache_folds_yo():
+    cache = AnswerCache()
+    cache.put("Сколько видео набрало всё?", 42, 7)
+    assert cache.fresh("сколько видео набрало все", 7) == 42
@@ -0,0 +1,150 @@
+import asyncio
+import time
+
+import pytest
+
+from services import llm_providers
+from services.llm_providers import HedgedBackend, ProviderError, ProviderHealth
+from tests.llm_stub import StubLLMServer, openai_provider
+
+
+def answer(text: str) -> dict:
+    return {"choices": [{"message": {"content": text}}]}
+
+
+async def hedge(primary: StubLLMServer, secondary: StubLLMServer, setup=None, default_delay: float = 0.2):
+    backend = HedgedBackend(
+        openai_provider(stream=False, name="primary"),
+        openai_provider(stream=False, name="secondary"),
+        default_delay=default_delay,
+    )
+    if setup is not None:
+        setup(backend)
+    async with primary, secondary:
+        backend.primary.base_url, backend.secondary.base_url = primary.url, secondary.url
+        started = time.perf_counter()
+        try:
+            return await backend.complete("question"), backend, started
+        finally:
+            await backend.close()
+
+
+def test_fast_primary_is_not_hedged():
+    primary, secondary = StubLLMServer(answer("primary")), StubLLMServer(answer("secondary"))
+    text, backend, _ = asyncio.run(hedge(primary, secondary))
+    assert text == "primary"
+    assert backend.hedged == 0
+    assert secondary.requests == []
+
+
+def test_slow_primary_is_hedged_after_the_default_delay_and_cancelled():
+    primary = StubLLMServer(answer("primary"), delay=2)
+    secondary = StubLLMServer(answer("secondary"))
+    text, backend, started = asyncio.run(hedge(primary, secondary, default_delay=0.2))
+
+    assert text == "secondary"
+    assert (backend.hedged, backend.hedge_wins) == (1, 1)
+    assert 0.2 <= secondary.requests[0]["at"] - started < 1
+    assert backend.primary.health.cancelled == 1
+    assert backend.primary.health.failures == 0
+
+
+def test_hedge_delay_follows_the_primary_p90():
+    def warm(backend):
+        backend.primary.health.latencies.extend([0.05] * 9 + [0.4])
+
+    primary = StubLLMServer(answer("primary"), delay=2)
+    secondary = StubLLMServer(answer("secondary"))
+    text, _, started = asyncio.run(hedge(primary, secondary, warm, default_delay=5))
+
+    assert text == "secondary"
+    assert 0.4 <= secondary.requests[0]["at"] - started < 1.5
+
+
+def test_failed_primary_hedges_at_once():
+    primary = StubLLMServer({}, status=500)
+    secondary = StubLLMServer(answer("secondary"))
+    text, backend, started = asyncio.run(hedge(primary, secondary, default_delay=5))
+
+    assert text == "secondary"
+    assert secondary.requests[0]["at"] - started < 1
+    assert backend.primary.health.failures == 1
+
+
+def test_unhealthy_primary_is_asked_second():
+    def trip(backend):
+        for _ in range(backend.primary.health.failure_threshold):
+            backend.primary.health.record_failure()
+
+    primary = StubLLMServer(answer("primary"))
+    secondary = StubLLMServer(answer("secondary"))
+    text, _, _ = asyncio.run(hedge(primary, secondary, trip))
+
+    assert text == "secondary"
+    assert primary.requests == []
+
+
+def test_both_failing_raises():
+    with pytest.raises(ProviderError):
+        asyncio.run(hedge(StubLLMServer({}, status=500), StubLLMServer({}, status=503)))
+
+
+class CancelledInside:
+    """Provider whose request task ends cancelled without the caller asking"""
+
+    name = "cancelled"
+
+    def __init__(self):
+        self.health = ProviderHealth()
+
+    async def complete(self, prompt, stop_when=None, max_tokens=None):
+        raise asyncio.CancelledError()
+
+    async def close(self):
+        pass
+
+
+def test_primary_cancelled_from_inside_falls_back():
+    async def go():
+        secondary_server = StubLLMServer(answer("secondary"))
+        backend = HedgedBackend(CancelledInside(), openai_provider(stream=False), default_delay=5)
+        async with secondary_server:
+            backend.secondary.base_url = secondary_server.url
+            try:
+                return await backend.complete("question")
+            finally:
+                await backend.close()
+
+    assert asyncio.run(go()) == "secondary"
+
+
+def test_provider_health_cooldown(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(llm_providers.time, "monotonic", lambda: now[0])
+    health = ProviderHealth(failure_threshold=3, cooldown=30)
+
+    health.record_failure()
+    health.record_failure()
+    assert health.healthy
+    health.record_failure()
+    assert not health.healthy
+
+    now[0] += 29
+    assert not health.healthy
+    now[0] += 1
+    assert health.healthy
+
+    health.record_success(0.1)
+    assert health.consecutive_failures == 0 and health.healthy
+
+
+def test_provider_must_implement_every_hook():
+    class TextOnly(llm_providers.LLMProvider):
+        async def _request(self, prompt, stop_when, max_tokens):
+            return ""
+
+        def _extract_text(self, data):
+            return ""
+
+    with pytest.raises(TypeError, match="_extract_delta"):
+        TextOnly("text-only", "http://localhost", "model", "key")
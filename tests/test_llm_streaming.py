@@ -0,0 +1,97 @@
+import asyncio
+import time
+
+import pytest
+
+from core.config import config
+from services.gemini_service import gemini_service
+from services.llm_providers import ProviderError, RateLimitError, build_provider
+from tests.llm_stub import StubLLMServer, ask, gemini_chunk, gemini_provider, openai_chunk, openai_provider
+
+complete_statement = gemini_service._is_complete_statement
+
+
+@pytest.mark.parametrize("text, complete", [
+    ("SELECT COUNT(*) FROM videos", False),
+    ("SELECT COUNT(*) FROM videos;", True),
+    ("SELECT COUNT(*)\nFROM", True),
+    ("```sql", False),
+    ("```sql\nSELECT COUNT(*)", False),
+    ("```sql\nSELECT COUNT(*) FROM videos;", True),
+])
+def test_is_complete_statement(text, complete):
+    assert complete_statement(text) is complete
+
+
+def test_stream_closes_at_semicolon():
+    server = StubLLMServer([
+        (0, openai_chunk("SELECT COUNT(*)")),
+        (0, openai_chunk(" FROM videos;")),
+        (5, openai_chunk(" -- never read")),
+    ])
+
+    async def go():
+        started = time.perf_counter()
+        text = await ask(server, openai_provider(), complete_statement)
+        return text, time.perf_counter() - started
+
+    text, elapsed = asyncio.run(go())
+    assert text == "SELECT COUNT(*) FROM videos;"
+    assert elapsed < 2
+    assert server.disconnected.is_set()
+
+
+def test_stream_closes_at_newline():
+    server = StubLLMServer([
+        (0, gemini_chunk("SELECT COUNT(*) FROM videos\n")),
+        (5, gemini_chunk("and an explanation")),
+    ])
+    assert asyncio.run(ask(server, gemini_provider(), complete_statement)) == "SELECT COUNT(*) FROM videos\n"
+
+
+def test_done_ends_stream_and_other_lines_are_skipped():
+    server = StubLLMServer([
+        (0, b": keep-alive"),
+        (0, b"event: message"),
+        (0, openai_chunk("SELECT ")),
+        (0, b"data: {\"choices\": []}"),
+        (0, openai_chunk("1")),
+        (0, b"data: [DONE]"),
+        (0, openai_chunk("ignored")),
+    ])
+    assert asyncio.run(ask(server, openai_provider())) == "SELECT 1"
+
+
+def test_stream_without_stop_condition_reads_to_the_end():
+    server = StubLLMServer([(0, gemini_chunk("SELECT 1;")), (0, gemini_chunk(" SELECT 2;"))])
+    assert asyncio.run(ask(server, gemini_provider())) == "SELECT 1; SELECT 2;"
+    assert ":streamGenerateContent?alt=sse" in server.requests[0]["path"]
+
+
+def test_non_streaming_answers():
+    server = StubLLMServer({"choices": [{"message": {"content": "SELECT 1"}}]})
+    assert asyncio.run(ask(server, openai_provider(stream=False), complete_statement)) == "SELECT 1"
+    assert server.requests[0]["body"]["stream"] is False
+
+    server = StubLLMServer({"candidates": [{"content": {"parts": [{"text": "SELECT 2"}]}}]})
+    assert asyncio.run(ask(server, gemini_provider(stream=False))) == "SELECT 2"
+    assert ":generateContent?key=key" in server.requests[0]["path"]
+
+
+def test_errors_are_recorded():
+    provider = openai_provider()
+    with pytest.raises(RateLimitError):
+        asyncio.run(ask(StubLLMServer({}, status=429), provider))
+    with pytest.raises(ProviderError):
+        asyncio.run(ask(StubLLMServer({}, status=500), provider))
+    assert provider.health.failures == 2
+
+
+def test_build_provider_uses_configured_model_and_stream(monkeypatch):
+    monkeypatch.setattr(config, "gemini_model", "gemini-test")
+    monkeypatch.setattr(config, "gemini_stream", True)
+    monkeypatch.setattr(config, "openai_stream", False)
+
+    assert build_provider("gemini").model == "gemini-test"
+    assert build_provider("gemini").stream is True
+    assert build_provider("openai").stream is False
@@ -0,0 +1,179 @@
+import asyncio
+import time
+
+import pytest
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import SendMessage
+from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
+
+from services.outbox import MESSAGE_LIMIT, Outbox, TokenBucket, mergeable
+
+KEYBOARD = InlineKeyboardMarkup(inline_keyboard=[[InlineKeyboardButton(text="ok", callback_data="ok")]])
+
+
+class FakeBot:
+    """Records sent methods; `flood` maps a text to how many RetryAfter answers it gets first"""
+
+    def __init__(self, latency: float = 0.0, flood: dict = None):
+        self.latency = latency
+        self.flood = dict(flood or {})
+        self.sent = []
+
+    async def __call__(self, method):
+        await asyncio.sleep(self.latency)
+        if self.flood.get(method.text):
+            self.flood[method.text] -= 1
+            raise TelegramRetryAfter(method, "Flood control exceeded", 1)
+        self.sent.append((time.monotonic(), method))
+        return f"sent:{method.text}"
+
+
+def text(chat_id: int, value: str, **kwargs) -> SendMessage:
+    return SendMessage(chat_id=chat_id, text=value, **kwargs)
+
+
+def fast_outbox(**kwargs) -> Outbox:
+    return Outbox(**{"rate": 1000, "chat_rate": 1000, "group_rate": 1000, "chat_burst": 1000, **kwargs})
+
+
+async def deliver(outbox: Outbox, bot: FakeBot, methods: list) -> list:
+    """Queue everything, then start the scheduler and wait for all results"""
+    futures = [outbox.send(method) for method in methods]
+    outbox.start(bot)
+    try:
+        return await asyncio.wait_for(asyncio.gather(*futures), 5)
+    finally:
+        await outbox.close(timeout=0)
+
+
+def test_token_bucket():
+    bucket = TokenBucket(rate=2, capacity=2)
+    now = bucket.updated
+    assert bucket.delay(now) == 0
+    bucket.take()
+    bucket.take()
+    assert bucket.delay(now) == pytest.approx(0.5)
+    assert bucket.delay(now + 0.25) == pytest.approx(0.25)
+    assert bucket.delay(now + 10) == 0
+    assert bucket.tokens == 2
+
+
+def test_chat_bucket_paces_one_chat():
+    outbox = fast_outbox(chat_rate=10, chat_burst=1)
+    bot = FakeBot()
+    asyncio.run(deliver(outbox, bot, [text(1, str(n), reply_markup=KEYBOARD) for n in range(4)]))
+
+    times = [at for at, _ in bot.sent]
+    assert len(times) == 4
+    assert times[-1] - times[0] >= 0.25
+
+
+def test_queued_replies_are_merged():
+    outbox = fast_outbox()
+    bot = FakeBot()
+    results = asyncio.run(deliver(outbox, bot, [text(1, "a"), text(1, "b"), text(1, "c")]))
+
+    assert [method.text for _, method in bot.sent] == ["a\n\nb\n\nc"]
+    assert results == ["sent:a\n\nb\n\nc"] * 3
+    assert (outbox.sent, outbox.merged) == (1, 2)
+
+
+@pytest.mark.parametrize("second, sends", [(2048, 1), (2049, 2)])
+def test_merge_stops_at_the_message_limit(second, sends):
+    bot = FakeBot()
+    first = MESSAGE_LIMIT - 2 - 2048
+    asyncio.run(deliver(fast_outbox(), bot, [text(1, "x" * first), text(1, "y" * second)]))
+
+    assert len(bot.sent) == sends
+    assert all(len(method.text) <= MESSAGE_LIMIT for _, method in bot.sent)
+
+
+def test_only_plain_replies_merge():
+    assert mergeable(text(1, "a"), text(1, "b"))
+    assert not mergeable(text(1, "a"), text(1, "b", reply_markup=KEYBOARD))
+    assert not mergeable(text(1, "a", reply_markup=KEYBOARD), text(1, "b"))
+    assert not mergeable(text(1, "a"), text(1, "b", parse_mode="HTML"))
+    assert not mergeable(text(1, "a"), text(2, "b"))
+
+
+def test_retry_after_requeues_at_the_head_and_pauses_the_chat():
+    async def go():
+        outbox = fast_outbox()
+        bot = FakeBot(latency=0.05, flood={"first": 1})
+        outbox.start(bot)
+        first = outbox.send(text(1, "first", reply_markup=KEYBOARD))
+        await asyncio.sleep(0.01)
+        second = outbox.send(text(1, "second", reply_markup=KEYBOARD))
+        other = outbox.send(text(2, "other chat"))
+        started = time.monotonic()
+        try:
+            results = await asyncio.wait_for(asyncio.gather(first, second, other), 5)
+        finally:
+            await outbox.close(timeout=0)
+        return outbox, bot, results, started
+
+    outbox, bot, results, started = asyncio.run(go())
+    order = [method.text for _, method in bot.sent]
+    assert order == ["other chat", "first", "second"]
+    assert bot.sent[1][0] - started >= 0.9
+    assert bot.sent[0][0] - started < 0.5
+    assert results == ["sent:first", "sent:second", "sent:other chat"]
+    assert outbox.retried == 1
+
+
+def test_chats_are_served_round_robin():
+    outbox = fast_outbox(max_in_flight=1)
+    bot = FakeBot(latency=0.01)
+    methods = [text(1, f"a{n}", reply_markup=KEYBOARD) for n in range(4)]
+    methods += [text(2, "b0", reply_markup=KEYBOARD), text(3, "c0", reply_markup=KEYBOARD)]
+    asyncio.run(deliver(outbox, bot, methods))
+
+    order = [method.text for _, method in bot.sent]
+    assert order[:3] == ["a0", "b0", "c0"]
+    assert order[3:] == ["a1", "a2", "a3"]
+
+
+def test_failed_send_resolves_to_none():
+    class Broken(FakeBot):
+        async def __call__(self, method):
+            raise RuntimeError("network down")
+
+    outbox = fast_outbox()
+    assert asyncio.run(deliver(outbox, Broken(), [text(1, "a"), text(2, "b")])) == [None, None]
+    assert outbox.failed == 2
+
+
+def test_scheduler_survives_a_dispatch_error(monkeypatch):
+    async def go():
+        outbox = fast_outbox()
+        dispatch = outbox._dispatch
+        calls = []
+
+        def flaky():
+            calls.append(1)
+            if len(calls) == 1:
+                raise RuntimeError("bad method")
+            return dispatch()
+
+        monkeypatch.setattr(outbox, "_dispatch", flaky)
+        bot = FakeBot()
+        outbox.start(bot)
+        future = outbox.send(text(1, "still delivered"))
+        try:
+            return await asyncio.wait_for(future, 5)
+        finally:
+            await outbox.close(timeout=0)
+
+    assert asyncio.run(go()) == "sent:still delivered"
+
+
+def test_close_resolves_what_was_not_sent():
+    async def go():
+        outbox = fast_outbox()
+        future = outbox.send(text(1, "never started"))
+        await outbox.close(timeout=0)
+        return outbox, await future
+
+    outbox, result = asyncio.run(go())
+    assert result is None
+    assert outbox.failed == 1
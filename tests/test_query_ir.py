@@ -0,0 +1,174 @@
+import asyncio
+import sys
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+
+import pytest
+
+import services.analytics_service
+from database.session import DatabasePool
+from services.query_ir import compile_query, parse_query_ir
+from services.sql_shapes import DAY, AggregateQuery, Condition
+
+analytics = sys.modules["services.analytics_service"]
+
+NOV_1 = int(datetime(2025, 11, 1, tzinfo=timezone.utc).timestamp()) * 1_000_000
+CREATOR = "a1b2c3d4e5f60718293a4b5c6d7e8f90"
+
+
+def ir(**fields) -> dict:
+    return {"table": "videos", "aggregation": "count", "metric": None, **fields}
+
+
+@pytest.mark.parametrize("data, expected", [
+    (ir(), AggregateQuery("videos", "count")),
+    (ir(metric="views_count"), AggregateQuery("videos", "count")),
+    (ir(aggregation="sum", metric="likes_count"), AggregateQuery("videos", "sum", "likes_count")),
+    (ir(aggregation="count_distinct", metric="creator_id"), AggregateQuery("videos", "count_distinct", "creator_id")),
+    (
+        ir(table="video_snapshots", aggregation="sum", metric="delta_views_count"),
+        AggregateQuery("video_snapshots", "sum", "delta_views_count"),
+    ),
+    (
+        ir(filters=[{"column": "creator_id", "op": "=", "value": CREATOR},
+                    {"column": "views_count", "op": ">=", "value": 100000}]),
+        AggregateQuery("videos", "count", None, [
+            Condition("creator_id", "=", CREATOR),
+            Condition("views_count", ">=", 100000),
+        ]),
+    ),
+    (
+        ir(date_range={"from": "2025-11-01", "to": "2025-11-05"}),
+        AggregateQuery("videos", "count", None, [
+            Condition("video_created_at", ">=", NOV_1),
+            Condition("video_created_at", "<", NOV_1 + 5 * DAY),
+        ]),
+    ),
+    (
+        ir(table="video_snapshots", date_range={"from": "2025-11-01"}),
+        AggregateQuery("video_snapshots", "count", None, [Condition("created_at", ">=", NOV_1)]),
+    ),
+])
+def test_parses_valid_ir(data, expected):
+    assert parse_query_ir(data) == expected
+
+
+@pytest.mark.parametrize("data", [
+    None,
+    "SELECT COUNT(*) FROM videos",
+    ir(table="users"),
+    ir(aggregation="avg", metric="views_count"),
+    ir(aggregation="sum", metric="creator_id"),
+    ir(aggregation="sum", metric="delta_views_count"),
+    ir(aggregation="count_distinct", metric="video_id"),
+    ir(filters={"column": "views_count", "op": ">", "value": 1}),
+    ir(filters=["views_count > 1"]),
+    ir(filters=[{"column": "title", "op": "=", "value": "x"}]),
+    ir(filters=[{"column": "views_count", "op": "!=", "value": 1}]),
+    ir(filters=[{"column": "views_count", "op": ">", "value": "1; DROP TABLE videos"}]),
+    ir(filters=[{"column": "views_count", "op": ">", "value": True}]),
+    ir(filters=[{"column": "views_count", "op": ">", "value": 1.5}]),
+    ir(filters=[{"column": "creator_id", "op": ">", "value": CREATOR}]),
+    ir(filters=[{"column": "creator_id", "op": "=", "value": ""}]),
+    ir(filters=[{"column": "creator_id", "op": "=", "value": 42}]),
+    ir(date_range="2025-11-01"),
+    ir(date_range={"from": "01.11.2025"}),
+    ir(date_range={"to": 20251101}),
+])
+def test_rejects_out_of_grammar_ir(data):
+    assert parse_query_ir(data) is None
+
+
+def test_compiles_every_value_to_a_parameter():
+    query = parse_query_ir(ir(
+        aggregation="sum", metric="likes_count",
+        filters=[{"column": "views_count", "op": ">", "value": 1000},
+                 {"column": "creator_id", "op": "=", "value": CREATOR}],
+        date_range={"from": "2025-11-01", "to": "2025-11-01"},
+    ))
+
+    sql, params = compile_query(query)
+    assert sql == (
+        "SELECT COALESCE(SUM(likes_count), 0) FROM videos WHERE creator_id = $1 "
+        "AND video_created_at < $2 AND video_created_at >= $3 AND views_count > $4"
+    )
+    assert params == [
+        CREATOR,
+        datetime(2025, 11, 2, tzinfo=timezone.utc),
+        datetime(2025, 11, 1, tzinfo=timezone.utc),
+        1000,
+    ]
+
+
+@pytest.mark.parametrize("query, sql", [
+    (AggregateQuery("videos", "count"), "SELECT COUNT(*) FROM videos"),
+    (
+        AggregateQuery("videos", "count_distinct", "creator_id"),
+        "SELECT COUNT(DISTINCT creator_id) FROM videos",
+    ),
+    (
+        AggregateQuery("video_snapshots", "sum", "delta_views_count", [Condition("created_at", ">=", NOV_1)]),
+        "SELECT COALESCE(SUM(delta_views_count), 0) FROM video_snapshots WHERE created_at >= $1",
+    ),
+])
+def test_compiled_shapes(query, sql):
+    assert compile_query(query)[0] == sql
+
+
+def test_same_shape_gives_the_same_text():
+    first = parse_query_ir(ir(filters=[{"column": "views_count", "op": ">", "value": 1},
+                                       {"column": "creator_id", "op": "=", "value": "aaa1"}]))
+    second = parse_query_ir(ir(filters=[{"column": "creator_id", "op": "=", "value": "bbb2"},
+                                        {"column": "views_count", "op": ">", "value": 500}]))
+
+    (first_sql, first_params), (second_sql, second_params) = compile_query(first), compile_query(second)
+    assert first_sql == second_sql
+    assert (first_params, second_params) == (["aaa1", 1], ["bbb2", 500])
+
+
+class FakeConnection:
+    def __init__(self):
+        self.statements = []
+
+    @asynccontextmanager
+    async def transaction(self, **kwargs):
+        yield
+
+    async def fetchval(self, sql, *params):
+        if "data_version" in sql:
+            return 0 if "to_regclass" in sql else None
+        self.statements.append((sql, params))
+        return 7
+
+
+@pytest.mark.parametrize("store_answers", [True, False])
+def test_question_compiles_its_query_once(monkeypatch, store_answers):
+    compiled, logged = [], []
+    conn = FakeConnection()
+
+    def counting_compile(query):
+        compiled.append(query)
+        return compile_query(query)
+
+    async def answer(query):
+        return 7 if store_answers else None
+
+    async def no_version(self):
+        return None
+
+    @asynccontextmanager
+    async def acquire(readonly=False):
+        yield conn
+
+    monkeypatch.setattr(analytics, "compile_query", counting_compile)
+    for store in (analytics.sketch_store, analytics.video_store, analytics.snapshot_store):
+        monkeypatch.setattr(store, "answer", answer)
+    monkeypatch.setattr(DatabasePool, "acquire", acquire)
+    monkeypatch.setattr(analytics.AnalyticsService, "_data_version", no_version)
+    monkeypatch.setattr(analytics.query_log, "record", lambda kind, question, sql, *args: logged.append(sql))
+
+    result, error = asyncio.run(analytics.AnalyticsService().process_question("Сколько всего видео?"))
+    assert (result, error) == (7, None)
+    assert len(compiled) == 1
+    assert logged == ["SELECT COUNT(*) FROM videos"]
+    assert conn.statements == ([] if store_answers else [("SELECT COUNT(*) FROM videos", ())])
@@ -0,0 +1,79 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+from database.session import DatabasePool
+from services.query_log import QueryLogWriter
+
+
+class SlowDatabase:
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        self.copies = []
+        self.executed = []
+
+    @asynccontextmanager
+    async def acquire(self, readonly: bool = False):
+        yield self
+
+    async def copy_records_to_table(self, table, records, columns):
+        await asyncio.sleep(self.seconds)
+        self.copies.append([record[3] for record in records])
+
+    async def execute(self, sql, *args):
+        self.executed.append(sql)
+        return "DELETE 0"
+
+
+def writer(monkeypatch, seconds: float) -> tuple:
+    database = SlowDatabase(seconds)
+    monkeypatch.setattr(DatabasePool, "acquire", database.acquire)
+    return QueryLogWriter(batch_rows=2, flush_interval=0.01), database
+
+
+def test_close_waits_for_the_flush_in_progress(monkeypatch):
+    async def go():
+        log, database = writer(monkeypatch, 0.2)
+        log.start()
+        log.record("question", "q1", None, 1, None)
+        log.record("question", "q2", None, 2, None)
+        await asyncio.sleep(0.05)
+        log.record("question", "q3", None, 3, None)
+        await log.close()
+        return log, database
+
+    log, database = asyncio.run(go())
+    assert database.copies == [["q1", "q2"], ["q3"]]
+    assert (log.written, log.dropped) == (3, 0)
+
+
+def test_close_cancels_a_flush_that_overruns(monkeypatch):
+    async def go():
+        log, database = writer(monkeypatch, 10)
+        log.start()
+        log.record("question", "q1", None, 1, None)
+        log.record("question", "q2", None, 2, None)
+        await asyncio.sleep(0.05)
+        database.seconds = 0
+        log.record("question", "q3", None, 3, None)
+        await log.close(timeout=0.1)
+        return log, database
+
+    log, database = asyncio.run(go())
+    assert database.copies == [["q3"]]
+    assert (log.written, log.dropped) == (1, 2)
+
+
+def test_failed_flush_drops_the_rows(monkeypatch):
+    async def go():
+        log, database = writer(monkeypatch, 0)
+
+        async def broken(*args, **kwargs):
+            raise ConnectionError("database went away")
+
+        database.copy_records_to_table = broken
+        log.record("question", "q1", None, 1, None)
+        assert await log.flush() == 0
+        return log
+
+    log = asyncio.run(go())
+    assert (log.written, log.dropped) == (0, 1)
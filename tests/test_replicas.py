@@ -0,0 +1,213 @@
+import asyncio
+import sys
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy.engine import make_url
+
+from core.config import config
+from database import session
+from database.session import DatabasePool, Replica
+import services.analytics_service
+from services.answer_cache import AnswerCache
+from services.data_version import data_version_service
+from services.video_store import VideoColumnStore
+
+analytics = sys.modules["services.analytics_service"]
+
+
+class FakeEngine:
+    def __init__(self, name: str, lag: float = 0.0):
+        self.url = make_url(f"postgresql+asyncpg://bot@{name}/video_analytic")
+        self.name = name
+        self.lag = lag
+        self.down = False
+
+    def connect(self) -> "FakeConnection":
+        return FakeConnection(self)
+
+
+class FakeConnection:
+    """Awaitable and async context manager, like AsyncConnection"""
+
+    def __init__(self, engine: FakeEngine):
+        self.engine = engine
+
+    def __await__(self):
+        return self.__aenter__().__await__()
+
+    async def __aenter__(self) -> "FakeConnection":
+        if self.engine.down:
+            raise OSError(f"{self.engine.name} is down")
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        pass
+
+    async def get_raw_connection(self):
+        return SimpleNamespace(driver_connection=self.engine.name)
+
+    async def scalar(self, statement):
+        return self.engine.lag
+
+    async def close(self) -> None:
+        pass
+
+
+@pytest.fixture
+def replicas(monkeypatch):
+    engines = [FakeEngine("replica1"), FakeEngine("replica2")]
+    monkeypatch.setattr(session, "_engine", FakeEngine("primary"))
+    monkeypatch.setattr(session, "_replicas", [Replica(engine.name, engine) for engine in engines])
+    monkeypatch.setattr(config, "db_replica_max_lag", 5.0)
+    return session._replicas
+
+
+async def read() -> str:
+    async with DatabasePool.acquire(readonly=True) as conn:
+        return conn
+
+
+def test_reads_go_to_the_replica_with_fewest_in_flight(replicas):
+    async def go():
+        held = DatabasePool.acquire(readonly=True)
+        first = await held.__aenter__()
+        try:
+            seconds = [await read() for _ in range(5)]
+            outstanding = [replica.outstanding for replica in replicas]
+        finally:
+            await held.__aexit__(None, None, None)
+        return first, seconds, outstanding
+
+    first, seconds, outstanding = asyncio.run(go())
+    other = "replica2" if first == "replica1" else "replica1"
+    assert seconds == [other] * 5
+    assert sorted(outstanding) == [0, 1]
+    assert [replica.outstanding for replica in replicas] == [0, 0]
+
+
+def test_ties_spread_over_replicas(replicas):
+    chosen = {asyncio.run(read()) for _ in range(50)}
+    assert chosen == {"replica1", "replica2"}
+
+
+def test_writes_use_the_primary(replicas):
+    async def go():
+        async with DatabasePool.acquire() as conn:
+            return conn
+
+    assert asyncio.run(go()) == "primary"
+
+
+def test_lagging_replica_is_ejected_and_readmitted(replicas):
+    replicas[0].engine.lag = 30
+    asyncio.run(DatabasePool.check_replicas())
+    assert [replica.healthy for replica in replicas] == [False, True]
+    assert replicas[0].lag == 30
+    assert {asyncio.run(read()) for _ in range(20)} == {"replica2"}
+
+    replicas[0].engine.lag = 0.5
+    asyncio.run(DatabasePool.check_replicas())
+    assert [replica.healthy for replica in replicas] == [True, True]
+    assert {asyncio.run(read()) for _ in range(50)} == {"replica1", "replica2"}
+
+
+def test_unreachable_replica_is_ejected_by_the_health_check(replicas):
+    replicas[1].engine.down = True
+    asyncio.run(DatabasePool.check_replicas())
+    assert [replica.healthy for replica in replicas] == [True, False]
+
+
+def test_failed_connect_ejects_and_falls_back_to_the_primary(replicas):
+    for replica in replicas:
+        replica.engine.down = True
+
+    assert asyncio.run(read()) == "primary"
+    assert asyncio.run(read()) == "primary"
+    assert [replica.healthy for replica in replicas] == [False, False]
+    assert [replica.outstanding for replica in replicas] == [0, 0]
+
+
+def test_no_healthy_replica_reads_from_the_primary(replicas):
+    for replica in replicas:
+        replica.healthy = False
+    assert asyncio.run(read()) == "primary"
+    assert DatabasePool.replica_status()[0] == {
+        "replica": "postgresql+asyncpg://bot@replica1/video_analytic",
+        "healthy": False, "lag": 0.0, "outstanding": 0,
+    }
+
+
+class LaggingReplica:
+    """Read connection whose snapshot shows data version `version`"""
+
+    def __init__(self, version: int):
+        self.version = version
+        self.loads = 0
+
+    @asynccontextmanager
+    async def transaction(self, **kwargs):
+        assert kwargs == {"isolation": "repeatable_read", "readonly": True}
+        yield
+
+    async def fetchval(self, sql, *args):
+        if "to_regclass" in sql:
+            return True
+        if "data_version" in sql:
+            return self.version
+        return 42
+
+    async def fetch(self, sql):
+        self.loads += 1
+        return []
+
+
+@pytest.fixture
+def lagging(monkeypatch):
+    replica = LaggingReplica(5)
+
+    @asynccontextmanager
+    async def acquire(readonly=False):
+        yield replica
+
+    async def primary_version():
+        return 6
+
+    monkeypatch.setattr(DatabasePool, "acquire", acquire)
+    monkeypatch.setattr(data_version_service, "get", primary_version)
+    return replica
+
+
+def test_store_keeps_the_version_its_replica_showed(lagging, monkeypatch):
+    monkeypatch.setattr(data_version_service, "ttl", 60.0)
+    store = VideoColumnStore()
+
+    assert asyncio.run(store.refresh())
+    assert store.version == 5
+    assert asyncio.run(store.refresh())
+    assert lagging.loads == 1
+
+    monkeypatch.setattr(data_version_service, "ttl", 0.0)
+    lagging.version = 6
+    assert asyncio.run(store.refresh())
+    assert (store.version, lagging.loads) == (6, 2)
+    assert asyncio.run(store.refresh())
+    assert lagging.loads == 2
+
+
+def test_answer_is_cached_under_the_replica_version(lagging, monkeypatch):
+    cache = AnswerCache()
+
+    async def no_answer(query):
+        return None
+
+    for store in (analytics.sketch_store, analytics.video_store, analytics.snapshot_store):
+        monkeypatch.setattr(store, "answer", no_answer)
+    monkeypatch.setattr(analytics, "answer_cache", cache)
+    monkeypatch.setattr(analytics.query_log, "record", lambda *args: None)
+
+    result, error = asyncio.run(analytics.AnalyticsService().process_question("Сколько всего видео?"))
+    assert (result, error) == (42, None)
+    assert cache.fresh("сколько всего видео", 5) == 42
+    assert cache.fresh("сколько всего видео", 6) is None
@@ -0,0 +1,157 @@
+import asyncio
+import os
+from datetime import date, datetime, timezone
+
+import pytest
+
+import services.retention as retention
+from services.retention import NoDailyTier, pending_days, rollup_snapshots
+
+
+class FakeConnection:
+    def __init__(self, compact: bool, daily: bool):
+        self.tiers = {"compact": compact, "daily": daily}
+        self.queries = []
+
+    async def fetchrow(self, sql):
+        return self.tiers
+
+    async def fetchval(self, sql, *args):
+        self.queries.append(sql)
+        return None
+
+    async def fetch(self, sql, *args):
+        self.queries.append(sql)
+        return []
+
+
+@pytest.mark.parametrize("compact, daily, message", [
+    (False, False, "text layout"),
+    (True, False, "daily_snapshot_rows not found"),
+])
+def test_rollup_needs_the_daily_tier(compact, daily, message):
+    conn = FakeConnection(compact, daily)
+    for work in (rollup_snapshots, pending_days):
+        with pytest.raises(NoDailyTier, match=message):
+            asyncio.run(work(conn, date(2025, 11, 1)))
+    assert conn.queries == []
+
+
+def test_rollup_on_the_daily_tier_runs():
+    conn = FakeConnection(True, True)
+    assert asyncio.run(rollup_snapshots(conn, date(2025, 11, 1))) == []
+    assert asyncio.run(pending_days(conn, date(2025, 11, 1))) == []
+    assert len(conn.queries) == 2
+
+
+class MovingConnection(FakeConnection):
+    def __init__(self, oldest: date, moved: dict):
+        super().__init__(True, True)
+        self.oldest, self.moved = oldest, moved
+        self.statements = []
+
+    async def fetchval(self, sql, *args):
+        return self.oldest
+
+    async def fetchrow(self, sql, *args):
+        if not args:
+            return self.tiers
+        self.statements.append(args[0])
+        return {"hourly_rows": self.moved.get(args[0], 0), "daily_rows": min(self.moved.get(args[0], 0), 2)}
+
+    async def execute(self, sql, *args):
+        self.statements.append(sql.split()[0])
+
+
+def test_each_day_moves_in_one_statement(monkeypatch):
+    async def bump(conn):
+        return 1
+
+    monkeypatch.setattr(retention, "bump_data_version", bump)
+    conn = MovingConnection(date(2025, 11, 1), {date(2025, 11, 1): 48, date(2025, 11, 3): 24})
+
+    rolled = asyncio.run(rollup_snapshots(conn, date(2025, 11, 4)))
+    assert [(r.day, r.hourly_rows, r.daily_rows) for r in rolled] == [
+        (date(2025, 11, 1), 48, 2),
+        (date(2025, 11, 3), 24, 2),
+    ]
+    assert conn.statements == [date(2025, 11, 1), date(2025, 11, 2), date(2025, 11, 3), "VACUUM", "ANALYZE"]
+
+
+DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+SCHEMA = "retention_test"
+
+
+class RacingConnection:
+    """Commits one more hourly row for the day from another connection after the first
+    statement of the rollup, the way the live ingestor can"""
+
+    def __init__(self, conn, other, day: date):
+        self.conn, self.other, self.day = conn, other, day
+        self.raced = False
+
+    def __getattr__(self, name):
+        return getattr(self.conn, name)
+
+    async def execute(self, sql, *args):
+        result = await self.conn.execute(sql, *args)
+        await self._race(args)
+        return result
+
+    async def fetchrow(self, sql, *args):
+        row = await self.conn.fetchrow(sql, *args)
+        await self._race(args)
+        return row
+
+    async def _race(self, args) -> None:
+        if args and not self.raced:
+            self.raced = True
+            await self.other.execute(
+                "INSERT INTO snapshot_rows VALUES (gen_random_uuid(), $1, $1, 1, 9, 9, 9, 9, 1, 1, 1, 1)",
+                datetime(self.day.year, self.day.month, self.day.day, 23, tzinfo=timezone.utc),
+            )
+
+
+@pytest.mark.skipif(not DATABASE_URL, reason="TEST_DATABASE_URL not set")
+def test_rows_ingested_during_the_rollup_are_not_lost():
+    async def run():
+        import asyncpg
+
+        day = date(2025, 11, 1)
+        conn = await asyncpg.connect(DATABASE_URL, server_settings={"search_path": SCHEMA})
+        other = await asyncpg.connect(DATABASE_URL, server_settings={"search_path": SCHEMA})
+        try:
+            await conn.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE; CREATE SCHEMA {SCHEMA}")
+            await conn.execute(
+                "CREATE TABLE snapshot_rows (id UUID PRIMARY KEY, created_at TIMESTAMPTZ, updated_at TIMESTAMPTZ, "
+                "video_idx INTEGER, views_count INTEGER, likes_count INTEGER, comments_count INTEGER, "
+                "reports_count INTEGER, delta_views_count INTEGER, delta_likes_count INTEGER, "
+                "delta_comments_count INTEGER, delta_reports_count INTEGER)"
+            )
+            await conn.execute(
+                "CREATE TABLE daily_snapshot_rows (video_idx INTEGER, day DATE, id UUID, created_at TIMESTAMPTZ, "
+                "updated_at TIMESTAMPTZ, views_count INTEGER, likes_count INTEGER, comments_count INTEGER, "
+                "reports_count INTEGER, delta_views_count INTEGER, delta_likes_count INTEGER, "
+                "delta_comments_count INTEGER, delta_reports_count INTEGER, hourly_rows INTEGER, "
+                "PRIMARY KEY (video_idx, day))"
+            )
+            for hour in range(3):
+                created_at = datetime(2025, 11, 1, hour, tzinfo=timezone.utc)
+                await conn.execute(
+                    "INSERT INTO snapshot_rows VALUES (gen_random_uuid(), $1, $1, 1, $2, 0, 0, 0, 10, 0, 0, 0)",
+                    created_at, 10 * (hour + 1),
+                )
+
+            rolled = await rollup_snapshots(RacingConnection(conn, other, day), date(2025, 11, 2))
+            daily = await conn.fetchrow("SELECT hourly_rows, delta_views_count FROM daily_snapshot_rows")
+            hourly = await conn.fetchval("SELECT COUNT(*) FROM snapshot_rows")
+            return rolled, daily, hourly
+        finally:
+            await conn.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+            await conn.close()
+            await other.close()
+
+    rolled, daily, hourly = asyncio.run(run())
+    assert [(r.day, r.hourly_rows, r.daily_rows) for r in rolled] == [(date(2025, 11, 1), 3, 1)]
+    assert (daily["hourly_rows"], daily["delta_views_count"]) == (3, 30)
+    assert hourly == 1
@@ -0,0 +1,109 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+import pytest
+
+from database.session import DatabasePool
+from database.sharding import normalize_creator_id, partition_records, shard_for
+from services.shard_router import NotShardable, ShardPlan, ShardRouter
+from services.sql_shapes import AggregateQuery, Condition
+
+CREATOR = "a1b2c3d4e5f60718293a4b5c6d7e8f90"
+DASHED = "A1B2C3D4-E5F6-0718-293A-4B5C6D7E8F90"
+
+router = ShardRouter(4)
+
+
+def test_creator_ids_normalize_to_one_shard():
+    assert normalize_creator_id(DASHED) == CREATOR
+    assert shard_for(DASHED, 4) == shard_for(CREATOR, 4)
+
+
+@pytest.mark.parametrize("sql", [
+    f"SELECT COUNT(*) FROM videos WHERE creator_id = '{CREATOR}'",
+    f"SELECT COUNT(*) FROM videos WHERE creator_id = '{DASHED}' AND views_count > 10",
+    f"SELECT v.id, v.views_count FROM videos v WHERE v.creator_id = '{CREATOR}' ORDER BY 2 LIMIT 5",
+    "SELECT COALESCE(SUM(delta_views_count), 0) FROM video_snapshots "
+    f"WHERE video_id IN (SELECT id FROM videos WHERE creator_id = '{CREATOR}')",
+])
+def test_single_creator_goes_to_its_shard(sql):
+    assert router.plan(sql) == ShardPlan([shard_for(CREATOR, 4)], "single")
+
+
+@pytest.mark.parametrize("sql, merge", [
+    ("SELECT COUNT(*) FROM videos", "sum"),
+    ("SELECT COALESCE(SUM(views_count), 0) FROM videos WHERE likes_count > 5", "sum"),
+    ("SELECT COUNT(DISTINCT video_id) FROM video_snapshots WHERE delta_views_count > 0", "sum"),
+    ("SELECT COUNT(DISTINCT creator_id) FROM videos", "sum"),
+    ("SELECT MAX(views_count) FROM videos", "max"),
+    ("SELECT MIN(video_created_at) FROM videos", "min"),
+])
+def test_fan_out(sql, merge):
+    assert router.plan(sql) == ShardPlan([0, 1, 2, 3], merge)
+
+
+@pytest.mark.parametrize("sql", [
+    "SELECT creator_id, COUNT(*) FROM videos GROUP BY creator_id",
+    "SELECT COUNT(DISTINCT views_count) FROM videos",
+    "SELECT AVG(views_count) FROM videos",
+    "SELECT COUNT(*) FROM videos WHERE views_count > (SELECT AVG(views_count) FROM videos)",
+    f"SELECT COUNT(*) FROM videos WHERE creator_id = '{CREATOR}' OR views_count > 10",
+    "SELECT COUNT(*) FROM videos WHERE creator_id = 'aa11' OR creator_id = 'bb22'",
+    "SELECT views_count FROM videos ORDER BY views_count DESC LIMIT 1",
+])
+def test_not_shardable(sql):
+    with pytest.raises(NotShardable):
+        router.plan(sql)
+
+
+def test_rows_need_a_single_creator():
+    with pytest.raises(NotShardable):
+        router.plan("SELECT id FROM videos WHERE views_count > 10", single_value=False)
+
+
+def test_partition_keeps_snapshots_with_their_video():
+    videos = [("v1", CREATOR), ("v2", DASHED), ("v3", "0f9e8d7c6b5a49382716f5e4d3c2b1a0")]
+    snapshots = [("s1", "v1"), ("s2", "v2"), ("s3", "v3")]
+    parts = partition_records(videos, snapshots, 4)
+    for shard, (shard_videos, shard_snapshots) in enumerate(parts):
+        assert all(shard_for(video[1], 4) == shard for video in shard_videos)
+        assert {s[1] for s in shard_snapshots} <= {v[0] for v in shard_videos}
+
+
+class FakeShards:
+    def __init__(self, results):
+        self.results = results
+        self.calls = []
+
+    @asynccontextmanager
+    async def acquire(self, index):
+        yield FakeConnection(self, index)
+
+
+class FakeConnection:
+    def __init__(self, shards, index):
+        self.shards = shards
+        self.index = index
+
+    async def fetchval(self, sql, *params):
+        self.shards.calls.append((self.index, sql, params))
+        return self.shards.results[self.index]
+
+
+def test_fetch_aggregate_merges_shards(monkeypatch):
+    shards = FakeShards([3, None, 4, 5])
+    monkeypatch.setattr(DatabasePool, "acquire_shard", shards.acquire)
+    query = AggregateQuery("videos", "count", None, [Condition("views_count", ">", 10)])
+
+    assert asyncio.run(router.fetch_aggregate(query))[0] == 12
+    assert sorted(call[0] for call in shards.calls) == [0, 1, 2, 3]
+
+
+def test_fetch_aggregate_pins_the_normalized_creator(monkeypatch):
+    shards = FakeShards([1, 2, 3, 4])
+    monkeypatch.setattr(DatabasePool, "acquire_shard", shards.acquire)
+    query = AggregateQuery("videos", "count", None, [Condition("creator_id", "=", DASHED)])
+
+    index = shard_for(CREATOR, 4)
+    assert asyncio.run(router.fetch_aggregate(query))[0] == index + 1
+    assert [(call[0], call[2]) for call in shards.calls] == [(index, (CREATOR,))]
@@ -0,0 +1,130 @@
+from datetime import date
+
+import numpy as np
+import pytest
+
+from services.hll import empty, estimate, merge, registers, relative_error
+from services.sketch_store import ALL, EPOCH_DAY, DaySketches, SketchStore, day_sketches
+from services.sql_shapes import DAY, DELTA_COLUMNS, AggregateQuery, Condition
+
+PRECISION = 12
+NOV_1 = (date(2025, 11, 1) - EPOCH_DAY).days
+
+
+def hashes(start: int, count: int) -> np.ndarray:
+    """Distinct, deliberately weak (sequential) hashes; mix64 has to spread them"""
+    return np.arange(start, start + count, dtype=np.uint64)
+
+
+@pytest.mark.parametrize("precision", [11, 14])
+@pytest.mark.parametrize("count", [1, 10, 1000, 20000, 300000])
+def test_estimate_stays_within_the_stated_error(precision, count):
+    error = relative_error(precision)
+    value = estimate(registers(hashes(7 * count, count), precision))
+    assert abs(value - count) <= max(3 * error * count, 1)
+
+
+def test_empty_sketch_estimates_zero():
+    assert estimate(empty(PRECISION)) == 0
+    assert estimate(registers(np.array([], dtype=np.uint64), PRECISION)) == 0
+
+
+def test_duplicates_do_not_count():
+    values = hashes(0, 5000)
+    assert np.array_equal(registers(np.tile(values, 4), PRECISION), registers(values, PRECISION))
+
+
+def test_merge_is_a_union():
+    first, second = hashes(0, 30000), hashes(20000, 30000)
+    merged = merge(np.stack([registers(first, PRECISION), registers(second, PRECISION)]))
+
+    assert np.array_equal(merged, registers(np.concatenate([first, second]), PRECISION))
+    assert abs(estimate(merged) - 50000) <= 3 * relative_error(PRECISION) * 50000
+    assert np.array_equal(merge(np.stack([merged, empty(PRECISION)])), merged)
+
+
+# Per day: (first hash, videos with a snapshot, of which the first `positive` had delta_views_count > 0)
+DAYS = [(0, 4000, 1000), (2000, 4000, 4000), (100000, 500, 0)]
+
+
+def sketches(valid_days=(True, True, True)) -> DaySketches:
+    valid = {metric: np.array(valid_days) for metric in (ALL, *DELTA_COLUMNS)}
+    stacks = {metric: np.zeros((len(DAYS), 1 << PRECISION), dtype=np.uint8) for metric in valid}
+    for index, (start, count, positive) in enumerate(DAYS):
+        rows = [
+            (int(value), n < positive, False, False, False)
+            for n, value in enumerate(hashes(start, count).astype(np.int64))
+        ]
+        for metric, sketch in day_sketches(rows, PRECISION).items():
+            stacks[metric][index] = sketch
+    return DaySketches(version=1, first_day=NOV_1, valid=valid, registers=stacks)
+
+
+def distinct_videos(*conditions: Condition) -> AggregateQuery:
+    return AggregateQuery("video_snapshots", "count_distinct", "video_id", list(conditions))
+
+
+def days(first: int, last: int) -> list:
+    """created_at conditions for whole days `first`..`last` (0 is 2025-11-01)"""
+    start = (NOV_1 + first) * DAY
+    return [Condition("created_at", ">=", start), Condition("created_at", "<", start + (last - first + 1) * DAY)]
+
+
+@pytest.mark.parametrize("conditions, expected", [
+    (days(0, 0), 4000),
+    (days(0, 1), 6000),
+    (days(0, 2), 6500),
+    ([], 6500),
+    (days(1, 2), 4500),
+    (days(0, 1) + [Condition("delta_views_count", ">", 0)], 5000),
+    (days(0, 0) + [Condition("delta_views_count", ">=", 1)], 1000),
+    (days(2, 2) + [Condition("delta_views_count", ">", 0)], 0),
+    (days(5, 9), 0),
+])
+def test_evaluate_merges_the_day_range(conditions, expected):
+    store = SketchStore(enabled=True, precision=PRECISION)
+    result = store.evaluate(distinct_videos(*conditions), sketches())
+
+    assert result.relative_error == relative_error(PRECISION)
+    assert abs(result - expected) <= max(3 * result.relative_error * expected, 1)
+
+
+@pytest.mark.parametrize("conditions", [
+    [Condition("created_at", ">=", NOV_1 * DAY + 3600 * 1_000_000)],
+    [Condition("created_at", "<", (NOV_1 + 1) * DAY - 1)],
+    days(0, 0)[:1] + [Condition("created_at", "<", (NOV_1 + 1) * DAY + 1)],
+])
+def test_evaluate_refuses_bounds_inside_a_day(conditions):
+    assert SketchStore(enabled=True, precision=PRECISION).evaluate(distinct_videos(*conditions), sketches()) is None
+
+
+def test_evaluate_refuses_ranges_with_a_dirty_day():
+    store = SketchStore(enabled=True, precision=PRECISION)
+    dirty = sketches(valid_days=(True, False, True))
+
+    assert store.evaluate(distinct_videos(*days(0, 1)), dirty) is None
+    assert store.evaluate(distinct_videos(), dirty) is None
+    assert store.evaluate(distinct_videos(*days(0, 0)), dirty) is not None
+    assert store.evaluate(distinct_videos(*days(2, 2)), dirty) is not None
+
+
+@pytest.mark.parametrize("query, metric", [
+    (distinct_videos(), ALL),
+    (distinct_videos(*days(0, 3)), ALL),
+    (distinct_videos(Condition("delta_views_count", ">", 0)), "delta_views_count"),
+    (distinct_videos(Condition("delta_likes_count", ">=", 1)), "delta_likes_count"),
+    (distinct_videos(Condition("delta_views_count", ">", 1)), None),
+    (distinct_videos(Condition("delta_views_count", ">=", 0)), None),
+    (distinct_videos(Condition("delta_views_count", "=", 1)), None),
+    (distinct_videos(Condition("delta_views_count", "<", 0)), None),
+    (distinct_videos(Condition("views_count", ">", 0)), None),
+    (distinct_videos(Condition("video_id", "=", "v1")), None),
+    (
+        distinct_videos(Condition("delta_views_count", ">", 0), Condition("delta_likes_count", ">", 0)),
+        None,
+    ),
+    (AggregateQuery("video_snapshots", "count"), None),
+    (AggregateQuery("videos", "count_distinct", "creator_id"), None),
+])
+def test_metric_accepts_only_positive_delta_filters(query, metric):
+    assert SketchStore.metric(query) == metric
@@ -0,0 +1,86 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from services.sql_shapes import DAY, AggregateQuery, Condition, day_start, parse_aggregate_query, sql_shape
+
+NOV_1 = int(datetime(2025, 11, 1, tzinfo=timezone.utc).timestamp()) * 1_000_000
+CREATOR = "a1b2c3d4e5f60718293a4b5c6d7e8f90"
+
+
+@pytest.mark.parametrize("sql, expected", [
+    ("SELECT COUNT(*) FROM videos", AggregateQuery("videos", "count")),
+    ("select count(id) from videos;", AggregateQuery("videos", "count")),
+    (
+        "SELECT COALESCE(SUM(likes_count), 0) FROM videos WHERE views_count > 100000",
+        AggregateQuery("videos", "sum", "likes_count", [Condition("views_count", ">", 100000)]),
+    ),
+    (
+        "SELECT COUNT(DISTINCT creator_id) FROM videos WHERE reports_count >= 1",
+        AggregateQuery("videos", "count_distinct", "creator_id", [Condition("reports_count", ">=", 1)]),
+    ),
+    (
+        f"SELECT COUNT(*) FROM videos WHERE creator_id = '{CREATOR}'",
+        AggregateQuery("videos", "count", None, [Condition("creator_id", "=", CREATOR)]),
+    ),
+    (
+        "SELECT COUNT(*) FROM videos WHERE video_created_at::date = '2025-11-01'",
+        AggregateQuery("videos", "count", None, [
+            Condition("video_created_at", ">=", NOV_1),
+            Condition("video_created_at", "<", NOV_1 + DAY),
+        ]),
+    ),
+    (
+        "SELECT COUNT(*) FROM videos WHERE video_created_at::date BETWEEN '2025-11-01' AND '2025-11-05'",
+        AggregateQuery("videos", "count", None, [
+            Condition("video_created_at", ">=", NOV_1),
+            Condition("video_created_at", "<", NOV_1 + 5 * DAY),
+        ]),
+    ),
+    (
+        "SELECT COUNT(*) FROM videos WHERE video_created_at::date > '2025-11-01' AND views_count < 1000",
+        AggregateQuery("videos", "count", None, [
+            Condition("video_created_at", ">=", NOV_1 + DAY),
+            Condition("views_count", "<", 1000),
+        ]),
+    ),
+    (
+        "SELECT COUNT(*) FROM videos WHERE video_created_at >= '2025-11-01'",
+        AggregateQuery("videos", "count", None, [Condition("video_created_at", ">=", NOV_1)]),
+    ),
+    (
+        "SELECT COALESCE(SUM(delta_views_count), 0) FROM video_snapshots WHERE created_at::date <= '2025-11-01'",
+        AggregateQuery("video_snapshots", "sum", "delta_views_count", [Condition("created_at", "<", NOV_1 + DAY)]),
+    ),
+    (
+        "SELECT COUNT(DISTINCT video_id) FROM video_snapshots WHERE delta_views_count > 0",
+        AggregateQuery("video_snapshots", "count_distinct", "video_id", [Condition("delta_views_count", ">", 0)]),
+    ),
+])
+def test_parse_aggregate_query(sql, expected):
+    assert parse_aggregate_query(sql) == expected
+
+
+@pytest.mark.parametrize("sql", [
+    "SELECT AVG(views_count) FROM videos",
+    "SELECT COUNT(*) FROM users",
+    "SELECT SUM(delta_views_count) FROM videos",
+    "SELECT COUNT(DISTINCT video_id) FROM videos",
+    "SELECT COUNT(*) FROM videos WHERE views_count > 100 OR likes_count > 5",
+    "SELECT COUNT(*) FROM videos WHERE views_count > 1.5",
+    "SELECT COUNT(*) FROM videos WHERE creator_id = 'x' || 'y'",
+    "SELECT COUNT(*) FROM videos WHERE created_at::date = '2025-11-01'",
+    "SELECT COUNT(*) FROM videos v JOIN video_snapshots s ON s.video_id = v.id",
+])
+def test_unsupported_shapes_fall_back(sql):
+    assert parse_aggregate_query(sql) is None
+
+
+def test_day_start_is_utc_midnight():
+    assert day_start("2025-11-01") == NOV_1
+    assert day_start("2025-11-02") - day_start("2025-11-01") == DAY
+
+
+def test_sql_shape_replaces_literals():
+    assert sql_shape("SELECT  COUNT(*) FROM videos WHERE views_count > 100 AND creator_id = 'ab';") == \
+        "SELECT COUNT(*) FROM videos WHERE views_count > ? AND creator_id = ?"
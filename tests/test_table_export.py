@@ -0,0 +1,102 @@
+import asyncio
+import csv
+import os
+import sys
+from contextlib import asynccontextmanager
+
+import pytest
+
+import services.analytics_service
+from core.config import config
+from database.session import DatabasePool
+from services.table_export import TableWriter
+
+analytics = sys.modules["services.analytics_service"]
+
+
+class FakeCursor:
+    def __init__(self, total: int):
+        self.total = total
+        self.position = 0
+        self.fetches = []
+
+    async def fetch(self, count: int):
+        self.fetches.append(count)
+        rows = [(n, f"video {n}") for n in range(self.position, min(self.position + count, self.total))]
+        self.position += len(rows)
+        return rows
+
+
+class FakeConnection:
+    def __init__(self, cursor: FakeCursor):
+        self._cursor = cursor
+
+    @asynccontextmanager
+    async def transaction(self, readonly=False):
+        yield
+
+    async def prepare(self, sql):
+        return self
+
+    def get_attributes(self):
+        return [type("Attribute", (), {"name": name})() for name in ("n", "title")]
+
+    async def cursor(self):
+        return self._cursor
+
+
+@pytest.fixture
+def table(monkeypatch):
+    monkeypatch.setattr(config, "table_inline_rows", 5)
+    monkeypatch.setattr(config, "table_chunk_rows", 10)
+    monkeypatch.setattr(config, "table_max_rows", 25)
+
+    def stream(total: int):
+        cursor = FakeCursor(total)
+
+        @asynccontextmanager
+        async def acquire(readonly=False):
+            yield FakeConnection(cursor)
+
+        monkeypatch.setattr(DatabasePool, "acquire", acquire)
+        result = asyncio.run(analytics.AnalyticsService()._stream_table("SELECT id, title FROM videos", "csv"))
+        if result.path:
+            with open(result.path, encoding="utf-8-sig") as file:
+                result.file_rows = len(list(csv.reader(file))) - 1
+            os.remove(result.path)
+        return result, cursor
+
+    return stream
+
+
+def test_small_results_stay_inline(table):
+    result, cursor = table(5)
+    assert result.path is None
+    assert result.rows[-1] == (4, "video 4")
+    assert cursor.fetches == [6]
+
+
+def test_last_fetch_is_capped_at_the_row_limit(table):
+    result, cursor = table(100)
+    assert cursor.fetches == [6, 10, 9, 1]
+    assert (result.row_count, result.file_rows, result.truncated) == (25, 25, True)
+
+
+def test_exactly_the_row_limit_is_not_truncated(table):
+    result, cursor = table(25)
+    assert (result.row_count, result.file_rows, result.truncated) == (25, 25, False)
+
+
+def test_results_under_the_limit_are_complete(table):
+    result, cursor = table(12)
+    assert cursor.fetches == [6, 10]
+    assert (result.row_count, result.truncated) == (12, False)
+
+
+def test_writer_must_implement_write_and_close():
+    class NoClose(TableWriter):
+        def _write(self, rows):
+            pass
+
+    with pytest.raises(TypeError, match="_close"):
+        NoClose(["a"])
@@ -0,0 +1,82 @@
+"""
+Chart rendering
+
+Kept free of project imports so process pool workers start quickly.
+"""
+import io
+
+from PIL import Image, ImageDraw, ImageFont
+
+WIDTH = 900
+HEIGHT = 480
+MARGIN_LEFT = 90
+MARGIN_RIGHT = 50
+MARGIN_TOP = 30
+MARGIN_BOTTOM = 60
+
+BACKGROUND = (255, 255, 255)
+GRID = (225, 228, 232)
+AXIS = (90, 90, 90)
+LINE = (33, 110, 200)
+FILL = (33, 110, 200, 40)
+
+
+def _format_number(value: float) -> str:
+    for threshold, suffix in ((1e9, "B"), (1e6, "M"), (1e3, "K")):
+        if abs(value) >= threshold:
+            return f"{value / threshold:.1f}{suffix}"
+    return f"{value:.0f}" if float(value).is_integer() else f"{value:.2f}"
+
+
+def render_line_chart(labels: list[str], values: list[float]) -> bytes:
+    """Render a line chart as PNG bytes"""
+    image = Image.new("RGB", (WIDTH, HEIGHT), BACKGROUND)
+    overlay = Image.new("RGBA", (WIDTH, HEIGHT), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(image)
+    font = ImageFont.load_default(size=13)
+
+    plot_width = WIDTH - MARGIN_LEFT - MARGIN_RIGHT
+    plot_height = HEIGHT - MARGIN_TOP - MARGIN_BOTTOM
+    bottom = MARGIN_TOP + plot_height
+
+    low = min(0.0, min(values))
+    high = max(values)
+    if high == low:
+        high = low + 1
+
+    def x_at(index: int) -> float:
+        if len(values) == 1:
+            return MARGIN_LEFT + plot_width / 2
+        return MARGIN_LEFT + plot_width * index / (len(values) - 1)
+
+    def y_at(value: float) -> float:
+        return bottom - plot_height * (value - low) / (high - low)
+
+    for step in range(5):
+        value = low + (high - low) * step / 4
+        y = y_at(value)
+        draw.line([(MARGIN_LEFT, y), (WIDTH - MARGIN_RIGHT, y)], fill=GRID)
+        draw.text((MARGIN_LEFT - 8, y), _format_number(value), fill=AXIS, font=font, anchor="rm")
+
+    draw.line([(MARGIN_LEFT, MARGIN_TOP), (MARGIN_LEFT, bottom)], fill=AXIS)
+    draw.line([(MARGIN_LEFT, y_at(0)), (WIDTH - MARGIN_RIGHT, y_at(0))], fill=AXIS)
+
+    points = [(x_at(i), y_at(v)) for i, v in enumerate(values)]
+    if len(points) > 1:
+        area = [(points[0][0], y_at(0))] + points + [(points[-1][0], y_at(0))]
+        ImageDraw.Draw(overlay).polygon(area, fill=FILL)
+        image.paste(overlay, mask=overlay)
+        draw = ImageDraw.Draw(image)
+        draw.line(points, fill=LINE, width=3, joint="curve")
+    if len(points) <= 60:
+        for x, y in points:
+            draw.ellipse([x - 3, y - 3, x + 3, y + 3], fill=LINE)
+
+    label_count = min(len(labels), 8)
+    for n in range(label_count):
+        index = round(n * (len(labels) - 1) / max(label_count - 1, 1))
+        draw.text((x_at(index), bottom + 10), labels[index], fill=AXIS, font=font, anchor="mt")
+
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG", optimize=True)
+    return buffer.getvalue()
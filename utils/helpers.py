@@ -1,7 +1,74 @@
 """
 Helper functions
 """
+import html
+import re
 
 def format_user_mention(user_id: int, name: str) -> str:
     """Format user mention for HTML"""
     return f'<a href="tg://user?id={user_id}">{name}</a>'
+
+
+def format_value(value) -> str:
+    """Numeric answer; sketch estimates carry their relative error, cached answers their age"""
+    error = getattr(value, "relative_error", None)
+    text = str(value) if error is None else f"≈{int(value)} (±{error:.1%})"
+    cached_at = getattr(value, "cached_at", None)
+    if cached_at is not None:
+        text += f" (возможно устарело: ответ от {cached_at:%d.%m %H:%M} UTC)"
+    return text
+
+
+def split_questions(text: str, limit: int) -> list[str]:
+    """One question per non-empty line, numbering/bullets stripped"""
+    questions = []
+    for line in text.splitlines():
+        line = re.sub(r"^\d+[.)]\s*", "", line.strip().lstrip("•-*").strip())
+        if line:
+            questions.append(line)
+    return questions[:limit]
+
+
+def format_results_table(questions: list[str], results: list[tuple], width: int = 48) -> list[str]:
+    """Render batch results as monospace HTML blocks that fit in Telegram messages"""
+    lines = []
+    errors = []
+    for number, (question, (value, error)) in enumerate(zip(questions, results), 1):
+        answer = "—" if error else format_value(value)
+        short = question if len(question) <= width else question[:width - 1] + "…"
+        lines.append(f"{number:>2} {answer:>14}  {short}")
+        if error:
+            errors.append(f"{number:>2} {error[:80]}")
+
+    if errors:
+        lines += ["", "Ошибки:"] + errors
+
+    blocks = []
+    current = []
+    size = 0
+    for line in lines:
+        line = html.escape(line)
+        if size + len(line) > 3900 and current:
+            blocks.append(current)
+            current, size = [], 0
+        current.append(line)
+        size += len(line) + 1
+    if current:
+        blocks.append(current)
+
+    return ["<pre>" + "\n".join(block) + "</pre>" for block in blocks]
+
+
+def format_table(columns: list[str], rows: list[tuple], max_width: int = 24) -> str:
+    """Render a small result set as an aligned monospace HTML block"""
+    def cell(value) -> str:
+        text = "" if value is None else str(value)
+        return text if len(text) <= max_width else text[:max_width - 1] + "…"
+
+    table = [[cell(c) for c in columns]] + [[cell(v) for v in row] for row in rows]
+    widths = [max(len(line[i]) for line in table) for i in range(len(columns))]
+
+    lines = ["  ".join(value.ljust(widths[i]) for i, value in enumerate(line)).rstrip() for line in table]
+    lines.insert(1, "  ".join("-" * width for width in widths))
+
+    return "<pre>" + html.escape("\n".join(lines)) + "</pre>"